@@ -0,0 +1,154 @@
+from functools import cached_property
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = [
+    'flat_weighted_average_rate', 'office_weighted_average_rate',
+    'shop_weighted_average_rate', 'others_weighted_average_rate'
+]
+
+SALES_COLUMNS = [
+    'total_sales_igr', 'total_sold_igr', 'total_units',
+    'flat_sold_igr', 'office_sold_igr', 'shop_sold_igr', 'others_sold_igr'
+]
+
+STATS = ['sum', 'count', 'min', 'max']
+
+RECORDS = ('records', 'count')
+
+
+def aggregate_columns(df):
+    """Price and sales columns present in df with a numeric dtype"""
+    return [
+        col for col in PRICE_COLUMNS + SALES_COLUMNS
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col])
+    ]
+
+
+def aggregate(df, keys, names):
+    """One grouped pass computing sum/count/min/max of every metric column"""
+    grouped = df.groupby(keys, sort=True)
+    columns = aggregate_columns(df)
+    if columns:
+        stats = grouped[columns].agg(STATS)
+    else:
+        stats = pd.DataFrame(index=grouped.size().index)
+        stats.columns = pd.MultiIndex.from_arrays([[], []])
+    stats[RECORDS] = grouped.size()
+    stats.index.names = names
+    return stats
+
+
+def year_keys(df):
+    if 'year' in df.columns:
+        return df['year'].to_numpy()
+    return np.zeros(len(df), dtype=int)
+
+
+def aggregate_by_year(df):
+    """Per-year stats for an already filtered frame"""
+    return aggregate(df, year_keys(df), ['year'])
+
+
+def combine(stats, level=None):
+    """Merge stat rows, per `level` when given or into a single row"""
+    grouped = stats.groupby(level=level) if level else stats
+    parts = []
+    for stat, func in (('sum', 'sum'), ('count', 'sum'), ('min', 'min'), ('max', 'max')):
+        cols = [col for col in stats.columns if col[1] == stat]
+        if cols:
+            part = getattr(grouped[cols], func)()
+            parts.append(part if level else part.to_frame().T)
+    return pd.concat(parts, axis=1)[stats.columns]
+
+
+def totals(yearly):
+    """Collapse per-year stats into overall stats, indexed by (column, stat)"""
+    return combine(yearly).iloc[0]
+
+
+def frame_totals(df):
+    """Overall stats of a filtered frame as {(column, stat): value}.
+
+    Equal to totals(aggregate_by_year(df)) but reduces each column once
+    instead of grouping by year and combining the groups.
+    """
+    if 'year' in df.columns and df['year'].isna().any():
+        # Grouping by year leaves out rows without one
+        df = df[df['year'].notna()]
+    stats = {}
+    for col in aggregate_columns(df):
+        values = df[col].to_numpy(dtype=float, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        stats[(col, 'sum')] = values.sum()
+        stats[(col, 'count')] = len(values)
+        stats[(col, 'min')] = values.min() if len(values) else np.nan
+        stats[(col, 'max')] = values.max() if len(values) else np.nan
+    stats[RECORDS] = len(df)
+    return stats
+
+
+def mean(stats, col):
+    """Mean of col from sum/count, NaN where there are no values"""
+    count = stats[(col, 'count')]
+    return np.where(count > 0, stats[(col, 'sum')] / np.where(count > 0, count, 1), np.nan)
+
+
+class AggregateCube:
+    """Area x year aggregates of every price and sales column.
+
+    Built once per dataset so summary, chart and compare responses are
+    lookups into this table rather than recomputations over rows.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.areas = stats.index.get_level_values('area').to_numpy()
+
+    @classmethod
+    def build(cls, df, index):
+        """Aggregate a frame clustered by AreaIndex"""
+        counts = index.stops - index.starts
+        indexed_rows = int(index.stops[-1]) if len(counts) else 0
+        codes = np.repeat(np.arange(len(counts)), counts)
+        rows = df.iloc[:indexed_rows]
+        stats = aggregate(rows, [codes, year_keys(rows)], ['area', 'year'])
+        return cls(stats)
+
+    def upsert(self, df, index, affected, old_to_new):
+        """Cube for a frame merged by AreaIndex.upsert, re-aggregating only the affected clusters"""
+        new_codes = old_to_new[self.areas]
+        keep = ~np.isin(new_codes, affected)
+        kept = self.stats[keep]
+        kept.index = pd.MultiIndex.from_arrays(
+            [new_codes[keep], kept.index.get_level_values('year')], names=['area', 'year']
+        )
+
+        counts = index.counts[affected]
+        positions = np.concatenate(
+            [np.arange(index.starts[code], index.stops[code]) for code in affected]
+        ) if len(affected) else np.array([], dtype=np.int64)
+        rows = df.iloc[positions]
+        fresh = aggregate(rows, [np.repeat(affected, counts), year_keys(rows)], ['area', 'year'])
+        return AggregateCube(pd.concat([kept, fresh]).sort_index())
+
+    @cached_property
+    def area_totals(self):
+        """Overall stats of every area cluster, indexed by cluster code"""
+        return combine(self.stats, level='area')
+
+    @cached_property
+    def area_years(self):
+        """Years with data per area cluster code"""
+        years = self.stats.index.get_level_values('year').to_numpy()
+        bounds = np.flatnonzero(np.diff(self.areas)) + 1
+        codes = self.areas[np.r_[0, bounds]] if len(self.areas) else np.array([], dtype=int)
+        return dict(zip(codes.tolist(), np.split(years, bounds)))
+
+    def yearly(self, codes):
+        """Per-year stats for one or more area clusters"""
+        if len(codes) == 1:
+            start, stop = np.searchsorted(self.areas, [codes[0], codes[0] + 1])
+            return self.stats.iloc[start:stop].droplevel('area')
+        selected = self.stats[np.isin(self.areas, codes)]
+        return combine(selected, level='year')
@@ -0,0 +1,141 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+def get_cache_settings():
+    config = {
+        'MAX_ENTRIES': 512,
+        'BACKEND': None,
+        'TIMEOUT': 3600,
+    }
+    config.update(getattr(settings, 'RESPONSE_CACHE', {}))
+    return config
+
+
+class ResponseCache:
+    """Bounded LRU of rendered responses, optionally backed by a Django cache.
+
+    Keys include the dataset version, so entries for replaced data are never
+    served; clear() just releases their memory early.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def backend(self):
+        alias = get_cache_settings()['BACKEND']
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        backend = self.backend()
+        if backend is not None:
+            value = backend.get(key)
+            if value is not None:
+                self._store(key, value)
+            return value
+        return None
+
+    def set(self, key, value):
+        self._store(key, value)
+        backend = self.backend()
+        if backend is not None:
+            backend.set(key, value, get_cache_settings()['TIMEOUT'])
+
+    def _store(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+response_cache = ResponseCache(get_cache_settings()['MAX_ENTRIES'])
+
+
+def invalidate_response_cache():
+    """Drop locally cached responses after an upload or clear"""
+    response_cache.clear()
+
+
+def make_cache_key(version, endpoint, params):
+    """Stable key for (dataset version, endpoint, normalized query params)"""
+    normalized = sorted(
+        (key, value.strip()) for key, values in params.lists() for value in values
+    )
+    return f"response:{version}:{endpoint}:{urlencode(normalized)}"
+
+
+def make_etag(key):
+    return '"%s"' % hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag in [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+
+def versioned_cache(endpoint, dataset=None):
+    """Cache successful GET responses per dataset version and answer revalidations with 304.
+
+    Use with method_decorator on an APIView's dispatch. The ETag only
+    depends on the request and the dataset version, so a matching
+    If-None-Match is answered before the view runs. dataset(request)
+    names the dataset the response reads (default: the `dataset` param).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            from .utils import get_dataset_version
+            if dataset is not None:
+                selected = dataset(request)
+            else:
+                selected = request.GET.get('dataset', '').strip() or None
+            key = make_cache_key(get_dataset_version(selected), endpoint, request.GET)
+            etag = make_etag(key)
+
+            if etag_matches(request, etag):
+                response = HttpResponse(status=304)
+            else:
+                cached = response_cache.get(key)
+                if cached is not None:
+                    content, content_type = cached
+                    response = HttpResponse(content, content_type=content_type)
+                else:
+                    response = view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    if hasattr(response, 'render'):
+                        response.render()
+                    response_cache.set(key, (response.content, response['Content-Type']))
+
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,91 @@
+import os
+import tempfile
+from django.conf import settings
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'json': ('application/json', 'json'),
+    'excel': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+
+def get_batch_rows():
+    return getattr(settings, 'EXPORT_BATCH_ROWS', 5000)
+
+
+def iter_batches(df, batch_rows=None):
+    batch_rows = batch_rows or get_batch_rows()
+    for start in range(0, len(df), batch_rows):
+        yield df.iloc[start:start + batch_rows]
+
+
+def iter_csv(df, batch_rows=None):
+    """CSV in row batches, with a UTF-8 BOM so Excel detects the encoding"""
+    yield '\ufeff'.encode('utf-8')
+    for i, batch in enumerate(iter_batches(df, batch_rows)):
+        yield batch.to_csv(index=False, header=(i == 0)).encode('utf-8')
+
+
+def iter_ndjson(df, batch_rows=None):
+    """One JSON object per line, written a batch at a time"""
+    for batch in iter_batches(df, batch_rows):
+        lines = batch.to_json(orient='records', lines=True, date_format='iso', default_handler=str)
+        yield (lines.rstrip('\n') + '\n').encode('utf-8')
+
+
+def iter_json(df, batch_rows=None):
+    """A JSON array of records, streamed without materializing the whole document"""
+    yield b'['
+    first = True
+    for batch in iter_batches(df, batch_rows):
+        records = batch.to_json(orient='records', date_format='iso', default_handler=str)[1:-1]
+        if not records:
+            continue
+        yield (records if first else ',' + records).encode('utf-8')
+        first = False
+    yield b']'
+
+
+def iter_excel(df, sheet_name='data', batch_rows=None, chunk_size=64 * 1024):
+    """Workbook built with openpyxl's write-only mode, then streamed from disk.
+
+    Rows are appended a batch at a time so memory stays flat; the zip
+    container can only be sent once it is complete.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    worksheet.append([str(col) for col in df.columns])
+    for batch in iter_batches(df, batch_rows):
+        values = batch.astype(object).where(batch.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            worksheet.append(row)
+
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    try:
+        workbook.save(path)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                yield chunk
+    finally:
+        os.unlink(path)
+
+
+def excel_sheet_name(area):
+    return ''.join(c for c in area[:25] if c.isalnum() or c in (' ', '_')).strip() or 'data'
+
+
+def iter_export(df, format, area):
+    """Byte chunks of df in the requested export format"""
+    if format == 'csv':
+        return iter_csv(df)
+    if format == 'ndjson':
+        return iter_ndjson(df)
+    if format == 'json':
+        return iter_json(df)
+    if format == 'excel':
+        return iter_excel(df, excel_sheet_name(area))
+    raise ValueError(f"Unsupported export format: {format}")
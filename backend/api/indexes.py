@@ -0,0 +1,321 @@
+import numpy as np
+import pandas as pd
+import re
+from bisect import bisect_left
+
+AREA_COLUMNS = ['final_location', 'locality', 'area', 'location']
+
+_TOKEN_SPLIT = re.compile(r'[^0-9a-z]+')
+
+
+def find_area_column(df):
+    """Return the first area column that holds any usable values"""
+    for col in AREA_COLUMNS:
+        if col in df.columns:
+            values = df[col].dropna().astype(str).str.strip()
+            if (values != '').any() and (values != 'nan').any():
+                return col
+    return None
+
+
+def area_keys(values):
+    """Lowercased, stripped area names, NaN where the name is missing or blank"""
+    lowered = values.astype(str).str.strip().str.lower()
+    return lowered.where(values.notna() & (lowered != '') & (lowered != 'nan'))
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_SPLIT.split(str(text).lower()) if token]
+
+
+def trigrams(text):
+    """Set of 3-character shingles of each word, padded like pg_trgm ("  w", " wa", ..., "d ")"""
+    grams = set()
+    for token in tokenize(text):
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def prefix_range(sorted_keys, prefix):
+    """[lo, hi) of the entries of sorted_keys that start with prefix"""
+    return bisect_left(sorted_keys, prefix), bisect_left(sorted_keys, prefix + '\uffff')
+
+
+class AreaIndex:
+    """Offset ranges for a frame whose rows are clustered by area.
+
+    Each lowercased area name maps to a contiguous [start, stop) slice of
+    the clustered frame, so exact lookups never scan or copy rows.
+    """
+
+    # Minimum trigram similarity for resolve() and mentions() to report an area
+    fuzzy_threshold = 0.3
+
+    def __init__(self, column, keys, names, starts, stops, original_positions):
+        self.column = column
+        self.keys = keys
+        self.names = names
+        self.starts = starts
+        self.stops = stops
+        self.original_positions = original_positions
+        self.positions = {key: i for i, key in enumerate(keys)}
+        self.tokens = {}
+        for i, key in enumerate(keys):
+            for token in tokenize(key):
+                self.tokens.setdefault(token, set()).add(i)
+        # keys come out of factorize sorted, so prefixes are bisectable ranges
+        self.token_keys = sorted(self.tokens)
+        self.counts = np.asarray(stops) - np.asarray(starts)
+
+        postings = {}
+        gram_counts = []
+        for i, key in enumerate(keys):
+            grams = trigrams(key)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.trigram_postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self.trigram_counts = np.array(gram_counts, dtype=np.int64)
+        self.max_words = max((len(tokenize(key)) for key in keys), default=1)
+
+    @classmethod
+    def build(cls, df, original_positions=None):
+        """Cluster df by area and index it. Returns (clustered_df, index).
+
+        original_positions gives the upload position of each row of df when
+        df is not in upload order; by default df's own order is the upload's.
+        """
+        column = find_area_column(df)
+        if column is None:
+            return df, None
+
+        codes, keys = pd.factorize(area_keys(df[column]), sort=True)
+
+        # Rows without an area get the last cluster so they never match a lookup
+        sort_codes = np.where(codes < 0, len(keys), codes)
+        order = np.argsort(sort_codes, kind='stable')
+        if np.array_equal(order, np.arange(len(order))):
+            # Already clustered (e.g. reloaded from a snapshot): keep the frame,
+            # which may be a zero-copy view of a memory-mapped file
+            clustered = df.reset_index(drop=True)
+        else:
+            clustered = df.iloc[order].reset_index(drop=True)
+
+        counts = np.bincount(codes[codes >= 0], minlength=len(keys))
+        stops = np.cumsum(counts)
+        starts = stops - counts
+
+        stripped = clustered[column].astype(str).str.strip()
+        names = [stripped.iat[start] for start in starts]
+
+        if original_positions is not None:
+            order = np.asarray(original_positions, dtype=np.int64)[order]
+        return clustered, cls(column, list(keys), names, starts, stops, order)
+
+    def upsert(self, df, delta):
+        """Merge delta's rows into the clustered frame df by (area, year).
+
+        Rows of df whose area and year both appear in delta are replaced
+        by delta's rows for that key. Every other delta row is inserted at
+        the end of its area's cluster, and unseen areas get new clusters.
+        Only the clusters that delta touches are inspected. The new layout
+        is a sorted merge of two clustered sequences, so the rows of df are
+        never re-sorted. Returns (merged_df, index, affected, old_to_new):
+        affected holds the new cluster ids whose rows changed, and
+        old_to_new maps this index's cluster ids to the new ones.
+        """
+        keys = area_keys(delta[self.column])
+        present = keys.notna().to_numpy()
+        new_keys = sorted(set(self.keys).union(keys[present].unique()))
+        positions = {key: i for i, key in enumerate(new_keys)}
+        old_to_new = np.array([positions[key] for key in self.keys], dtype=np.int64)
+
+        delta_codes = np.full(len(delta), len(new_keys), dtype=np.int64)
+        delta_codes[present] = keys[present].map(positions).to_numpy()
+        affected = np.unique(delta_codes[present])
+
+        # Drop the rows of df that delta replaces, looking only inside touched clusters
+        base_years = df['year'].to_numpy() if 'year' in df.columns else np.zeros(len(df), dtype=int)
+        delta_years = delta['year'].to_numpy() if 'year' in delta.columns else np.zeros(len(delta), dtype=int)
+        keep = np.ones(len(df), dtype=bool)
+        replaced = pd.Series(delta_years[present]).groupby(delta_codes[present]).unique()
+        for code, years in replaced.items():
+            old = self.positions.get(new_keys[code])
+            if old is not None:
+                start, stop = self.starts[old], self.stops[old]
+                keep[start:stop] = ~np.isin(base_years[start:stop], years)
+
+        # Rows without an area stay after every cluster, as in build()
+        indexed_rows = int(self.stops[-1]) if len(self.stops) else 0
+        base_codes = np.full(len(df), len(new_keys), dtype=np.int64)
+        base_codes[:indexed_rows] = np.repeat(old_to_new, self.counts)
+
+        kept = np.flatnonzero(keep)
+        delta_order = np.argsort(delta_codes, kind='stable')
+        insert_at = np.searchsorted(base_codes[kept], delta_codes[delta_order], side='right')
+        rows = np.insert(kept, insert_at, len(df) + delta_order)
+        merged = pd.concat([df, delta], ignore_index=True).iloc[rows].reset_index(drop=True)
+
+        merged_codes = np.concatenate([base_codes, delta_codes])[rows]
+        counts = np.bincount(merged_codes[merged_codes < len(new_keys)], minlength=len(new_keys))
+        stops = np.cumsum(counts)
+        starts = stops - counts
+
+        names = [None] * len(new_keys)
+        for old, new in enumerate(old_to_new):
+            names[new] = self.names[old]
+        for i in affected:
+            if names[i] is None:
+                names[i] = str(merged[self.column].iat[starts[i]]).strip()
+
+        # Delta rows count as uploaded after everything already in df
+        offset = int(self.original_positions.max()) + 1 if len(self.original_positions) else 0
+        original = np.concatenate([
+            np.asarray(self.original_positions, dtype=np.int64),
+            offset + np.arange(len(delta), dtype=np.int64),
+        ])[rows]
+
+        index = AreaIndex(self.column, new_keys, names, starts, stops, original)
+        return merged, index, affected, old_to_new
+
+    def match(self, area):
+        """Return cluster ids whose name equals or contains the query.
+
+        Only the indexed column is searched; callers scan the other area
+        columns themselves when nothing matches here.
+        """
+        query = str(area).lower().strip()
+        if query in self.positions:
+            return [self.positions[query]]
+
+        query_tokens = tokenize(query)
+        if query_tokens and all(token in self.tokens for token in query_tokens):
+            candidates = set.intersection(*(self.tokens[token] for token in query_tokens))
+            matches = sorted(i for i in candidates if query in self.keys[i])
+            if matches:
+                return matches
+
+        # Partial words are rare and the name list is small, so scan names rather than rows.
+        # Misspelt names are not guessed here: only resolve() and the chat parser,
+        # which report the canonical name they picked, tolerate typos.
+        return [i for i, key in enumerate(self.keys) if query in key]
+
+    def similar(self, text):
+        """(cluster ids, trigram similarity) of every area sharing a trigram with text"""
+        grams = trigrams(text)
+        postings = [self.trigram_postings[gram] for gram in grams if gram in self.trigram_postings]
+        if not postings:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        ids, shared = np.unique(np.concatenate(postings), return_counts=True)
+        # Jaccard over trigram sets; a query gram missing from the index still counts in the union
+        union = len(grams) + self.trigram_counts[ids] - shared
+        return ids, shared / union
+
+    def resolve(self, text, limit=5, threshold=None):
+        """Closest areas to free text as [(cluster id, similarity)], best first.
+
+        text may be a whole sentence: every run of up to as many words as
+        the longest area name is scored and each area keeps its best run.
+        Only the postings of the query's trigrams are touched, so the cost
+        does not grow with the number of areas that share none of them.
+        """
+        threshold = self.fuzzy_threshold if threshold is None else threshold
+        words = tokenize(text)
+        if not words or limit <= 0:
+            return []
+
+        width = min(len(words), self.max_words)
+        runs = [
+            self.similar(' '.join(words[start:start + size]))
+            for size in range(1, width + 1)
+            for start in range(len(words) - size + 1)
+        ]
+        ids = np.concatenate([run[0] for run in runs])
+        scores = np.concatenate([run[1] for run in runs])
+        keep = scores >= threshold
+        ids, scores = ids[keep], scores[keep]
+        if not len(ids):
+            return []
+
+        # Best run per area: sort by id then descending score, keep each id's first
+        order = np.lexsort((-scores, ids))
+        ids, scores = ids[order], scores[order]
+        first = np.r_[True, ids[1:] != ids[:-1]]
+        ids, scores = ids[first], scores[first]
+
+        ranked = sorted(
+            zip(ids.tolist(), scores.tolist()),
+            key=lambda item: (-item[1], -self.counts[item[0]], self.keys[item[0]]),
+        )
+        return ranked[:limit]
+
+    def suggest(self, prefix, limit=10):
+        """Cluster ids for typeahead, most records first.
+
+        Names starting with prefix rank above names with a later word
+        starting with it. Both are bisected ranges of sorted arrays, so
+        the cost depends on the number of matches, not on all areas.
+        """
+        prefix = str(prefix).lower().strip()
+        if not prefix or limit <= 0:
+            return []
+
+        lo, hi = prefix_range(self.keys, prefix)
+        ranked = self.top(np.arange(lo, hi), limit)
+        if len(ranked) < limit:
+            token_lo, token_hi = prefix_range(self.token_keys, prefix)
+            words = set()
+            for token in self.token_keys[token_lo:token_hi]:
+                words.update(self.tokens[token])
+            later = np.fromiter((i for i in words if not lo <= i < hi), dtype=np.int64)
+            ranked += self.top(later, limit - len(ranked))
+        return ranked
+
+    def mentions(self, segments, threshold=None):
+        """Areas named in runs of words, as [(cluster id, similarity)] in text order.
+
+        Every window of a segment is scored against the trigram index and
+        the best-scoring windows are taken greedily, so one stretch of text
+        never names two areas and no area is named twice.
+        """
+        threshold = self.fuzzy_threshold if threshold is None else threshold
+        candidates = []
+        for segment, words in enumerate(segments):
+            for size in range(1, min(len(words), self.max_words) + 1):
+                for start in range(len(words) - size + 1):
+                    ids, scores = self.similar(' '.join(words[start:start + size]))
+                    if not len(ids):
+                        continue
+                    best = np.lexsort((-self.counts[ids], -scores))[0]
+                    if scores[best] >= threshold:
+                        candidates.append((float(scores[best]), size, segment, start, int(ids[best])))
+
+        candidates.sort(key=lambda candidate: (-candidate[0], -candidate[1]))
+        taken, chosen = set(), {}
+        for score, size, segment, start, i in candidates:
+            span = {(segment, word) for word in range(start, start + size)}
+            if i in chosen or span & taken:
+                continue
+            taken |= span
+            chosen[i] = (segment, start, score)
+        return [(i, score) for i, (_, _, score) in sorted(chosen.items(), key=lambda item: item[1][:2])]
+
+    def top(self, codes, limit):
+        """Up to limit of codes ordered by record count, then name"""
+        if len(codes) > limit:
+            codes = codes[np.argpartition(-self.counts[codes], limit - 1)[:limit]]
+        return sorted(codes.tolist(), key=lambda i: (-self.counts[i], self.keys[i]))
+
+    def slice(self, df, area):
+        """Rows of the clustered frame for area, or None when nothing matches"""
+        matches = self.match(area)
+        if not matches:
+            return None
+        if len(matches) == 1:
+            i = matches[0]
+            return df.iloc[self.starts[i]:self.stops[i]]
+
+        rows = np.concatenate([np.arange(self.starts[i], self.stops[i]) for i in matches])
+        rows = rows[np.argsort(self.original_positions[rows], kind='stable')]
+        return df.iloc[rows]
@@ -0,0 +1,132 @@
+import re
+from .aggregates import PRICE_COLUMNS
+from .indexes import tokenize
+
+# Checked in order: the first intent with a keyword in the question wins
+INTENT_KEYWORDS = [
+    ('narrative', {'why', 'explain', 'describe', 'outlook', 'forecast', 'predict', 'recommend',
+                   'should', 'invest', 'investment', 'worth', 'opinion', 'advice'}),
+    ('compare', {'compare', 'comparison', 'vs', 'versus', 'against', 'difference'}),
+    ('top', {'top', 'best', 'highest', 'lowest', 'rank', 'ranking', 'largest', 'most', 'cheapest', 'leading'}),
+    ('table', {'table', 'rows', 'records', 'raw', 'list'}),
+    ('trend', {'trend', 'trends', 'chart', 'graph', 'plot', 'growth', 'history', 'movement', 'over', 'time'}),
+    ('analyze', {'analyze', 'analyse', 'analysis', 'summary', 'summarize', 'overview', 'stats',
+                 'statistics', 'insights', 'report'}),
+]
+
+# Words naming a metric, with the columns they stand for in order of preference
+METRIC_KEYWORDS = {
+    'price': PRICE_COLUMNS[:1], 'prices': PRICE_COLUMNS[:1], 'rate': PRICE_COLUMNS[:1],
+    'rates': PRICE_COLUMNS[:1], 'flat': PRICE_COLUMNS[:1], 'flats': PRICE_COLUMNS[:1],
+    'expensive': PRICE_COLUMNS[:1], 'cheapest': PRICE_COLUMNS[:1],
+    'office': ['office_weighted_average_rate'], 'offices': ['office_weighted_average_rate'],
+    'shop': ['shop_weighted_average_rate'], 'shops': ['shop_weighted_average_rate'],
+    'sales': ['total_sales_igr', 'total_sold_igr', 'total_units'],
+    'revenue': ['total_sales_igr', 'total_sold_igr'],
+    'units': ['total_units', 'total_sold_igr', 'flat_sold_igr'],
+    'sold': ['total_units', 'total_sold_igr', 'flat_sold_igr'],
+    'demand': ['total_units', 'total_sold_igr', 'flat_sold_igr'],
+}
+
+ASCENDING_KEYWORDS = {'lowest', 'cheapest', 'least', 'bottom'}
+
+STOPWORDS = {
+    'a', 'an', 'the', 'in', 'of', 'for', 'and', 'or', 'to', 'on', 'at', 'by', 'with', 'from', 'since',
+    'between', 'until', 'till', 'through', 'after', 'before', 'during', 'year', 'years', 'show', 'me',
+    'give', 'get', 'tell', 'about', 'what', 'which', 'how', 'is', 'are', 'was', 'were', 'has', 'have',
+    'did', 'do', 'does', 'i', 'we', 'it', 'its', 'please', 'area', 'areas', 'locality', 'localities',
+    'location', 'locations', 'data', 'market', 'real', 'estate', 'average', 'avg', 'total', 'all',
+    'last', 'this', 'that', 'up', 'vs',
+}
+
+# Words that end a run of words that may name an area
+BOUNDARY_WORDS = STOPWORDS.union(METRIC_KEYWORDS, *(keywords for _, keywords in INTENT_KEYWORDS))
+
+YEAR = r'((?:19|20)\d{2})'
+YEAR_RANGE_PATTERN = re.compile(YEAR + r'\s*(?:-|to|until|till|through|and)\s*' + YEAR)
+YEAR_FROM_PATTERN = re.compile(r'\b(?:since|from|after)\s+' + YEAR)
+YEAR_TO_PATTERN = re.compile(r'\b(?:until|till|before|up to)\s+' + YEAR)
+YEAR_PATTERN = re.compile(r'\b' + YEAR + r'\b')
+TOP_LIMIT_PATTERN = re.compile(r'\b(?:top|best|bottom)\s+(\d{1,2})\b')
+
+
+def parse_years(text):
+    """(year_from, year_to) mentioned in text; either may be None"""
+    found = YEAR_RANGE_PATTERN.search(text)
+    if found:
+        first, last = sorted(int(year) for year in found.groups())
+        return first, last
+    year_from = YEAR_FROM_PATTERN.search(text)
+    year_to = YEAR_TO_PATTERN.search(text)
+    if year_from or year_to:
+        return (int(year_from.group(1)) if year_from else None, int(year_to.group(1)) if year_to else None)
+    years = [int(year) for year in YEAR_PATTERN.findall(text)]
+    if years:
+        return min(years), max(years)
+    return None, None
+
+
+def parse_metric(words, available):
+    """First column named by a metric word that the dataset has, as 'column:stat'"""
+    for word in words:
+        for col in METRIC_KEYWORDS.get(word, []):
+            if col in available:
+                return f"{col}:{'avg' if col in PRICE_COLUMNS else 'total'}"
+    return None
+
+
+def area_segments(words):
+    """Runs of words between boundary words and numbers; only these can name areas"""
+    segments, current = [], []
+    for word in words:
+        if word in BOUNDARY_WORDS or word.isdigit():
+            if current:
+                segments.append(current)
+            current = []
+        else:
+            current.append(word)
+    if current:
+        segments.append(current)
+    return segments
+
+
+def parse_query(text, index, available):
+    """Intent, areas, years and metric of a chat question, without any model call.
+
+    index is the dataset's AreaIndex (or None) and available its metric
+    columns. The result is a plain dict so it can be cached and returned
+    as JSON.
+    """
+    lowered = str(text).lower()
+    words = tokenize(lowered)
+    word_set = set(words)
+
+    areas = []
+    if index is not None:
+        areas = [index.names[i] for i, _ in index.mentions(area_segments(words))]
+
+    year_from, year_to = parse_years(lowered)
+    metric = parse_metric(words, available)
+    limit = TOP_LIMIT_PATTERN.search(lowered)
+
+    keyword_intent = next((intent for intent, keywords in INTENT_KEYWORDS if word_set & keywords), None)
+    if keyword_intent == 'top':
+        intent = 'top'
+    elif keyword_intent == 'compare' or len(areas) > 1:
+        intent = 'compare' if len(areas) > 1 else ('analyze' if areas else 'unknown')
+    elif not areas:
+        intent = 'unknown'
+    elif keyword_intent:
+        intent = keyword_intent
+    else:
+        intent = 'trend' if metric else 'analyze'
+
+    return {
+        "intent": intent,
+        "areas": areas,
+        "year_from": year_from,
+        "year_to": year_to,
+        "metric": metric,
+        "order": 'asc' if word_set & ASCENDING_KEYWORDS else 'desc',
+        "limit": int(limit.group(1)) if limit else None,
+    }
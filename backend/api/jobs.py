@@ -0,0 +1,130 @@
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_futures = {}
+
+
+def get_ingest_settings():
+    return {
+        'ASYNC': getattr(settings, 'INGEST_ASYNC', True),
+        'WORKERS': getattr(settings, 'INGEST_WORKERS', 2),
+    }
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_ingest_settings()['WORKERS'], thread_name_prefix='ingest'
+            )
+        return _executor
+
+
+def update_job(job_id, **fields):
+    from .models import IngestJob
+    IngestJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **fields)
+
+
+def run_ingest(job_id, path, name=None, original_filename=None, mode='replace', dataset=None):
+    """Ingest a stored upload, recording progress on its IngestJob, then delete the file.
+
+    mode 'append' merges the upload into dataset (default: the latest one)
+    instead of registering a new dataset.
+    """
+    from .utils import append_dataset, ingest_dataset
+
+    def progress(stage, rows=None):
+        fields = {'stage': stage}
+        if rows is not None:
+            fields['rows_parsed'] = rows
+        update_job(job_id, **fields)
+
+    try:
+        update_job(job_id, status='running', stage='reading')
+        if mode == 'append':
+            loaded = append_dataset(path, dataset, original_filename=original_filename, progress=progress)
+        else:
+            loaded = ingest_dataset(path, name=name, original_filename=original_filename, progress=progress)
+        if loaded is None:
+            update_job(job_id, status='failed', stage='failed',
+                       error="The uploaded file is empty or could not be parsed. Please check the file format.")
+        else:
+            update_job(job_id, status='succeeded', stage='done',
+                       rows_parsed=len(loaded.df), dataset_id=loaded.dataset_id)
+    except Exception as e:
+        logger.exception("Ingest job %s failed: %s", job_id, e, extra={"job": job_id})
+        update_job(job_id, status='failed', stage='failed', error=f"Error parsing file: {e}")
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def run_ingest_in_worker(*args):
+    try:
+        run_ingest(*args)
+    finally:
+        # Pool threads outlive the job; do not keep its connection open
+        close_old_connections()
+
+
+def submit_ingest(path, name=None, original_filename=None, file_size=0, mode='replace', dataset=None):
+    """Queue an upload for ingestion and return its IngestJob.
+
+    The file at path is owned by the job from here on. With INGEST_ASYNC
+    off the job runs inline and is complete when this returns.
+    """
+    from .models import IngestJob
+
+    job = IngestJob.objects.create(
+        name=name or '',
+        original_filename=original_filename or os.path.basename(path),
+        file_size=file_size,
+        mode=mode,
+    )
+    if get_ingest_settings()['ASYNC']:
+        future = get_executor().submit(run_ingest_in_worker, job.id, path, name, original_filename, mode, dataset)
+        _futures[job.id] = future
+        future.add_done_callback(lambda _: _futures.pop(job.id, None))
+    else:
+        # Run outside the uploading request's context, as a worker thread would,
+        # so the job never reads datasets that request has already pinned
+        contextvars.Context().run(run_ingest, job.id, path, name, original_filename, mode, dataset)
+    job.refresh_from_db()
+    return job
+
+
+def wait_for_job(job_id, timeout=None):
+    """Block until a job submitted by this process finishes (used by tests and commands)"""
+    future = _futures.get(job_id)
+    if future is not None:
+        future.result(timeout)
+
+
+def serialize_job(job):
+    return {
+        "id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "rows_parsed": job.rows_parsed,
+        "error": job.error or None,
+        "name": job.name or job.original_filename,
+        "mode": job.mode,
+        "original_filename": job.original_filename,
+        "file_size": job.file_size,
+        "dataset_id": job.dataset_id,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
@@ -0,0 +1,45 @@
+import json
+import logging
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+def record_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Log records as JSON lines, or as text followed by key=value pairs.
+
+    Fields passed with `extra={...}` are kept as separate keys, so log
+    processors can filter on e.g. dataset or duration_ms without parsing
+    the message.
+    """
+
+    def __init__(self, output='text', **kwargs):
+        super().__init__(**kwargs)
+        self.output = output
+
+    def format(self, record):
+        message = record.getMessage()
+        fields = record_fields(record)
+        if self.output == 'json':
+            entry = {
+                "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": message,
+                **fields,
+            }
+            if record.exc_info:
+                entry["exception"] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+
+        line = f"{self.formatTime(record)} {record.levelname} {record.name}: {message}"
+        if fields:
+            line += ' ' + ' '.join(f"{key}={json.dumps(value, default=str)}" for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
@@ -0,0 +1,256 @@
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from api import utils
+from api.cache import invalidate_response_cache
+
+GENERATOR_PATH = Path(settings.BASE_DIR).parent / 'sample-data' / 'generate_sample_data.py'
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+DEFAULT_TOLERANCE = 0.5
+DEFAULT_FLOOR_MS = 2.0
+
+
+def load_generator():
+    spec = importlib.util.spec_from_file_location('generate_sample_data', GENERATOR_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def parse_sizes(text):
+    """[(rows, areas)] from '10000:200,100000:2000'; areas defaults to rows // 50"""
+    sizes = []
+    for spec in text.split(','):
+        rows, _, areas = spec.strip().partition(':')
+        rows = int(rows)
+        sizes.append((rows, int(areas) if areas else max(rows // 50, 8)))
+    return sizes
+
+
+def time_call(func, repeat, setup=None):
+    """min and median wall time of func() in ms; setup() runs untimed before each call"""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        runs.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": round(min(runs), 3), "median_ms": round(statistics.median(runs), 3), "runs": repeat}
+
+
+def compare_to_baseline(results, baseline, tolerance, floor_ms):
+    """Entries more than tolerance (and floor_ms) slower than in the baseline.
+
+    Fastest runs are compared rather than medians: they are the least
+    affected by whatever else the machine was doing.
+    """
+    previous = {(entry['rows'], entry['name']): entry for entry in baseline.get('results', [])}
+    regressions = []
+    for entry in results:
+        before = previous.get((entry['rows'], entry['name']))
+        if before is None:
+            continue
+        slower = entry['min_ms'] - before['min_ms']
+        if entry['min_ms'] > before['min_ms'] * (1 + tolerance) and slower > floor_ms:
+            regressions.append({
+                **entry,
+                "baseline_ms": before['min_ms'],
+                "ratio": round(entry['min_ms'] / before['min_ms'], 2) if before['min_ms'] else None,
+            })
+    return regressions
+
+
+def environment():
+    """Host and library versions a run was timed on"""
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def comparison_limits(options, baseline):
+    """(tolerance, floor_ms): the command-line values, else those stored with the baseline, else the defaults"""
+    stored = baseline.get('options', {})
+    tolerance = options['tolerance'] if options['tolerance'] is not None else stored.get('tolerance', DEFAULT_TOLERANCE)
+    floor_ms = options['floor_ms'] if options['floor_ms'] is not None else stored.get('floor_ms', DEFAULT_FLOOR_MS)
+    return tolerance, floor_ms
+
+
+def consume(response):
+    """Read a response body, streamed or not, so its full cost is timed"""
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    else:
+        response.content
+    return response
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the analysis functions and API endpoints on generated datasets of several sizes, "
+        "write the timings as JSON and compare them with a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000:200,100000:2000',
+                            help="comma-separated rows[:areas] per dataset (default: %(default)s)")
+        parser.add_argument('--repeat', type=int, default=5, help="timed calls per benchmark")
+        parser.add_argument('--format', default='parquet', choices=['parquet', 'csv', 'xlsx'],
+                            help="file format the generated data is ingested from")
+        parser.add_argument('--missing', type=float, default=0.02, help="fraction of blank metric values")
+        parser.add_argument('--output', default='benchmark-results.json', help="where to write the results")
+        parser.add_argument('--baseline', default=None,
+                            help=f"results file to compare with (default: {DEFAULT_BASELINE} if it exists)")
+        parser.add_argument('--tolerance', type=float, default=None,
+                            help=f"allowed slowdown against the baseline, as a fraction "
+                                 f"(default: the baseline's, else {DEFAULT_TOLERANCE})")
+        parser.add_argument('--floor-ms', type=float, default=None,
+                            help=f"ignore slowdowns smaller than this many ms "
+                                 f"(default: the baseline's, else {DEFAULT_FLOOR_MS})")
+        parser.add_argument('--no-compare', action='store_true',
+                            help="only write the results, e.g. when recording a new baseline")
+
+    def handle(self, *args, **options):
+        generator = load_generator()
+        workdir = tempfile.mkdtemp(prefix='benchmark-')
+        results = []
+        try:
+            # Datasets live in a scratch directory and their rows are rolled back,
+            # so a benchmark run leaves neither files nor DataSet rows behind
+            with override_settings(MEDIA_ROOT=workdir, DATASET_SNAPSHOT_DIR=os.path.join(workdir, 'snapshots'),
+                                   INGEST_ASYNC=False), \
+                    mock.patch.dict(os.environ, {'OPENAI_API_KEY': ''}), \
+                    transaction.atomic():
+                for rows, areas in parse_sizes(options['sizes']):
+                    self.stdout.write(f"Benchmarking {rows:,} rows over {areas:,} areas...")
+                    df = generator.generate(rows, areas, missing=options['missing'])
+                    path = generator.write(df, os.path.join(workdir, f"data-{rows}-{areas}.{options['format']}"))
+                    for name, timing in self.run_size(path, options['repeat']):
+                        results.append({"rows": rows, "areas": areas, "name": name, **timing})
+                        self.stdout.write(f"  {name:<48} {timing['median_ms']:>10.2f} ms")
+                    utils.clear_dataset()
+                transaction.set_rollback(True)
+        finally:
+            utils.get_registry().clear()
+            invalidate_response_cache()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        report = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "environment": environment(),
+            "options": {
+                **{key: options[key] for key in ('sizes', 'repeat', 'format', 'missing')},
+                # Limits for comparing later runs with this one, when it is used as a baseline
+                "tolerance": DEFAULT_TOLERANCE if options['tolerance'] is None else options['tolerance'],
+                "floor_ms": DEFAULT_FLOOR_MS if options['floor_ms'] is None else options['floor_ms'],
+            },
+            "results": results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        baseline_path = options['baseline'] or (DEFAULT_BASELINE if DEFAULT_BASELINE.exists() else None)
+        if baseline_path and not options['no_compare'] \
+                and os.path.abspath(baseline_path) != os.path.abspath(options['output']):
+            with open(baseline_path, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            recorded = baseline.get('environment', {})
+            if any(recorded.get(key) != report['environment'][key] for key in ('host', 'machine', 'cpus')):
+                self.stdout.write(
+                    f"  note: {baseline_path} was recorded on another host ({recorded.get('host') or 'unknown'}); "
+                    "absolute timings may not be comparable"
+                )
+            tolerance, floor_ms = comparison_limits(options, baseline)
+            self.stdout.write(f"Comparing with {baseline_path}: tolerance {tolerance:.0%}, floor {floor_ms} ms")
+            regressions = compare_to_baseline(results, baseline, tolerance, floor_ms)
+            for entry in regressions:
+                self.stdout.write(
+                    f"  slower: {entry['name']} at {entry['rows']:,} rows: "
+                    f"{entry['baseline_ms']:.2f} -> {entry['min_ms']:.2f} ms"
+                )
+            if regressions:
+                raise CommandError(f"{len(regressions)} benchmark(s) regressed against {baseline_path}")
+            self.stdout.write(f"No regressions against {baseline_path}")
+
+    def run_size(self, path, repeat):
+        """Yield (name, timing) for every benchmark on the dataset stored at path"""
+        # Clearing first removes the snapshot too, so every timed load parses the file
+        yield 'utils.load_dataset', time_call(lambda: utils.load_dataset(path), repeat, setup=utils.clear_dataset)
+        yield 'utils.get_dataset (snapshot reload)', time_call(
+            utils.get_dataset, repeat, setup=utils.get_registry().clear
+        )
+
+        df = utils.get_dataset()
+        loaded = utils.dataset_for_frame(df)
+        counts = df['final_location'].value_counts()
+        busy, rare = str(counts.index[0]), str(counts.index[-1])
+        typo = busy[:2] + busy[3:] if len(busy) > 4 else busy
+        unknown = f"{busy}-nowhere"
+        third = str(counts.index[len(counts) // 2])
+
+        def cold_caches():
+            loaded.sort_permutations.clear()
+            loaded.parsed_queries.clear()
+            invalidate_response_cache()
+
+        benchmarks = [
+            ('utils.filter_by_area (busiest area)', lambda: utils.filter_by_area(df, busy)),
+            ('utils.filter_by_area (smallest area)', lambda: utils.filter_by_area(df, rare)),
+            ('utils.filter_by_area (substring)', lambda: utils.filter_by_area(df, busy[1:4])),
+            ('utils.filter_by_area (unknown name)', lambda: utils.filter_by_area(df, unknown)),
+            ('utils.get_yearly_stats', lambda: utils.get_yearly_stats(df, busy)),
+            ('utils.generate_real_summary', lambda: utils.generate_real_summary(busy, df)),
+            ('utils.generate_real_chart_data (price)', lambda: utils.generate_real_chart_data(busy, 'price')),
+            ('utils.generate_real_chart_data (demand)', lambda: utils.generate_real_chart_data(busy, 'demand')),
+            ('utils.generate_real_chart_data (composition)',
+             lambda: utils.generate_real_chart_data(busy, 'composition')),
+            ('utils.get_real_table_data', lambda: utils.get_real_table_data(busy, 50, 0)),
+            ('utils.get_real_table_data (sorted)',
+             lambda: utils.get_real_table_data(busy, 50, 0, 'flat_weighted_average_rate', 'desc')),
+            ('utils.export_data (csv)', lambda: utils.export_data(busy, 'csv')),
+            ('utils.compare_many', lambda: utils.compare_many([busy, third, rare])),
+            ('utils.generate_batch_summary (all areas)', lambda: utils.generate_batch_summary('all')),
+            ('utils.suggest_areas', lambda: utils.suggest_areas(busy[:2])),
+            ('utils.resolve_areas', lambda: utils.resolve_areas(f"prices in {typo}")),
+            ('utils.answer_chat', lambda: utils.answer_chat(f"price trend in {typo} since 2021")),
+        ]
+        for name, func in benchmarks:
+            yield name, time_call(func, repeat, setup=cold_caches)
+
+        client = Client()
+        endpoints = [
+            ('GET /api/areas/', '/api/areas/', {}),
+            ('GET /api/areas/suggest/', '/api/areas/suggest/', {'q': busy[:2]}),
+            ('GET /api/analyze/', '/api/analyze/', {'area': busy}),
+            ('GET /api/analyze/batch/', '/api/analyze/batch/', {'areas': 'all'}),
+            ('GET /api/chart/', '/api/chart/', {'area': busy, 'type': 'price'}),
+            ('GET /api/table/', '/api/table/', {'area': busy, 'limit': 50}),
+            ('GET /api/dashboard/', '/api/dashboard/', {'area': busy}),
+            ('GET /api/compare/', '/api/compare/', {'areas': f"{busy},{third},{rare}"}),
+            ('GET /api/export/ (csv)', '/api/export/', {'area': busy, 'format': 'csv'}),
+            ('GET /api/chat/', '/api/chat/', {'q': f"compare {busy} and {third}"}),
+        ]
+        for name, url, params in endpoints:
+            yield name, time_call(lambda: consume(client.get(url, params)), repeat, setup=cold_caches)
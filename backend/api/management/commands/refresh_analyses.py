@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from api import utils
+from api.models import DataSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the materialized per-area analyses (AreaAnalysis) of every dataset, "
+        "or of the datasets given by id or name."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('datasets', nargs='*', help="dataset ids or names (default: all)")
+
+    def handle(self, *args, **options):
+        if options['datasets']:
+            try:
+                rows = [utils.resolve_dataset(dataset) for dataset in options['datasets']]
+            except LookupError as e:
+                raise CommandError(str(e).strip("'\""))
+        else:
+            rows = list(DataSet.objects.order_by('id'))
+
+        for row in rows:
+            try:
+                loaded = utils.get_loaded_dataset(row.id)
+            except LookupError as e:
+                reason = str(e).strip("'\"")
+                self.stderr.write(f"Skipping dataset '{row.name}' (#{row.id}): {reason}")
+                continue
+            count = utils.materialize_analyses(row, loaded) if loaded is not None else 0
+            self.stdout.write(f"Dataset '{row.name}' (#{row.id}): {count} area analyses written")
+            # Datasets are loaded one at a time; free each before the next
+            utils.get_registry().discard(row.id)
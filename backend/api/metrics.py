@@ -0,0 +1,166 @@
+"""Request and stage timings, exposed as Prometheus histograms.
+
+Code marks a stage (load, filter, aggregate, llm, serialize) with
+`with stage('filter'):` or `@stage('filter')`. Inside a request,
+RequestMetricsMiddleware collects the stage times and observes them
+under the request's route once the response is ready.
+Outside a request (background ingest jobs, management commands) a stage
+is observed right away under route="background".
+
+Histograms are kept per process; with several workers every worker
+serves its own counts on /api/metrics/.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        # Prometheus buckets count observations <= their upper bound
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            if position < len(self.buckets):
+                series["buckets"][position] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self, **labels):
+        """(count, sum) observed for one label combination"""
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            return (series["count"], series["sum"]) if series else (0, 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {key: (list(value["buckets"]), value["sum"], value["count"]) for key, value in self.series.items()}
+        for key in sorted(series):
+            buckets, total, count = series[key]
+            labels = [f'{name}="{escape_label(value)}"' for name, value in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, observed in zip(self.buckets + (float('inf'),), buckets + [count - sum(buckets)]):
+                cumulative += observed
+                bucket_labels = ','.join(labels + [f'le="{format_value(bound)}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = '{%s}' % ','.join(labels) if labels else ''
+            lines.append(f"{self.name}_sum{suffix} {format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return '\n'.join(lines)
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', "Time to produce a response, by route.",
+    ['method', 'route', 'status'],
+)
+STAGE_DURATION = Histogram(
+    'request_stage_duration_seconds', "Time spent in each stage of a request, by route.",
+    ['route', 'stage'],
+)
+HISTOGRAMS = [REQUEST_DURATION, STAGE_DURATION]
+
+
+def render_metrics():
+    """Every histogram in the Prometheus text exposition format"""
+    return '\n'.join(histogram.render() for histogram in HISTOGRAMS) + '\n'
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+_timings = contextvars.ContextVar('request_timings', default=None)
+_stack = contextvars.ContextVar('stage_stack', default=())
+
+
+def record_stage(name, seconds):
+    timings = _timings.get()
+    if timings is None:
+        STAGE_DURATION.observe(seconds, route='background', stage=name)
+    else:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name):
+    """Time the block as stage `name`.
+
+    Stage times are exclusive: time spent in a stage nested inside another
+    (filtering inside a chart's aggregation, say) only counts for the inner
+    one. A stage entered again inside itself is timed once, by the
+    outermost block.
+    """
+    stack = _stack.get()
+    if any(frame[0] == name for frame in stack):
+        yield
+        return
+    frame = [name, 0.0]
+    token = _stack.set(stack + (frame,))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _stack.reset(token)
+        if stack:
+            stack[-1][1] += elapsed
+        record_stage(name, elapsed - frame[1])
+
+
+def start_request():
+    """Collect stages in a fresh dict until finish_request(token)"""
+    timings = {}
+    return timings, _timings.set(timings)
+
+
+def finish_request(token):
+    _timings.reset(token)
+
+
+def request_route(request):
+    """URL pattern a request matched, so metrics are not split per query or id"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return '/' + match.route.lstrip('^').rstrip('$') if match.route else match.view_name or 'unmatched'
+
+
+def server_timing(timings, total):
+    """Server-Timing header value, so browser dev tools show the stages"""
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(entries)
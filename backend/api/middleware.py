@@ -0,0 +1,57 @@
+import logging
+import time
+from .metrics import REQUEST_DURATION, STAGE_DURATION, finish_request, request_route, server_timing, start_request
+from .utils import pinned_datasets
+
+logger = logging.getLogger('api.requests')
+
+
+class DatasetPinMiddleware:
+    """Pin the datasets a request reads for its whole duration.
+
+    Response caching, analysis and cursors all see the same dataset
+    version, even when an upload or clear runs concurrently.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with pinned_datasets():
+            return self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """Time each request and its stages (see metrics.py).
+
+    Durations are observed in the /api/metrics/ histograms, returned in a
+    Server-Timing header and logged as one structured line per request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings, token = start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        elapsed = time.perf_counter() - start
+
+        route = request_route(request)
+        REQUEST_DURATION.observe(elapsed, method=request.method, route=route, status=response.status_code)
+        for name, seconds in timings.items():
+            STAGE_DURATION.observe(seconds, route=route, stage=name)
+
+        response['Server-Timing'] = server_timing(timings, elapsed)
+        logger.info("%s %s %s", request.method, request.path, response.status_code, extra={
+            "method": request.method,
+            "path": request.path,
+            "route": route,
+            "status": response.status_code,
+            "duration_ms": round(elapsed * 1000, 2),
+            "stages_ms": {name: round(seconds * 1000, 2) for name, seconds in timings.items()},
+        })
+        return response
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('file', models.FileField(upload_to='datasets/')),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('original_filename', models.CharField(max_length=255)),
+                ('file_size', models.IntegerField()),
+                ('columns', models.JSONField(default=list)),
+                ('record_count', models.IntegerField(default=0)),
+                ('area_count', models.IntegerField(default=0)),
+                ('version', models.CharField(blank=True, default='', max_length=128)),
+            ],
+            options={
+                'verbose_name': 'Dataset',
+                'verbose_name_plural': 'Datasets',
+            },
+        ),
+        migrations.CreateModel(
+            name='QueryLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query_text', models.TextField()),
+                ('area', models.CharField(blank=True, max_length=255, null=True)),
+                ('response_data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user_ip', models.GenericIPAddressField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Query Log',
+                'verbose_name_plural': 'Query Logs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AreaAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('area_name', models.CharField(max_length=255)),
+                ('analysis_data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analyses', to='api.dataset')),
+            ],
+            options={
+                'verbose_name': 'Area Analysis',
+                'verbose_name_plural': 'Area Analyses',
+                'unique_together': {('dataset', 'area_name')},
+            },
+        ),
+    ]
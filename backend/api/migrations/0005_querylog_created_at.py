@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_ingestjob_mode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='querylog',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_querylog_created_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dataset',
+            name='file_size',
+            field=models.BigIntegerField(),
+        ),
+    ]
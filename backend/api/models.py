@@ -1,14 +1,18 @@
 from django.db import models
+from django.utils import timezone
+
 
 class DataSet(models.Model):
     name = models.CharField(max_length=255)
     file = models.FileField(upload_to='datasets/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
     original_filename = models.CharField(max_length=255)
-    file_size = models.IntegerField()
+    file_size = models.BigIntegerField()
     columns = models.JSONField(default=list)
     record_count = models.IntegerField(default=0)
     area_count = models.IntegerField(default=0)
+    version = models.CharField(max_length=128, blank=True, default='')
+    memory_report = models.JSONField(default=dict, blank=True)
     
     def __str__(self):
         return self.name
@@ -17,6 +21,7 @@ class DataSet(models.Model):
         verbose_name = "Dataset"
         verbose_name_plural = "Datasets"
 
+
 class AreaAnalysis(models.Model):
     dataset = models.ForeignKey(DataSet, on_delete=models.CASCADE, related_name='analyses')
     area_name = models.CharField(max_length=255)
@@ -32,11 +37,13 @@ class AreaAnalysis(models.Model):
         verbose_name_plural = "Area Analyses"
         unique_together = ['dataset', 'area_name']
 
+
 class QueryLog(models.Model):
     query_text = models.TextField()
     area = models.CharField(max_length=255, blank=True, null=True)
     response_data = models.JSONField(default=dict)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the query is made; records are written later, in batches
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
     user_ip = models.GenericIPAddressField(blank=True, null=True)
     
     def __str__(self):
@@ -45,4 +52,38 @@ class QueryLog(models.Model):
     class Meta:
         verbose_name = "Query Log"
         verbose_name_plural = "Query Logs"
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+
+class IngestJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    MODE_CHOICES = [
+        ('replace', 'Replace'),
+        ('append', 'Append'),
+    ]
+    
+    name = models.CharField(max_length=255, blank=True, default='')
+    original_filename = models.CharField(max_length=255)
+    file_size = models.BigIntegerField(default=0)
+    mode = models.CharField(max_length=16, choices=MODE_CHOICES, default='replace')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='queued')
+    stage = models.CharField(max_length=32, default='queued')
+    rows_parsed = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    dataset = models.ForeignKey(DataSet, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Ingest of {self.original_filename} ({self.status})"
+    
+    class Meta:
+        verbose_name = "Ingest Job"
+        verbose_name_plural = "Ingest Jobs"
+        ordering = ['-created_at']
@@ -0,0 +1,197 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from functools import wraps
+from urllib.parse import urlencode
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+QUERY_TEXT_LIMIT = 2000
+
+
+def get_query_log_settings():
+    config = {
+        'ENABLED': True,
+        'ASYNC': True,
+        'BATCH_SIZE': 200,
+        'FLUSH_INTERVAL': 2.0,
+        'MAX_QUEUE': 10000,
+    }
+    config.update(getattr(settings, 'QUERY_LOG', {}))
+    return config
+
+
+class QueryLogWriter:
+    """Queue QueryLog records in memory and write them with bulk_create.
+
+    A daemon thread writes a batch once BATCH_SIZE records are waiting or
+    FLUSH_INTERVAL seconds have passed, so requests only pay for a
+    queue.put_nowait. When MAX_QUEUE records are already waiting (the
+    database is slower than the traffic), new records are dropped and
+    counted rather than making requests wait. close() runs at interpreter
+    exit and writes whatever is still queued.
+    """
+
+    def __init__(self):
+        self.queue = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.dropped = 0
+
+    def record(self, **fields):
+        """Queue one QueryLog row; with ASYNC off it is written immediately"""
+        config = get_query_log_settings()
+        if not config['ENABLED']:
+            return
+        fields.setdefault('created_at', timezone.now())
+        if not config['ASYNC']:
+            self.write([fields])
+            return
+        self.start(config)
+        try:
+            self.queue.put_nowait(fields)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def start(self, config):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.queue = queue.Queue(maxsize=config['MAX_QUEUE'])
+                self.stopping.clear()
+                self.thread = threading.Thread(target=self.run, name='query-log-writer', daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+
+    def run(self):
+        while not self.stopping.is_set():
+            config = get_query_log_settings()
+            self.write(self.take(config['BATCH_SIZE'], config['FLUSH_INTERVAL']))
+        # Shutting down: write everything that is still queued
+        while True:
+            batch = self.take(get_query_log_settings()['BATCH_SIZE'], 0)
+            if not batch:
+                break
+            self.write(batch)
+
+    def take(self, size, wait):
+        """Up to size queued records, waiting at most wait seconds for them"""
+        batch = []
+        deadline = time.monotonic() + wait
+        while len(batch) < size:
+            try:
+                if wait:
+                    item = self.queue.get(timeout=max(deadline - time.monotonic(), 0.001))
+                else:
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # close() woke us up: hand over what we have, then drain the rest
+                if wait:
+                    break
+                continue
+            batch.append(item)
+            if wait and time.monotonic() >= deadline:
+                break
+        return batch
+
+    def write(self, batch):
+        with self.lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.warning("Query log queue full, dropped %s records", dropped, extra={"dropped": dropped})
+        if not batch:
+            return
+        from .models import QueryLog
+        try:
+            QueryLog.objects.bulk_create([QueryLog(**fields) for fields in batch])
+        except Exception as e:
+            logger.exception("Could not write %s query log records: %s", len(batch), e)
+        finally:
+            if threading.current_thread() is self.thread:
+                close_old_connections()
+
+    def close(self, timeout=10):
+        """Stop the writer thread after it has written the queued records"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is None:
+            return
+        self.stopping.set()
+        try:
+            # Wake the thread if it is waiting on an empty queue
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+
+
+query_log = QueryLogWriter()
+
+
+def query_params(request):
+    """Query parameters of a request; JSON bodies are merged in for POSTs"""
+    params = {key: values[0] if len(values) == 1 else values for key, values in request.GET.lists()}
+    if request.method == 'POST' and request.content_type == 'application/json':
+        try:
+            body = json.loads(request.body or b'{}')
+        except ValueError:
+            body = None
+        if isinstance(body, dict):
+            params.update(body)
+    return params
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR') or None
+
+
+def logged_query(endpoint):
+    """Log every request to the decorated view (cache hits included) to QueryLog.
+
+    Use with method_decorator on an APIView's dispatch, outside
+    versioned_cache. The record is queued after the response is ready.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'POST'):
+                return view(request, *args, **kwargs)
+            # Read before the view so the JSON body is still available afterwards
+            params = query_params(request)
+            start = time.perf_counter()
+            response = view(request, *args, **kwargs)
+            elapsed = time.perf_counter() - start
+            try:
+                area = params.get('area') or params.get('areas') or ','.join(
+                    str(params[key]) for key in ('area1', 'area2') if params.get(key)
+                )
+                if isinstance(area, list):
+                    area = ','.join(str(value) for value in area)
+                text = params.get('message') or params.get('q') if endpoint == 'chat' else None
+                query_log.record(
+                    query_text=str(text or urlencode(params, doseq=True))[:QUERY_TEXT_LIMIT],
+                    area=str(area)[:255] or None,
+                    response_data={
+                        "endpoint": endpoint,
+                        "method": request.method,
+                        "status": response.status_code,
+                        "duration_ms": round(elapsed * 1000, 2),
+                    },
+                    user_ip=client_ip(request),
+                )
+            except Exception as e:
+                logger.warning("Could not queue query log record: %s", e)
+            return response
+        return wrapper
+    return decorator
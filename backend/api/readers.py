@@ -0,0 +1,89 @@
+import os
+import pandas as pd
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def get_batch_rows():
+    return getattr(settings, 'INGEST_BATCH_ROWS', 50000)
+
+
+def frame_from_rows(header, rows):
+    return pd.DataFrame.from_records(rows, columns=header)
+
+
+def excel_header(values):
+    """Column names for a header row, filling blanks the way pandas does"""
+    return [f"Unnamed: {i}" if value is None else value for i, value in enumerate(values)]
+
+
+def read_xlsx(path, batch_rows):
+    """Stream the first sheet of an .xlsx workbook with openpyxl's read-only mode"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = excel_header(header)
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row[:len(header)] + (None,) * (len(header) - len(row)))
+            if len(batch) >= batch_rows:
+                yield frame_from_rows(header, batch)
+                batch = []
+        if batch:
+            yield frame_from_rows(header, batch)
+    finally:
+        workbook.close()
+
+
+def read_excel_whole(path, batch_rows):
+    """Whole-sheet pandas reader, for formats openpyxl cannot stream (.xls)"""
+    df = pd.read_excel(path)
+    if not df.empty:
+        yield df
+
+
+def read_csv(path, batch_rows):
+    yield from pd.read_csv(path, chunksize=batch_rows, encoding='utf-8-sig')
+
+
+def read_parquet(path, batch_rows):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+        yield batch.to_pandas()
+
+
+READERS = {
+    '.xlsx': read_xlsx,
+    '.xls': read_excel_whole,
+    '.csv': read_csv,
+    '.parquet': read_parquet,
+}
+
+
+def get_readers():
+    """Reader per file extension; DATASET_READERS maps extensions to dotted paths to override or add one"""
+    readers = dict(READERS)
+    for extension, reader in getattr(settings, 'DATASET_READERS', {}).items():
+        readers[extension.lower()] = import_string(reader) if isinstance(reader, str) else reader
+    return readers
+
+
+def supported_extensions():
+    return sorted(get_readers())
+
+
+def iter_file_batches(path, batch_rows=None):
+    """DataFrames of at most batch_rows rows read from path with the reader for its extension"""
+    extension = os.path.splitext(path)[1].lower()
+    reader = get_readers().get(extension)
+    if reader is None:
+        raise ValueError(f"Unsupported file type: {extension or path}")
+    return reader(path, batch_rows or get_batch_rows())
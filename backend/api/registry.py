@@ -0,0 +1,193 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from .indexes import AreaIndex
+from .aggregates import AggregateCube, aggregate_columns
+
+
+class LoadedDataset:
+    """A normalized frame together with the structures derived from it.
+
+    Built once per dataset version and not modified afterwards; a changed
+    dataset gets a new instance.
+    """
+
+    def __init__(self, df, version, dataset_id=None, name=None, area_index=None, cube=None, original_positions=None):
+        # area_index and cube are only passed for a frame they were built from:
+        # by upsert(), or when reloading a snapshot with its stored derived state.
+        # original_positions is the upload order of a frame that is not in it
+        # (a snapshot stored clustered).
+        if area_index is None:
+            df, area_index = AreaIndex.build(df, original_positions)
+            cube = AggregateCube.build(df, area_index) if area_index is not None else None
+        self.df = df
+        self.area_index = area_index
+        self.cube = cube
+        self.version = version
+        self.dataset_id = dataset_id
+        self.name = name
+        self.nbytes = int(df.memory_usage(deep=True).sum())
+        self.sort_permutations = OrderedDict()
+        self.sort_lock = threading.Lock()
+        self.parsed_queries = OrderedDict()
+        self.query_lock = threading.Lock()
+
+    def upsert(self, delta, version):
+        """A new LoadedDataset with delta's rows merged in by (area, year).
+
+        delta must already be normalized. The index and aggregate cube are
+        only recomputed for the areas delta touches. When delta cannot be
+        keyed (no area column, or year in only one of the frames) or brings
+        new metric columns, its rows are appended and everything is rebuilt.
+        """
+        df, delta = align_frames(self.df, delta)
+        index = self.area_index
+        if index is None or index.column not in delta.columns or ('year' in df.columns) != ('year' in delta.columns):
+            positions = None
+            if index is not None:
+                # df is clustered: keep its upload order, with delta's rows after it
+                offset = int(index.original_positions.max()) + 1 if len(df) else 0
+                positions = np.concatenate([index.original_positions, offset + np.arange(len(delta), dtype=np.int64)])
+            return LoadedDataset(
+                pd.concat([df, delta], ignore_index=True), version, self.dataset_id, self.name,
+                original_positions=positions,
+            )
+
+        merged, merged_index, affected, old_to_new = index.upsert(df, delta)
+        if self.cube is not None and aggregate_columns(merged) == aggregate_columns(self.df):
+            cube = self.cube.upsert(merged, merged_index, affected, old_to_new)
+        else:
+            cube = AggregateCube.build(merged, merged_index)
+        return LoadedDataset(merged, version, self.dataset_id, self.name, merged_index, cube)
+
+
+def align_frames(df, delta):
+    """df and delta with the same columns in df's order, ready to concatenate.
+
+    Categorical columns of df get delta's new values as extra categories
+    (existing codes are untouched) so the concatenation stays categorical.
+    df itself is not modified.
+    """
+    df = df.copy(deep=False)
+    delta = delta.copy(deep=False)
+    for col in delta.columns.difference(df.columns):
+        df[col] = np.nan
+    for col in df.columns.difference(delta.columns):
+        delta[col] = np.nan
+    delta = delta[list(df.columns)]
+
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            incoming = delta[col].dropna().unique()
+            extra = pd.Index(incoming).difference(df[col].cat.categories)
+            if len(extra):
+                df[col] = df[col].cat.add_categories(extra)
+            delta[col] = delta[col].astype(df[col].dtype)
+    return df, delta
+
+
+class DatasetRegistry:
+    """LRU of loaded datasets, keyed by DataSet id and bounded by a byte budget.
+
+    Evicted datasets are dropped from memory only; the next get() reloads
+    them through the loader from their stored snapshot. The most recently
+    used dataset is always kept, even if it alone exceeds the budget.
+
+    Concurrent misses for the same dataset wait for a single load. A load
+    that finishes after the dataset was discarded or cleared is returned
+    to its caller but not kept.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()
+        self.frames = {}
+        self.lock = threading.RLock()
+        self.load_locks = {}
+        self.generation = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def _lookup(self, dataset_id, version):
+        loaded = self.entries.get(dataset_id)
+        if loaded is not None and loaded.version == version:
+            self.entries.move_to_end(dataset_id)
+            return loaded
+        return None
+
+    def get(self, dataset_id, version, loader):
+        with self.lock:
+            loaded = self._lookup(dataset_id, version)
+            if loaded is not None:
+                return loaded
+            load_lock = self.load_locks.setdefault(dataset_id, threading.Lock())
+
+        with load_lock:
+            with self.lock:
+                loaded = self._lookup(dataset_id, version)
+                if loaded is not None:
+                    return loaded
+                generation = self.generation
+
+            loaded = loader()
+            with self.lock:
+                self.loads += 1
+                if generation != self.generation:
+                    return loaded
+                return self.put(dataset_id, loaded)
+
+    def put(self, dataset_id, loaded):
+        with self.lock:
+            self._remove(dataset_id)
+            self.entries[dataset_id] = loaded
+            self.frames[id(loaded.df)] = loaded
+            self._evict()
+        return loaded
+
+    def _evict(self):
+        while len(self.entries) > 1 and self.total_bytes() > self.budget_bytes:
+            _, loaded = self.entries.popitem(last=False)
+            self.frames.pop(id(loaded.df), None)
+            self.evictions += 1
+
+    def _remove(self, dataset_id):
+        loaded = self.entries.pop(dataset_id, None)
+        if loaded is not None:
+            self.frames.pop(id(loaded.df), None)
+
+    def discard(self, dataset_id):
+        with self.lock:
+            self._remove(dataset_id)
+            self.load_locks.pop(dataset_id, None)
+            self.generation += 1
+
+    def find(self, df):
+        """The loaded dataset whose frame is df, if it is still in memory"""
+        loaded = self.frames.get(id(df))
+        if loaded is not None and loaded.df is df:
+            return loaded
+        return None
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.frames.clear()
+            self.load_locks.clear()
+            self.generation += 1
+
+    def total_bytes(self):
+        return sum(loaded.nbytes for loaded in self.entries.values())
+
+    def usage(self):
+        with self.lock:
+            return {
+                "budget_bytes": self.budget_bytes,
+                "used_bytes": self.total_bytes(),
+                "loaded": [
+                    {"id": dataset_id, "name": loaded.name, "bytes": loaded.nbytes}
+                    for dataset_id, loaded in self.entries.items()
+                ],
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
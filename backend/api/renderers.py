@@ -0,0 +1,10 @@
+from rest_framework import renderers
+from .metrics import stage
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """DRF's JSONRenderer, timed as the request's serialize stage"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with stage('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -1,12 +1,23 @@
+from django.conf import settings
 from rest_framework import serializers
+from .readers import supported_extensions
+
+def get_max_upload_size():
+    return getattr(settings, 'MAX_UPLOAD_SIZE', 1024 * 1024 * 1024)
 
 class FileUploadSerializer(serializers.Serializer):
     file = serializers.FileField()
+    name = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    # append merges the file into `dataset` (default: the latest upload) by (area, year)
+    mode = serializers.ChoiceField(choices=['replace', 'append'], default='replace')
+    dataset = serializers.CharField(required=False, allow_blank=True)
     
     def validate_file(self, value):
-        if not value.name.endswith(('.xlsx', '.xls')):
-            raise serializers.ValidationError("Only Excel files (.xlsx, .xls) are supported")
-        if value.size > 10485760:
-            raise serializers.ValidationError("File size too large. Maximum size is 10MB.")
+        extensions = supported_extensions()
+        if not value.name.lower().endswith(tuple(extensions)):
+            raise serializers.ValidationError(f"Unsupported file type. Supported types: {', '.join(extensions)}")
+        max_size = get_max_upload_size()
+        if value.size > max_size:
+            raise serializers.ValidationError(f"File size too large. Maximum size is {max_size // (1024 * 1024)}MB.")
         
-        return value
\ No newline at end of file
+        return value
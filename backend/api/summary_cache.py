@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+def get_summary_cache_settings():
+    config = {
+        'DIR': os.path.join(tempfile.gettempdir(), 'realestate_ai_summaries'),
+        'TTL': 7 * 24 * 3600,
+        'MAX_ENTRIES': 5000,
+    }
+    config.update(getattr(settings, 'AI_SUMMARY_CACHE', {}))
+    return config
+
+
+def summary_cache_key(summary_data, model, prompt_version):
+    """Content address of an LLM summary: the exact input payload, model and prompt version"""
+    payload = json.dumps(
+        {'data': summary_data, 'model': model, 'prompt_version': prompt_version},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    """Disk cache of AI summaries, one JSON file per content key.
+
+    Entries older than TTL are ignored and removed on read; once more than
+    MAX_ENTRIES files exist the least recently written ones are evicted.
+    Files are tracked in memory in write order, so a write does not list
+    the directory. It is rescanned every MAX_ENTRIES // 10 writes to pick
+    up files written by other processes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries = None
+        self.entries_dir = None
+        self.writes = 0
+
+    def directory(self):
+        path = str(get_summary_cache_settings()['DIR'])
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def path_for(self, key):
+        return os.path.join(self.directory(), f"{key}.json")
+
+    def get(self, key):
+        path = self.path_for(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+
+        ttl = get_summary_cache_settings()['TTL']
+        if ttl and time.time() - entry.get('created', 0) > ttl:
+            self._remove(path)
+            self._forget(path)
+            self._count('misses')
+            return None
+
+        self._count('hits')
+        return entry.get('summary')
+
+    def set(self, key, summary):
+        path = self.path_for(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'created': time.time()}, f)
+        os.replace(temp_path, path)
+        self._evict(path)
+
+    def _scan(self, directory):
+        """Cache files in directory, oldest write first"""
+        files = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.json'):
+                try:
+                    files.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        return OrderedDict((path, None) for _, path in sorted(files))
+
+    def _evict(self, written):
+        max_entries = get_summary_cache_settings()['MAX_ENTRIES']
+        directory = os.path.dirname(written)
+        with self.lock:
+            self.writes += 1
+            if self.entries is None or self.entries_dir != directory or self.writes >= max(max_entries // 10, 1):
+                self.entries, self.entries_dir, self.writes = self._scan(directory), directory, 0
+            self.entries.pop(written, None)
+            self.entries[written] = None
+            victims = [self.entries.popitem(last=False)[0] for _ in range(len(self.entries) - max_entries)]
+        for path in victims:
+            if self._remove(path):
+                self._count('evictions')
+
+    def _forget(self, path):
+        with self.lock:
+            if self.entries is not None:
+                self.entries.pop(path, None)
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def clear(self):
+        directory = self.directory()
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.json'):
+                self._remove(entry.path)
+        with self.lock:
+            self.entries = None
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+summary_cache = SummaryCache()
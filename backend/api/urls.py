@@ -3,17 +3,26 @@ from .views import (
     UploadView, AreasView, AnalyzeView, 
     ChartView, TableView, HealthCheckView,
     DatasetInfoView, ClearDatasetView, ExportView,
-    CompareView
+    CompareView, DatasetsView, JobStatusView, AnalyzeBatchView,
+    DashboardView, AreaSuggestView, AreaResolveView, ChatView, MetricsView
 )
 urlpatterns = [
     path('upload/', UploadView.as_view(), name='upload'),
     path('areas/', AreasView.as_view(), name='areas'),
+    path('areas/suggest/', AreaSuggestView.as_view(), name='areas-suggest'),
+    path('areas/resolve/', AreaResolveView.as_view(), name='areas-resolve'),
     path('analyze/', AnalyzeView.as_view(), name='analyze'),
+    path('analyze/batch/', AnalyzeBatchView.as_view(), name='analyze-batch'),
     path('chart/', ChartView.as_view(), name='chart'),
+    path('chat/', ChatView.as_view(), name='chat'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
     path('table/', TableView.as_view(), name='table'),
     path('export/', ExportView.as_view(), name='export'),
     path('compare/', CompareView.as_view(), name='compare'),
+    path('jobs/<int:job_id>/', JobStatusView.as_view(), name='job-status'),
+    path('datasets/', DatasetsView.as_view(), name='datasets'),
     path('dataset-info/', DatasetInfoView.as_view(), name='dataset-info'),
     path('clear-dataset/', ClearDatasetView.as_view(), name='clear-dataset'),
     path('health/', HealthCheckView.as_view(), name='health'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
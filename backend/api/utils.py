@@ -1,151 +1,842 @@
 import pandas as pd
 import numpy as np
 import os
+import glob
+import hashlib
 import tempfile
+import shutil
+import base64
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
 from typing import Dict, List, Any, Optional
 import json
-_current_dataset = None
-_dataset_path = None
+import logging
+from urllib.parse import urlencode
+from django.conf import settings
+from django.db import transaction
+from .indexes import AREA_COLUMNS, AreaIndex, tokenize
+from .intents import parse_query
+from .aggregates import PRICE_COLUMNS, RECORDS, AggregateCube, aggregate_by_year, aggregate_columns, combine, frame_totals, mean, totals
+from .cache import invalidate_response_cache
+from .summary_cache import summary_cache, summary_cache_key
+from .exports import excel_sheet_name, iter_excel, iter_export
+from .registry import DatasetRegistry, LoadedDataset
+from .metrics import stage
+from .readers import iter_file_batches
+from .shared import current_dataset_row, publish_current_dataset
+logger = logging.getLogger(__name__)
+_registry = DatasetRegistry(getattr(settings, 'DATASET_MEMORY_BUDGET', 1024 * 1024 * 1024))
 
-def load_dataset(path=None):
-    """Load dataset from Excel file with proper column handling"""
-    global _current_dataset, _dataset_path
+# Bump whenever normalization changes so stale snapshots are not reused
+SNAPSHOT_FORMAT_VERSION = 4
+# Snapshot column holding each clustered row's position in the upload
+SNAPSHOT_POSITIONS = '__original_position'
+
+# Bump whenever AreaIndex or AggregateCube change so stored ones are rebuilt
+DERIVED_FORMAT_VERSION = 2
+
+def get_snapshot_dir():
+    """Directory holding columnar snapshots of uploaded datasets"""
+    snapshot_dir = getattr(settings, 'DATASET_SNAPSHOT_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'datasets')
+    os.makedirs(snapshot_dir, exist_ok=True)
+    return str(snapshot_dir)
+
+def file_digest(path):
+    """SHA-1 of a file's contents, read in blocks"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def snapshot_path_for(path, digest=None):
+    """Content-addressed snapshot location for a source file"""
+    name = f"dataset-v{SNAPSHOT_FORMAT_VERSION}-{digest or file_digest(path)}.arrow"
+    return os.path.join(get_snapshot_dir(), name)
+
+def save_snapshot(df, path, original_positions=None):
+    """Write the normalized frame as an uncompressed Arrow IPC (Feather v2) file so it can be memory-mapped.
+
+    Every column is written as a single contiguous chunk and float NaNs are
+    kept as values rather than nulls, so load_snapshot can map numeric
+    columns straight into numpy without copying. df is stored in the order
+    given (clustered by area, for an indexed dataset); original_positions,
+    the upload position of each of its rows, is stored with it so a reload
+    returns multi-area matches in the same order as the first load.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        
+        df = df.reset_index(drop=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        for i, col in enumerate(df.columns):
+            if pd.api.types.is_float_dtype(df[col].dtype) and not isinstance(df[col].dtype, pd.api.extensions.ExtensionDtype):
+                table = table.set_column(i, table.field(i), pa.array(df[col].to_numpy(), from_pandas=False))
+        if original_positions is not None:
+            table = table.append_column(SNAPSHOT_POSITIONS, pa.array(np.asarray(original_positions, dtype=np.int64)))
+        table = table.combine_chunks()
+        
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with ipc.new_file(temp_path, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+        os.replace(temp_path, path)
+        logger.debug("Snapshot written", extra={"snapshot": path})
+        return path
+    except Exception as e:
+        logger.warning("Could not write snapshot, the source file will be re-parsed on reload: %s", e)
+        if 'temp_path' in locals() and os.path.exists(temp_path):
+            os.unlink(temp_path)
+        return None
+
+def load_snapshot(path):
+    """Memory-map a snapshot written by save_snapshot; returns (df, original_positions).
+
+    original_positions is None for snapshots stored without it. In shared mode, null-free numeric columns become read-only numpy views
+    of the mapped file and string columns stay Arrow-backed, so every
+    worker attached to the same snapshot shares its pages through the OS
+    page cache instead of holding a private copy.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    
+    table = feather.read_table(path, memory_map=True)
+    positions = None
+    if SNAPSHOT_POSITIONS in table.column_names:
+        positions = table.column(SNAPSHOT_POSITIONS).to_numpy()
+        table = table.drop_columns([SNAPSHOT_POSITIONS])
+    if not getattr(settings, 'DATASET_SHARED_MODE', True):
+        return table.to_pandas(), positions
     
+    zero_copy = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)) \
+                and column.num_chunks == 1 and column.null_count == 0:
+            zero_copy[name] = column.chunk(0).to_numpy(zero_copy_only=True)
+    
+    if not zero_copy:
+        return table.to_pandas(), positions
+    
+    # Build the numeric part from the views first; adding the remaining
+    # columns afterwards keeps pandas from consolidating (copying) the views
+    df = pd.DataFrame(zero_copy, copy=False)
+    rest = table.drop_columns(list(zero_copy)).to_pandas()
+    for name in rest.columns:
+        df[name] = rest[name].array
+    return df[table.column_names], positions
+
+DERIVED_POSITIONS = 'original_positions'
+
+def derived_path_for(snapshot):
+    """Sidecar file holding the area index layout and aggregate cube of a snapshot"""
+    return f"{os.path.splitext(snapshot)[0]}.index-v{DERIVED_FORMAT_VERSION}.arrow"
+
+def save_derived_state(loaded, snapshot):
+    """Store loaded's area index layout and aggregate cube next to its snapshot.
+
+    Clustering and aggregation dominate a cold load, so with this file a
+    restarted worker only maps the snapshot and reads a table of
+    (area, year) stats. The file holds a single row: the cube's columns,
+    named "column/stat", and the index's original_positions (the upload
+    order of the clustered rows) are stored as list values; the rest of the
+    index layout goes in the schema metadata. Failures are logged and only
+    cost that speed-up.
+    """
+    if loaded.area_index is None or loaded.cube is None:
+        return None
+    path = derived_path_for(snapshot)
+    temp_path = f"{path}.{os.getpid()}.tmp"
     try:
-        if path and os.path.exists(path):
-            print(f"Loading dataset from: {path}")
-            df = pd.read_excel(path, engine='openpyxl')
-            _dataset_path = path
-            print(f"Loaded {len(df)} records from uploaded file")
-            
-        elif _dataset_path and os.path.exists(_dataset_path):
-            print(f"Loading dataset from cached path: {_dataset_path}")
-            df = pd.read_excel(_dataset_path, engine='openpyxl')
-            
-        else:
-            print("No dataset available. Please upload an Excel file.")
-            return pd.DataFrame()
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        
+        index = loaded.area_index
+        flat = loaded.cube.stats.copy()
+        flat.columns = [f"{col}/{stat}" for col, stat in flat.columns]
+        layout = {
+            "version": loaded.version,
+            "rows": len(loaded.df),
+            "column": index.column,
+            "keys": [str(key) for key in index.keys],
+            "names": [str(name) for name in index.names],
+            "starts": np.asarray(index.starts).tolist(),
+            "stops": np.asarray(index.stops).tolist(),
+        }
+        stats = pa.Table.from_pandas(flat.reset_index(), preserve_index=False).combine_chunks()
+        columns = {name: stats.column(name).chunk(0) for name in stats.column_names}
+        columns[DERIVED_POSITIONS] = pa.array(np.asarray(index.original_positions, dtype=np.int64))
+        # The cube and the positions have different lengths, so each column is one list value
+        table = pa.table({
+            name: pa.ListArray.from_arrays(pa.array([0, len(values)], pa.int32()), values)
+            for name, values in columns.items()
+        })
+        table = table.replace_schema_metadata({b'area_index': json.dumps(layout).encode('utf-8')})
+        with ipc.new_file(temp_path, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(temp_path, path)
+        return path
+    except Exception as e:
+        logger.warning("Could not store the index of %s, it will be rebuilt on reload: %s", snapshot, e)
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        return None
+
+def load_derived_state(snapshot, df, version):
+    """(AreaIndex, AggregateCube) stored by save_derived_state for df, or None if absent or stale"""
+    path = derived_path_for(snapshot)
+    if not os.path.exists(path):
+        return None
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        
+        table = feather.read_table(path)
+        layout = json.loads(table.schema.metadata[b'area_index'])
+        if layout['version'] != version or layout['rows'] != len(df) or layout['column'] not in df.columns:
+            return None
+        columns = {name: table.column(name).chunk(0).flatten() for name in table.column_names}
+        positions = columns.pop(DERIVED_POSITIONS).to_numpy()
+        if len(positions) != len(df):
+            return None
+        stats = pa.table(columns).to_pandas().set_index(['area', 'year'])
+        stats.columns = pd.MultiIndex.from_tuples([tuple(col.rsplit('/', 1)) for col in stats.columns])
+        index = AreaIndex(
+            layout['column'], layout['keys'], layout['names'],
+            np.asarray(layout['starts'], dtype=np.int64), np.asarray(layout['stops'], dtype=np.int64),
+            positions,
+        )
+        return index, AggregateCube(stats)
+    except Exception as e:
+        logger.warning("Could not read the stored index of %s, rebuilding it: %s", snapshot, e)
+        return None
+
+def upload_positions(loaded):
+    """Upload position of each row of loaded.df, or None when its rows were not reordered"""
+    return loaded.area_index.original_positions if loaded.area_index is not None else None
+
+def load_snapshot_dataset(path, version, dataset_id=None, name=None):
+    """LoadedDataset for a snapshot, reusing its stored index and cube when they match"""
+    df, positions = load_snapshot(path)
+    derived = load_derived_state(path, df, version)
+    if derived is not None:
+        return LoadedDataset(df, version, dataset_id, name, *derived)
+    loaded = LoadedDataset(df, version, dataset_id, name, original_positions=positions)
+    # Snapshots from before derived state was stored gain it on first load
+    save_derived_state(loaded, path)
+    return loaded
+
+def remove_snapshot(path):
+    """Delete a stored dataset file and its derived state, in any format version"""
+    derived = glob.glob(f"{glob.escape(os.path.splitext(path)[0])}.index-v*.arrow")
+    for stored in [path, *derived]:
+        if os.path.exists(stored):
+            os.unlink(stored)
+
+def coerce_numeric(series):
+    """Numeric version of a text column ("1,250" -> 1250), or the column unchanged if any value is not a number"""
+    if not (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)):
+        return series
+    sample = series.dropna().head(100).astype(str).str.replace(',', '', regex=False).str.strip()
+    if pd.to_numeric(sample, errors='coerce').isna().any():
+        # Cheap rejection for text columns such as city names
+        return series
+    
+    # Parse the column as-is first; only values that fail (thousands
+    # separators, padding) go through string cleanup
+    present = series.notna()
+    converted = pd.to_numeric(series, errors='coerce')
+    failed = present & converted.isna()
+    if failed.any():
+        retried = pd.to_numeric(series[failed].astype(str).str.replace(',', '', regex=False).str.strip(), errors='coerce')
+        if retried.isna().any():
+            return series
+        converted = converted.astype(float)
+        converted[failed] = retried
+    return converted
+
+def unify_text_column(series):
+    """Column holding values of several Python types (1, 2, 'x') as text, so it has a single Arrow type"""
+    if not pd.api.types.is_object_dtype(series.dtype) or not pd.api.types.infer_dtype(series, skipna=True).startswith('mixed'):
+        return series
+    return series.where(series.isna(), series.astype(str))
+
+CATEGORY_COLUMNS = AREA_COLUMNS + ['city', 'district', 'region', 'zone']
+
+def compact_dataset(df):
+    """Shrink a normalized frame: smallest integer dtypes and categorical area/city columns.
+
+    Floats stay float64 because aggregates sum in the column dtype.
+    Returns (df, report) with each column's dtype and bytes before and after.
+    """
+    before = df.memory_usage(deep=True, index=False)
+    dtypes_before = df.dtypes.astype(str)
+    
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype) \
+                and not isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            df[col] = pd.to_numeric(series, downcast='integer')
+        elif col in CATEGORY_COLUMNS and (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)):
+            df[col] = series.astype('category')
+    
+    after = df.memory_usage(deep=True, index=False)
+    report = {
+        "bytes_before": int(before.sum()),
+        "bytes": int(after.sum()),
+        "columns": {
+            str(col): {
+                "dtype_before": dtypes_before[col],
+                "dtype": str(df[col].dtype),
+                "bytes_before": int(before[col]),
+                "bytes": int(after[col]),
+            }
+            for col in df.columns
+        },
+    }
+    return df, report
+
+def log_memory_report(report):
+    logger.debug("Dataset compacted from %s to %s bytes", f"{report['bytes_before']:,}", f"{report['bytes']:,}",
+                 extra={"columns": report["columns"]})
+
+def normalize_dataset(df):
+    """Normalize column names and coerce numeric text columns"""
+    df.columns = [str(col).strip().lower().replace(' ', '_').replace('-', '_') for col in df.columns]
+    
+    if 'year' in df.columns:
+        df['year'] = pd.to_numeric(df['year'], errors='coerce').fillna(0).astype(int)
+    
+    for col in df.columns:
+        if col != 'final_location':
+            df[col] = coerce_numeric(df[col])
+    
+    if 'final_location' in df.columns:
+        df['final_location'] = df['final_location'].astype(str).str.strip()
+    
+    return df
+
+def dataset_version_from_snapshot(path):
+    """Snapshots are content-addressed, so their name doubles as a version shared by all workers"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+def read_dataset_file(path, progress=None, memory_report=None):
+    """Parse, normalize and compact an uploaded file batch by batch.
+
+    Batches come from the reader registered for the file's extension (see
+    readers.py) and are normalized as they arrive. Columns whose type
+    differed between batches are coerced once more after concatenation,
+    and columns still mixing numbers and text become text, so the frame
+    always fits an Arrow snapshot. The frame is then compacted; pass a dict as memory_report to receive
+    compact_dataset's report.
+    """
+    logger.info("Reading dataset file", extra={"path": path})
+    batches = []
+    rows = 0
+    for batch in iter_file_batches(path):
+        batches.append(normalize_dataset(batch))
+        rows += len(batch)
+        if progress:
+            progress('reading', rows)
+    
+    if not rows:
+        logger.warning("Uploaded file has no records", extra={"path": path})
+        return pd.DataFrame()
+    
+    df = pd.concat(batches, ignore_index=True) if len(batches) > 1 else batches[0]
+    for col in df.columns:
+        if col != 'final_location' and pd.api.types.is_object_dtype(df[col].dtype):
+            if len(batches) > 1:
+                df[col] = coerce_numeric(df[col])
+            # Numbers in some batches (or cells) and text in others: keep it all as text
+            df[col] = unify_text_column(df[col])
+    
+    df, report = compact_dataset(df)
+    log_memory_report(report)
+    if memory_report is not None:
+        memory_report.update(report)
+    return df
+
+def get_registry():
+    return _registry
+
+_pins = contextvars.ContextVar('dataset_pins', default=None)
+
+@contextmanager
+def pinned_datasets():
+    """Resolve each dataset param at most once inside the block.
+
+    Uploads and clears swap datasets in by replacing whole LoadedDataset
+    objects, never by mutating them, so a request that pins the row and
+    frame it first sees keeps reading one consistent version even if a
+    swap lands halfway through it.
+    """
+    if _pins.get() is not None:
+        # Already pinned by an enclosing block (e.g. the request middleware)
+        yield
+        return
+    token = _pins.set({"rows": {}, "loaded": {}, "memo": {}})
+    try:
+        yield
+    finally:
+        _pins.reset(token)
+
+def request_memo(kind, df, area, compute):
+    """compute() once per (kind, frame, area) inside a pinned block, every call outside one"""
+    pins = _pins.get()
+    if pins is None:
+        return compute()
+    key = (kind, id(df), str(area).lower().strip())
+    entry = pins["memo"].get(key)
+    # Keeping df in the entry keeps its id from being reused within the block
+    if entry is None or entry[0] is not df:
+        entry = pins["memo"][key] = (df, compute())
+    return entry[1]
+
+def pin_key(dataset):
+    return '' if dataset in (None, '') else str(dataset).strip()
+
+def dataset_for_frame(df):
+    """The LoadedDataset a frame returned by get_dataset/load_dataset belongs to"""
+    pins = _pins.get()
+    if pins is not None:
+        for loaded in pins["loaded"].values():
+            if loaded.df is df:
+                return loaded
+    return _registry.find(df)
+
+def resolve_dataset(dataset=None):
+    """DataSet row for an id or name, or the latest upload when dataset is empty.
+
+    Returns None when nothing has been uploaded; raises LookupError for an
+    unknown id or name.
+    """
+    from .models import DataSet
+    
+    pins = _pins.get()
+    key = pin_key(dataset)
+    if pins is not None and key in pins["rows"]:
+        return pins["rows"][key]
+    
+    rows = DataSet.objects.order_by('-uploaded_at', '-id')
+    if not key:
+        row = current_dataset_row(lambda: rows.first())
+    else:
+        row = rows.filter(pk=int(key)).first() if key.isdigit() else rows.filter(name=key).first()
+        if row is None:
+            raise LookupError(f"Dataset '{key}' not found")
+    
+    if pins is not None:
+        pins["rows"][key] = row
+    return row
+
+def dataset_file_path(row):
+    return os.path.join(settings.MEDIA_ROOT, row.file.name)
+
+@stage('load')
+def load_registered_dataset(row):
+    """Rebuild a LoadedDataset from a DataSet row's stored file"""
+    path = dataset_file_path(row)
+    if path.endswith('.arrow'):
+        logger.info("Loading dataset from snapshot", extra={"dataset": row.id, "snapshot": path})
+        return load_snapshot_dataset(path, row.version, row.id, row.name)
+    return LoadedDataset(read_dataset_file(path), row.version, row.id, row.name)
+
+def get_loaded_dataset(dataset=None):
+    """In-memory dataset for an id or name (default: latest upload), loading it if evicted"""
+    row = resolve_dataset(dataset)
+    if row is None:
+        return None
+    
+    pins = _pins.get()
+    if pins is not None and row.id in pins["loaded"]:
+        return pins["loaded"][row.id]
+    try:
+        loaded = _registry.get(row.id, row.version, lambda: load_registered_dataset(row))
+    except FileNotFoundError:
+        # Cleared by another request after this one resolved it
+        raise LookupError(f"Dataset '{row.name}' was removed")
+    if pins is not None:
+        pins["loaded"][row.id] = loaded
+    return loaded
+
+def warm_start():
+    """Load the default dataset and its derived state into memory.
+
+    Run in a background thread by start_warm_start, so a server process's
+    early requests find the dataset loaded instead of each paying for the
+    load. Requests arriving while it runs wait for the same load through
+    the registry rather than starting another.
+    """
+    start = time.perf_counter()
+    try:
+        loaded = get_loaded_dataset()
+        if loaded is not None:
+            logger.info("Warm start loaded dataset '%s'", loaded.name, extra={
+                "dataset": loaded.dataset_id, "records": len(loaded.df),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            })
+        return loaded
+    except Exception as e:
+        logger.warning("Warm start failed, the dataset will load on first use: %s", e)
+        return None
+
+_warm_start_lock = threading.Lock()
+_warm_start_pid = None
+
+def start_warm_start():
+    """Run warm_start in a daemon thread, once per process, unless DATASET_WARM_START is off.
+
+    Only call this in a process that serves requests. A thread started
+    before a server forks its workers (gunicorn --preload imports the app
+    in the master) would leave the workers its locks and database
+    connection in whatever state they were in at the fork.
+    """
+    from django.db import close_old_connections
+    
+    global _warm_start_pid
+    if not getattr(settings, 'DATASET_WARM_START', True):
+        return None
+    with _warm_start_lock:
+        if _warm_start_pid == os.getpid():
+            return None
+        _warm_start_pid = os.getpid()
+    
+    def run():
+        try:
+            warm_start()
+        finally:
+            close_old_connections()
+    
+    thread = threading.Thread(target=run, name='dataset-warm-start', daemon=True)
+    thread.start()
+    return thread
+
+def warm_start_on_request(sender, **kwargs):
+    """request_started receiver: warm start the process handling its first request"""
+    start_warm_start()
+
+def get_dataset_version(dataset=None):
+    """Identifier of the data served for a dataset param; changes on every upload or clear"""
+    try:
+        row = resolve_dataset(dataset)
+    except LookupError:
+        return 'missing'
+    return f"{row.id}-{row.version}" if row else 'empty'
+
+@stage('load')
+def ingest_dataset(path, name=None, original_filename=None, progress=None):
+    """Parse, index and register a file as the default dataset; raises on failure.
+
+    progress, when given, is called as progress(stage, rows_parsed) as the
+    ingest moves through reading, indexing, snapshotting, registering and
+    materializing (see materialize_analyses).
+    Returns the registered LoadedDataset, or None for an empty file.
+    """
+    from .models import DataSet
+    
+    report = progress or (lambda stage, rows=None: None)
+    
+    digest = file_digest(path)
+    snapshot = snapshot_path_for(path, digest)
+    report('reading')
+    memory_report = {}
+    version = dataset_version_from_snapshot(snapshot)
+    if os.path.exists(snapshot):
+        logger.info("Reusing existing snapshot", extra={"snapshot": snapshot})
+        loaded = load_snapshot_dataset(snapshot, version)
+        previous = DataSet.objects.filter(version=version).exclude(memory_report={}).first()
+        memory_report = previous.memory_report if previous else {}
+    else:
+        df = read_dataset_file(path, progress=report, memory_report=memory_report)
         if df.empty:
-            print("Warning: Loaded dataset is empty")
-            return df
+            return None
+        report('indexing', len(df))
+        loaded = LoadedDataset(df, version)
+    df = loaded.df
+    
+    report('snapshotting', len(df))
+    stored_path = snapshot if os.path.exists(snapshot) else save_snapshot(df, snapshot, upload_positions(loaded))
+    if stored_path is not None and not os.path.exists(derived_path_for(stored_path)):
+        save_derived_state(loaded, stored_path)
+    if stored_path is None:
+        # Keep the source so the dataset can still be reloaded after eviction
+        stored_path = os.path.join(get_snapshot_dir(), f"source-{digest}{os.path.splitext(path)[1]}")
+        shutil.copyfile(path, stored_path)
+    
+    report('registering', len(df))
+    original_filename = original_filename or os.path.basename(path)
+    row = DataSet(
+        name=name or original_filename,
+        original_filename=original_filename,
+        file_size=os.path.getsize(path),
+        columns=list(df.columns),
+        record_count=len(df),
+        area_count=len(loaded.area_index.keys) if loaded.area_index else 0,
+        version=loaded.version,
+        memory_report=memory_report,
+    )
+    row.file.name = os.path.relpath(stored_path, settings.MEDIA_ROOT)
+    row.save()
+    
+    loaded.dataset_id = row.id
+    loaded.name = row.name
+    _registry.put(row.id, loaded)
+    report('materializing', len(df))
+    try_materialize_analyses(row, loaded)
+    publish_current_dataset(row)
+    invalidate_response_cache()
+    
+    logger.info("Dataset '%s' registered", row.name, extra={
+        "dataset": row.id, "records": len(df), "areas": row.area_count, "version": row.version,
+    })
+    return loaded
+
+_append_lock = threading.Lock()
+
+@stage('load')
+def append_dataset(path, dataset=None, original_filename=None, progress=None):
+    """Upsert a file's rows into a registered dataset by (area, year); raises on failure.
+
+    Only the new file is read and normalized, and only the areas it
+    touches are re-indexed and re-aggregated (see LoadedDataset.upsert).
+    The DataSet row keeps its id and gets a new version, snapshot and
+    counts. With no dataset to append to this is a plain ingest_dataset.
+    Returns the updated LoadedDataset, or None for an empty file.
+    """
+    from .models import DataSet
+    
+    report = progress or (lambda stage, rows=None: None)
+    
+    # Appends to one process's datasets are serialized so none is lost
+    with _append_lock:
+        row = resolve_dataset(dataset)
+        if row is None:
+            return ingest_dataset(path, original_filename=original_filename, progress=progress)
+        base = get_loaded_dataset(row.id)
+        # resolve_dataset may hand out a shared cached row; update a fresh copy
+        row = DataSet.objects.get(pk=row.id)
         
-        original_columns = list(df.columns)
-        print(f"Original columns: {original_columns}")
+        report('reading')
+        delta = read_dataset_file(path, progress=report)
+        if delta.empty:
+            return None
         
-        df.columns = [str(col).strip().lower().replace(' ', '_').replace('-', '_') for col in df.columns]
-        print(f"Normalized columns: {list(df.columns)}")
+        report('merging', len(delta))
+        digest = hashlib.sha1(f"{row.version}+{file_digest(path)}".encode('utf-8')).hexdigest()
+        snapshot = snapshot_path_for(path, digest)
+        loaded = base.upsert(delta, dataset_version_from_snapshot(snapshot))
         
-        if 'year' in df.columns:
-            df['year'] = pd.to_numeric(df['year'], errors='coerce').fillna(0).astype(int)
+        report('snapshotting', len(loaded.df))
+        if not os.path.exists(snapshot) and save_snapshot(loaded.df, snapshot, upload_positions(loaded)) is None:
+            raise RuntimeError("Could not write the merged dataset snapshot")
+        save_derived_state(loaded, snapshot)
         
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', ''), errors='ignore')
+        report('registering', len(loaded.df))
+        previous_file, previous_path = row.file.name, dataset_file_path(row)
+        row.file.name = os.path.relpath(snapshot, settings.MEDIA_ROOT)
+        row.file_size += os.path.getsize(path)
+        row.columns = list(loaded.df.columns)
+        row.record_count = len(loaded.df)
+        row.area_count = len(loaded.area_index.keys) if loaded.area_index else 0
+        row.version = loaded.version
+        row.save()
         
-        if 'final_location' in df.columns:
-            df['final_location'] = df['final_location'].astype(str).str.strip()
+        if previous_file != row.file.name and not DataSet.objects.filter(file=previous_file).exists():
+            remove_snapshot(previous_path)
         
-        print(f"Dataset loaded successfully: {len(df)} records")
-        print(f"Sample data:\n{df.head(2)}")
+        loaded.dataset_id = row.id
+        loaded.name = row.name
+        _registry.put(row.id, loaded)
+        report('materializing', len(loaded.df))
+        try_materialize_analyses(row, loaded)
+        publish_current_dataset(DataSet.objects.order_by('-uploaded_at', '-id').first())
+        invalidate_response_cache()
+    
+    logger.info("Appended to dataset '%s'", row.name, extra={
+        "dataset": row.id, "appended": len(delta), "records": len(loaded.df), "version": row.version,
+    })
+    return loaded
+
+def load_dataset(path=None, name=None, original_filename=None):
+    """Load an uploaded Excel file, register it as a DataSet and make it the default dataset"""
+    try:
+        if not path or not os.path.exists(path):
+            return get_dataset()
         
-        _current_dataset = df
-        return df
+        loaded = ingest_dataset(path, name=name, original_filename=original_filename)
+        return loaded.df if loaded is not None else pd.DataFrame()
         
     except Exception as e:
-        print(f"Error loading dataset: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error loading dataset: %s", e)
         return pd.DataFrame()
 
-def get_dataset():
-    """Get current dataset, load if not exists"""
-    global _current_dataset
-    if _current_dataset is None:
-        return load_dataset()
-    return _current_dataset
+def get_dataset(dataset=None):
+    """Get a dataset's frame (default: latest upload), loading it if needed"""
+    loaded = get_loaded_dataset(dataset)
+    if loaded is None:
+        logger.debug("No dataset available")
+        return pd.DataFrame()
+    return loaded.df
 
 def filter_by_area(df, area):
-    """Filter dataframe by area/locality"""
+    """Filter dataframe by area/locality, once per request for the same frame and area"""
+    return request_memo('filter', df, area, lambda: find_area_rows(df, area))
+
+@stage('filter')
+def find_area_rows(df, area):
     if df.empty:
-        print(f"Dataset is empty, cannot filter area: {area}")
         return pd.DataFrame()
         
     area_lower = str(area).lower().strip()
-    print(f"Searching for area: '{area}' (searching: '{area_lower}')")
     
-    area_columns = ['final_location', 'locality', 'area', 'location']
+    loaded = dataset_for_frame(df)
+    index = loaded.area_index if loaded else None
+    columns = AREA_COLUMNS
+    if index is not None:
+        filtered_df = index.slice(df, area_lower)
+        if filtered_df is not None:
+            return filtered_df
+        # The index only covers its own column; names held in the later
+        # area columns (e.g. a locality) still need a scan
+        columns = AREA_COLUMNS[AREA_COLUMNS.index(index.column) + 1:]
     
-    for col in area_columns:
+    for col in columns:
         if col in df.columns:
             try:
                 mask = df[col].astype(str).str.lower().str.contains(area_lower, na=False)
                 filtered_df = df[mask]
                 if not filtered_df.empty:
-                    print(f"Found {len(filtered_df)} records for area '{area}' in column '{col}'")
                     return filtered_df
             except Exception as e:
-                print(f"Error filtering by {col}: {e}")
+                logger.warning("Error filtering by %s: %s", col, e)
                 continue
     
-    print(f"No data found for area: {area}")
+    logger.debug("No data found for area", extra={"area": area})
     return pd.DataFrame()
 
-def get_unique_areas():
+def get_yearly_stats(df, area):
+    """Per-year aggregates for an area, read from the aggregate cube when df is current"""
+    return request_memo('yearly', df, area, lambda: compute_yearly_stats(df, area))
+
+@stage('aggregate')
+def compute_yearly_stats(df, area):
+    loaded = dataset_for_frame(df)
+    if loaded is not None and loaded.cube is not None:
+        matches = loaded.area_index.match(area)
+        if matches:
+            return loaded.cube.yearly(matches)
+    
+    filtered_df = filter_by_area(df, area)
+    if filtered_df.empty:
+        return None
+    return aggregate_by_year(filtered_df)
+
+def get_unique_areas(dataset=None):
     """Get list of unique areas from dataset"""
     try:
-        df = get_dataset()
+        df = get_dataset(dataset)
         
         if df.empty:
-            print("Dataset is empty, no areas available")
             return []
         
-        area_columns = ['final_location', 'locality', 'area', 'location']
-        
-        for col in area_columns:
+        for col in AREA_COLUMNS:
             if col in df.columns:
                 areas = df[col].dropna().astype(str).str.strip().unique()
                 valid_areas = [area for area in areas if area and area != 'nan']
                 if valid_areas:
-                    print(f"Found {len(valid_areas)} areas in column '{col}'")
                     return sorted(valid_areas)
         
         return []
         
+    except LookupError:
+        raise
     except Exception as e:
-        print(f"Error getting unique areas: {e}")
+        logger.exception("Error getting unique areas: %s", e)
         return []
 
+def suggest_areas(query, limit=10, dataset=None):
+    """Typeahead suggestions for query, ranked by record count"""
+    loaded = get_loaded_dataset(dataset)
+    if loaded is None:
+        return []
+    
+    index = loaded.area_index
+    if index is not None:
+        return [
+            {"name": index.names[i], "records": int(index.counts[i])}
+            for i in index.suggest(query, limit)
+        ]
+    
+    query = str(query).lower().strip()
+    return [{"name": area, "records": None} for area in get_unique_areas(dataset) if area.lower().startswith(query)][:limit]
+
+def resolve_areas(text, limit=5, dataset=None):
+    """Canonical areas mentioned in free text, with trigram similarity scores"""
+    loaded = get_loaded_dataset(dataset)
+    if loaded is None or loaded.area_index is None:
+        return []
+    
+    index = loaded.area_index
+    return [
+        {"name": index.names[i], "score": round(score, 3), "records": int(index.counts[i])}
+        for i, score in index.resolve(text, limit)
+    ]
+
+AI_SUMMARY_PROMPT_VERSION = 1
+
+_openai_client = None
+_openai_client_key = None
+
+def get_openai_client(api_key):
+    """Reuse one OpenAI client (and its connection pool) per API key"""
+    global _openai_client, _openai_client_key
+    if _openai_client is None or _openai_client_key != api_key:
+        from openai import OpenAI
+        _openai_client = OpenAI(api_key=api_key)
+        _openai_client_key = api_key
+    return _openai_client
+
+def build_summary_data(area, df):
+    """Payload describing an area that is sent to the LLM and used as its cache key"""
+    summary_data = {
+        'area': area,
+        'total_years': len(df['year'].unique()) if 'year' in df.columns else 0,
+        'total_records': len(df),
+        'price_trend': "Not available",
+        'sales_trend': "Not available"
+    }
+    
+    if 'flat_weighted_average_rate' in df.columns:
+        price_data = df['flat_weighted_average_rate'].dropna()
+        if len(price_data) > 0:
+            summary_data['avg_price'] = float(price_data.mean())
+            summary_data['min_price'] = float(price_data.min())
+            summary_data['max_price'] = float(price_data.max())
+    
+    if 'total_sales_igr' in df.columns:
+        sales_data = df['total_sales_igr'].dropna()
+        if len(sales_data) > 0:
+            summary_data['total_sales'] = float(sales_data.sum())
+    
+    return summary_data
+
 def generate_ai_summary(area, df):
     """Generate AI summary using OpenAI or fallback to analysis"""
     try:
         # First, try to use OpenAI if API key is available
-        import os
-        from openai import OpenAI
-        
         api_key = os.getenv('OPENAI_API_KEY')
         if api_key:
-            client = OpenAI(api_key=api_key)
-            
             # Prepare data for AI
-            summary_data = {
-                'area': area,
-                'total_years': len(df['year'].unique()) if 'year' in df.columns else 0,
-                'total_records': len(df),
-                'price_trend': "Not available",
-                'sales_trend': "Not available"
-            }
-            
-            if 'flat_weighted_average_rate' in df.columns:
-                price_data = df['flat_weighted_average_rate'].dropna()
-                if len(price_data) > 0:
-                    summary_data['avg_price'] = float(price_data.mean())
-                    summary_data['min_price'] = float(price_data.min())
-                    summary_data['max_price'] = float(price_data.max())
+            summary_data = build_summary_data(area, df)
+            model = getattr(settings, 'OPENAI_MODEL', 'gpt-3.5-turbo')
+            cache_key = summary_cache_key(summary_data, model, AI_SUMMARY_PROMPT_VERSION)
             
-            if 'total_sales_igr' in df.columns:
-                sales_data = df['total_sales_igr'].dropna()
-                if len(sales_data) > 0:
-                    summary_data['total_sales'] = float(sales_data.sum())
+            cached_summary = summary_cache.get(cache_key)
+            if cached_summary is not None:
+                return cached_summary
             
             prompt = f"""
             Analyze this real estate data for {area}:
@@ -160,20 +851,24 @@ def generate_ai_summary(area, df):
             Write in natural, conversational language.
             """
             
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a real estate market analyst."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.7
-            )
+            client = get_openai_client(api_key)
+            with stage('llm'):
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": "You are a real estate market analyst."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=200,
+                    temperature=0.7
+                )
             
-            return response.choices[0].message.content.strip()
+            ai_summary = response.choices[0].message.content.strip()
+            summary_cache.set(cache_key, ai_summary)
+            return ai_summary
             
     except Exception as e:
-        print(f"OpenAI error, using fallback: {e}")
+        logger.warning("OpenAI error, using fallback: %s", e)
     
     # Fallback to basic analysis
     return generate_basic_summary(area, df)
@@ -183,41 +878,77 @@ def generate_basic_summary(area, df):
     if df.empty:
         return f"No data available for {area}."
     
+    years = sorted(int(year) for year in df['year'].dropna().unique()) if 'year' in df.columns else []
+    return format_basic_summary(frame_totals(df), years)
+
+def format_basic_summary(stats, years):
+    """Basic summary text from overall stats indexed by (column, stat)"""
     summary_parts = []
     
     # Years covered
-    if 'year' in df.columns:
-        years = sorted(df['year'].unique())
-        if years:
-            year_range = f"{min(years)}-{max(years)}" if len(years) > 1 else str(years[0])
-            summary_parts.append(f"Analysis covers {year_range} with {len(years)} year(s).")
+    if years:
+        year_range = f"{min(years)}-{max(years)}" if len(years) > 1 else str(years[0])
+        summary_parts.append(f"Analysis covers {year_range} with {len(years)} year(s).")
     
     # Price information
     price_metrics = []
-    price_cols = ['flat_weighted_average_rate', 'office_weighted_average_rate', 
-                 'shop_weighted_average_rate', 'others_weighted_average_rate']
-    
-    for col in price_cols:
-        if col in df.columns and not df[col].dropna().empty:
-            avg_price = df[col].mean()
+    for col in PRICE_COLUMNS:
+        count = stats.get((col, 'count'), 0)
+        if count > 0:
+            avg_price = stats[(col, 'sum')] / count
             price_metrics.append(f"{col.replace('_', ' ').title()}: ₹{avg_price:,.0f}/sqft")
     
     if price_metrics:
         summary_parts.append("Average rates: " + ", ".join(price_metrics))
     
     # Sales information
-    if 'total_sales_igr' in df.columns:
-        total_sales = df['total_sales_igr'].sum()
-        summary_parts.append(f"Total sales: ₹{total_sales:,.0f}")
+    if ('total_sales_igr', 'sum') in stats:
+        summary_parts.append(f"Total sales: ₹{stats[('total_sales_igr', 'sum')]:,.0f}")
     
-    if 'total_units' in df.columns:
-        total_units = df['total_units'].sum()
-        summary_parts.append(f"Total units: {total_units:,.0f}")
+    if ('total_units', 'sum') in stats:
+        summary_parts.append(f"Total units: {stats[('total_units', 'sum')]:,.0f}")
     
-    summary_parts.append(f"Based on {len(df)} data records from uploaded Excel file.")
+    summary_parts.append(f"Based on {int(stats[RECORDS])} data records from uploaded Excel file.")
     
     return " ".join(summary_parts)
 
+SUMMARY_SALES_COLUMNS = [
+    'total_sales_igr', 'total_sold_igr', 'total_units',
+    'flat_sold_igr', 'office_sold_igr', 'shop_sold_igr'
+]
+
+def build_key_metrics(overall, years):
+    """key_metrics of an analysis from overall stats indexed by (column, stat)"""
+    stats = overall if isinstance(overall, dict) else overall.to_dict()
+    
+    price_data = {}
+    for col in PRICE_COLUMNS:
+        count = stats.get((col, 'count'), 0)
+        if count > 0:
+            price_data[col] = {
+                'min': float(stats[(col, 'min')]),
+                'max': float(stats[(col, 'max')]),
+                'avg': float(stats[(col, 'sum')] / count),
+                'count': int(count)
+            }
+    
+    sales_data = {}
+    for col in SUMMARY_SALES_COLUMNS:
+        count = stats.get((col, 'count'), 0)
+        if count > 0:
+            sales_data[col] = {
+                'total': float(stats[(col, 'sum')]),
+                'avg': float(stats[(col, 'sum')] / count),
+                'count': int(count)
+            }
+    
+    return {
+        "price_data": price_data,
+        "sales_data": sales_data,
+        "record_count": int(stats[RECORDS]),
+        "area_coverage": f"{min(years)}-{max(years)}" if years else "N/A"
+    }
+
 def generate_real_summary(area, df):
     """Generate complete analysis summary"""
     try:
@@ -235,69 +966,26 @@ def generate_real_summary(area, df):
         # Get AI summary
         ai_summary = generate_ai_summary(area, filtered_df)
         
-        # Calculate metrics
+        # Metrics come from the per-year aggregates
+        yearly = get_yearly_stats(df, area)
+        overall = totals(yearly)
+        
         years = []
         if 'year' in filtered_df.columns:
-            years = sorted(filtered_df['year'].unique())
-            years = [int(year) for year in years if not pd.isna(year)]
-        
-        # Price metrics
-        price_data = {}
-        price_columns = [
-            'flat_weighted_average_rate', 'office_weighted_average_rate',
-            'others_weighted_average_rate', 'shop_weighted_average_rate'
-        ]
-        
-        for col in price_columns:
-            if col in filtered_df.columns and filtered_df[col].notna().any():
-                price_values = filtered_df[col].dropna()
-                if len(price_values) > 0:
-                    price_data[col] = {
-                        'min': float(price_values.min()),
-                        'max': float(price_values.max()),
-                        'avg': float(price_values.mean()),
-                        'count': len(price_values)
-                    }
+            years = [int(year) for year in yearly.index if not pd.isna(year)]
         
-        # Sales metrics
-        sales_data = {}
-        sales_columns = [
-            'total_sales_igr', 'total_sold_igr', 'total_units',
-            'flat_sold_igr', 'office_sold_igr', 'shop_sold_igr'
-        ]
-        
-        for col in sales_columns:
-            if col in filtered_df.columns and filtered_df[col].notna().any():
-                sales_values = filtered_df[col].dropna()
-                if len(sales_values) > 0:
-                    if 'sales' in col.lower():
-                        sales_data[col] = {
-                            'total': float(sales_values.sum()),
-                            'avg': float(sales_values.mean()),
-                            'count': len(sales_values)
-                        }
-                    else:
-                        sales_data[col] = {
-                            'total': float(sales_values.sum()),
-                            'avg': float(sales_values.mean()),
-                            'count': len(sales_values)
-                        }
+        key_metrics = build_key_metrics(overall, years)
         
         return {
             "summary": f"Real estate analysis for {area}",
             "ai_summary": ai_summary,
             "years": years,
-            "key_metrics": {
-                "price_data": price_data,
-                "sales_data": sales_data,
-                "record_count": len(filtered_df),
-                "area_coverage": f"{min(years)}-{max(years)}" if years else "N/A"
-            },
+            "key_metrics": key_metrics,
             "data_source": "uploaded_excel_file"
         }
         
     except Exception as e:
-        print(f"Error generating summary: {e}")
+        logger.exception("Error generating summary: %s", e)
         return {
             "summary": f"Error analyzing data for {area}.",
             "ai_summary": f"Unable to generate analysis for {area} due to data format issues.",
@@ -306,17 +994,186 @@ def generate_real_summary(area, df):
             "data_source": "error"
         }
 
-def generate_real_chart_data(area, chart_type='price'):
+def area_analyses(loaded):
+    """(area name, analysis) for every area of a loaded dataset, read from its aggregate cube"""
+    index, cube = loaded.area_index, loaded.cube
+    if index is None or cube is None:
+        return []
+    has_years = 'year' in loaded.df.columns
+    # One conversion up front; a .loc per area dominates for thousands of areas
+    area_totals = cube.area_totals.to_dict('index')
+    area_years = cube.area_years
+    analyses = []
+    for code, name in enumerate(index.names):
+        stats = area_totals.get(code)
+        if stats is None:
+            continue
+        years = [int(year) for year in area_years[code]] if has_years else []
+        analyses.append((name, {
+            "version": loaded.version,
+            "years": years,
+            "key_metrics": build_key_metrics(stats, years),
+            "basic_summary": format_basic_summary(stats, years),
+        }))
+    return analyses
+
+@stage('aggregate')
+def materialize_analyses(row, loaded=None):
+    """Store every area's analysis of a dataset in AreaAnalysis, replacing older ones.
+
+    Rows carry the dataset version they were computed from, so a stale
+    row is never served. Areas whose name does not fit area_name are not
+    stored, and are computed on request instead. Returns the number of
+    areas written.
+    """
+    from .models import AreaAnalysis
+    
+    loaded = loaded or get_loaded_dataset(row.id)
+    analyses = area_analyses(loaded) if loaded is not None else []
+    max_length = AreaAnalysis._meta.get_field('area_name').max_length
+    stored = [(name, data) for name, data in analyses if len(name) <= max_length]
+    if len(stored) < len(analyses):
+        # Truncating would make names that share a prefix collide
+        logger.warning("Not materializing areas with names longer than %s characters", max_length,
+                       extra={"dataset": row.id, "areas": len(analyses) - len(stored)})
+    with transaction.atomic():
+        AreaAnalysis.objects.filter(dataset_id=row.id).delete()
+        AreaAnalysis.objects.bulk_create(
+            [AreaAnalysis(dataset_id=row.id, area_name=name, analysis_data=data) for name, data in stored],
+            batch_size=500,
+        )
+    logger.info("Materialized area analyses", extra={"dataset": row.id, "areas": len(stored), "version": row.version})
+    return len(stored)
+
+def try_materialize_analyses(row, loaded):
+    """materialize_analyses for ingests: a failure only means analyses are computed on request"""
+    try:
+        materialize_analyses(row, loaded)
+    except Exception as e:
+        logger.exception("Could not materialize analyses for dataset %s: %s", row.id, e)
+
+def get_area_analysis(area, dataset=None):
+    """generate_real_summary's analysis, read from AreaAnalysis when it is current.
+
+    Queries naming one stored area (case-insensitively) are answered from
+    the table without loading the dataset, unless an OpenAI key asks for
+    an AI summary. Substrings and several-area matches are
+    computed as before. Returns None when no dataset is loaded.
+    """
+    from .models import AreaAnalysis
+    
+    row = resolve_dataset(dataset)
+    if row is None:
+        return None
+    
+    stored = AreaAnalysis.objects.filter(dataset_id=row.id, area_name__iexact=str(area).strip()).first()
+    if stored is not None and stored.analysis_data.get('version') == row.version:
+        data = stored.analysis_data
+        ai_summary = data['basic_summary']
+        if os.getenv('OPENAI_API_KEY'):
+            df = get_dataset(row.id)
+            ai_summary = generate_ai_summary(area, filter_by_area(df, area))
+        return {
+            "summary": f"Real estate analysis for {area}",
+            "ai_summary": ai_summary,
+            "years": data['years'],
+            "key_metrics": data['key_metrics'],
+            "data_source": "uploaded_excel_file"
+        }
+    
+    df = get_dataset(row.id)
+    if df.empty:
+        return None
+    return generate_real_summary(area, df)
+
+def analysis_entry(area, name, overall, years, has_years):
+    years = [int(year) for year in years if not pd.isna(year)] if has_years else []
+    return {
+        "area": area,
+        "name": name,
+        "years": years,
+        "key_metrics": build_key_metrics(overall, years),
+    }
+
+@stage('aggregate')
+def generate_batch_summary(areas=None, dataset=None, include_ai=False):
+    """key_metrics for many areas in one pass over the aggregate cube.
+
+    areas is a list of area queries, or None/'all' for every area in the
+    dataset. AI summaries are only generated when include_ai is set; each
+    entry otherwise points at /api/analyze/ for a deferred one. Returns
+    None when no dataset is loaded.
+    """
+    loaded = get_loaded_dataset(dataset)
+    if loaded is None:
+        return None
+    
+    df = loaded.df
+    index, cube = loaded.area_index, loaded.cube
+    has_years = 'year' in df.columns
+    every_area = areas in (None, 'all') or list(areas) == ['all']
+    results = []
+    not_found = []
+    
+    if index is not None and cube is not None:
+        area_totals = cube.area_totals.to_dict('index')
+        area_years = cube.area_years
+        if every_area:
+            for code, name in enumerate(index.names):
+                results.append(analysis_entry(name, name, area_totals[code], area_years[code], has_years))
+        else:
+            for area in areas:
+                matches = index.match(area)
+                if not matches:
+                    # Not an indexed name: it may still name rows in another area column
+                    yearly = get_yearly_stats(df, area)
+                    if yearly is None:
+                        not_found.append(area)
+                    else:
+                        results.append(analysis_entry(area, area, totals(yearly), yearly.index, has_years))
+                elif len(matches) == 1:
+                    code = matches[0]
+                    results.append(analysis_entry(area, index.names[code], area_totals[code], area_years[code], has_years))
+                else:
+                    yearly = cube.yearly(matches)
+                    results.append(analysis_entry(area, area, totals(yearly), yearly.index, has_years))
+    elif not every_area:
+        # No area column to index: fall back to a scan per area
+        for area in areas:
+            yearly = get_yearly_stats(df, area)
+            if yearly is None:
+                not_found.append(area)
+            else:
+                results.append(analysis_entry(area, area, totals(yearly), yearly.index, has_years))
+    
+    for entry in results:
+        if include_ai:
+            entry["ai_summary"] = generate_ai_summary(entry["name"], filter_by_area(df, entry["name"]))
+        else:
+            params = {'area': entry['name'], 'dataset': dataset} if dataset else {'area': entry['name']}
+            entry["ai_summary_url"] = f"/api/analyze/?{urlencode(params)}"
+    
+    return {
+        "results": results,
+        "not_found": not_found,
+        "count": len(results),
+        "data_source": "uploaded_excel_file"
+    }
+
+@stage('aggregate')
+def generate_real_chart_data(area, chart_type='price', dataset=None):
     """Generate chart data from actual uploaded data"""
     try:
-        df = get_dataset()
-        filtered_df = filter_by_area(df, area)
+        df = get_dataset(dataset)
         
-        if filtered_df.empty or 'year' not in filtered_df.columns:
+        if df.empty or 'year' not in df.columns:
             return {"labels": [], "datasets": [], "data_source": "no_data"}
         
-        yearly_data = filtered_df.groupby('year')
-        years = sorted(yearly_data.groups.keys())
+        yearly = get_yearly_stats(df, area)
+        if yearly is None or yearly.empty:
+            return {"labels": [], "datasets": [], "data_source": "no_data"}
+        
+        years = list(yearly.index)
         
         if chart_type == 'price':
             price_columns = [
@@ -333,12 +1190,8 @@ def generate_real_chart_data(area, chart_type='price'):
             ]
             
             for i, col in enumerate(price_columns):
-                if col in filtered_df.columns:
-                    data = []
-                    for year in years:
-                        year_data = yearly_data.get_group(year)
-                        avg_price = year_data[col].mean()
-                        data.append(float(avg_price) if not pd.isna(avg_price) else 0)
+                if (col, 'sum') in yearly.columns:
+                    data = [float(value) for value in np.nan_to_num(mean(yearly, col))]
                     
                     if any(x > 0 for x in data):
                         label_map = {
@@ -377,15 +1230,12 @@ def generate_real_chart_data(area, chart_type='price'):
             ]
             
             for i, col in enumerate(demand_columns[:3]):  
-                if col in filtered_df.columns:
-                    data = []
-                    for year in years:
-                        year_data = yearly_data.get_group(year)
-                        if 'sales' in col.lower():
-                            total_value = year_data[col].sum()
-                        else:
-                            total_value = year_data[col].mean()
-                        data.append(float(total_value) if not pd.isna(total_value) else 0)
+                if (col, 'sum') in yearly.columns:
+                    if 'sales' in col.lower():
+                        values = yearly[(col, 'sum')].to_numpy()
+                    else:
+                        values = mean(yearly, col)
+                    data = [float(value) for value in np.nan_to_num(values)]
                     
                     if any(x > 0 for x in data):
                         label_map = {
@@ -417,7 +1267,7 @@ def generate_real_chart_data(area, chart_type='price'):
             
             latest_year = max(years) if years else None
             if latest_year:
-                latest_data = filtered_df[filtered_df['year'] == latest_year]
+                latest_data = yearly.loc[latest_year]
                 
                 data = []
                 labels = []
@@ -429,8 +1279,8 @@ def generate_real_chart_data(area, chart_type='price'):
                 ]
                 
                 for i, col in enumerate(composition_cols):
-                    if col in latest_data.columns:
-                        value = latest_data[col].sum()
+                    if (col, 'sum') in latest_data.index:
+                        value = latest_data[(col, 'sum')]
                         if value > 0:
                             data.append(float(value))
                             labels.append(col.replace('_sold_igr', '').title())
@@ -449,88 +1299,203 @@ def generate_real_chart_data(area, chart_type='price'):
         
         return {"labels": [], "datasets": [], "data_source": "no_matching_columns"}
         
+    except LookupError:
+        raise
     except Exception as e:
-        print(f"Error generating chart data: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error generating chart data: %s", e)
         return {"labels": [], "datasets": [], "data_source": "error"}
 
-def get_real_table_data(area, limit=100, offset=0):
-    """Get paginated table data from uploaded file"""
+TABLE_DISPLAY_COLUMNS = [
+    'year', 'final_location', 'city', 'total_sales_igr', 'total_units',
+    'flat_weighted_average_rate', 'office_weighted_average_rate',
+    'shop_weighted_average_rate', 'flat_sold_igr', 'office_sold_igr',
+    'shop_sold_igr'
+]
+
+SORT_CACHE_SIZE = 128
+
+def get_table_columns(df):
+    """Columns shown by the table endpoint, in display order"""
+    available_columns = [col for col in TABLE_DISPLAY_COLUMNS if col in df.columns]
+    if not available_columns:
+        available_columns = list(df.columns)[:10]
+    return available_columns
+
+def resolve_sort_column(columns, sort):
+    """Accept either a raw column name or its display title"""
+    key = str(sort).strip().lower().replace(' ', '_')
+    if key in columns:
+        return key
+    raise ValueError(f"Cannot sort by '{sort}'. Sortable columns: {', '.join(columns)}")
+
+def encode_table_cursor(area, offset, limit, sort, order, dataset=None):
+    """Opaque token for a table page, tied to the dataset version it was issued for"""
+    state = {'v': get_dataset_version(dataset), 'ds': dataset, 'a': area, 'o': offset, 'l': limit, 's': sort, 'd': order}
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+def read_table_cursor(cursor):
+    """Fields of a table cursor without checking that it is current; raises ValueError when malformed"""
     try:
-        df = get_dataset()
+        padded = cursor + '=' * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        state = {
+            'area': str(state['a']), 'offset': int(state['o']), 'limit': int(state['l']),
+            'sort': state['s'], 'order': state['d'], 'version': state['v'], 'dataset': state.get('ds')
+        }
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    return state
+
+def decode_table_cursor(cursor):
+    """Inverse of encode_table_cursor; raises ValueError for malformed or stale cursors"""
+    state = read_table_cursor(cursor)
+    if state['version'] != get_dataset_version(state['dataset']):
+        raise ValueError("Cursor has expired because the dataset changed")
+    return state
+
+def get_sort_permutation(df, filtered_df, area, column, ascending):
+    """Row order of filtered_df sorted by column, cached on the loaded dataset"""
+    loaded = dataset_for_frame(df)
+    key = (str(area).lower().strip(), column, ascending)
+    if loaded is not None:
+        with loaded.sort_lock:
+            if key in loaded.sort_permutations:
+                loaded.sort_permutations.move_to_end(key)
+                return loaded.sort_permutations[key]
+    
+    values = filtered_df[column].reset_index(drop=True)
+    permutation = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    
+    if loaded is not None:
+        with loaded.sort_lock:
+            loaded.sort_permutations[key] = permutation
+            while len(loaded.sort_permutations) > SORT_CACHE_SIZE:
+                loaded.sort_permutations.popitem(last=False)
+    return permutation
+
+def format_table_rows(page_df, columns):
+    """Format cells a column at a time and transpose into rows"""
+    formatted = []
+    for col in columns:
+        series = page_df[col]
+        missing = series.isna().to_numpy()
+        if pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            values = [int(val) for val in series.to_numpy()]
+        elif pd.api.types.is_float_dtype(series.dtype):
+            template = "₹{:,.0f}" if 'rate' in col or 'sales' in col else "{:,.0f}"
+            values = [template.format(val) for val in series.fillna(0).to_numpy()]
+        else:
+            values = series.astype(str).tolist()
+        if missing.any():
+            values = ["N/A" if is_missing else val for val, is_missing in zip(values, missing)]
+        formatted.append(values)
+    return [list(row) for row in zip(*formatted)]
+
+@stage('aggregate')
+def get_real_table_data(area, limit=100, offset=0, sort=None, order='asc', dataset=None):
+    """Get paginated table data from uploaded file, optionally sorted on a displayed column"""
+    try:
+        df = get_dataset(dataset)
         filtered_df = filter_by_area(df, area)
         
         if filtered_df.empty:
             return {"columns": [], "rows": [], "total": 0, "data_source": "no_data"}
         
-        filtered_df = filtered_df.reset_index(drop=True)
-        
+        available_columns = get_table_columns(filtered_df)
         total = len(filtered_df)
-        paginated_df = filtered_df.iloc[offset:offset + limit]
-        
-        display_columns = [
-            'year', 'final_location', 'city', 'total_sales_igr', 'total_units',
-            'flat_weighted_average_rate', 'office_weighted_average_rate',
-            'shop_weighted_average_rate', 'flat_sold_igr', 'office_sold_igr',
-            'shop_sold_igr'
-        ]
+        offset = max(int(offset), 0)
+        limit = max(int(limit), 0)
         
-        available_columns = [col for col in display_columns if col in paginated_df.columns]
-        if not available_columns:
-            available_columns = list(paginated_df.columns)[:10]
+        if sort:
+            sort = resolve_sort_column(available_columns, sort)
+            order = 'desc' if str(order).lower() == 'desc' else 'asc'
+            permutation = get_sort_permutation(df, filtered_df, area, sort, order == 'asc')
+            paginated_df = filtered_df.iloc[permutation[offset:offset + limit]]
+        else:
+            order = None
+            paginated_df = filtered_df.iloc[offset:offset + limit]
         
         columns = [col.replace('_', ' ').title() for col in available_columns]
-        rows = []
-        
-        for _, row in paginated_df.iterrows():
-            row_data = []
-            for col in available_columns:
-                val = row[col]
-                if pd.isna(val):
-                    row_data.append("N/A")
-                elif isinstance(val, (np.integer)):
-                    row_data.append(int(val))
-                elif isinstance(val, (np.floating)):
-                    if 'rate' in col or 'sales' in col:
-                        row_data.append(f"₹{val:,.0f}")
-                    else:
-                        row_data.append(f"{val:,.0f}")
-                else:
-                    row_data.append(str(val))
-            rows.append(row_data)
+        rows = format_table_rows(paginated_df, available_columns)
         
+        next_offset = offset + limit
+        prev_offset = max(offset - limit, 0)
         return {
             "columns": columns,
             "rows": rows,
             "total": total,
+            "offset": offset,
+            "limit": limit,
+            "sort": sort or None,
+            "order": order,
+            "next_cursor": encode_table_cursor(area, next_offset, limit, sort or None, order, dataset) if limit and next_offset < total else None,
+            "prev_cursor": encode_table_cursor(area, prev_offset, limit, sort or None, order, dataset) if limit and offset > 0 else None,
             "data_source": "uploaded_excel_file"
         }
         
+    except (ValueError, LookupError):
+        raise
     except Exception as e:
-        print(f"Error getting table data: {e}")
+        logger.exception("Error getting table data: %s", e)
         return {"columns": [], "rows": [], "total": 0, "data_source": "error"}
 
-def get_dataset_info():
-    """Get information about the current dataset"""
+DASHBOARD_PARTS = ('analysis', 'price', 'demand', 'composition', 'table')
+CHART_PARTS = ('price', 'demand', 'composition')
+
+def generate_dashboard(area, parts=None, dataset=None, table_limit=50, table_sort=None, table_order='asc'):
+    """Analysis, charts and the first table page for an area, built from one filtered view.
+
+    parts selects a subset of DASHBOARD_PARTS (default: all). Everything
+    runs inside one pinned block, so the dataset is resolved and the area
+    filtered and aggregated once for all parts. Returns None when no
+    dataset is loaded.
+    """
+    parts = list(DASHBOARD_PARTS) if not parts else parts
+    unknown = [part for part in parts if part not in DASHBOARD_PARTS]
+    if unknown:
+        raise ValueError(f"Unknown dashboard part(s): {', '.join(unknown)}. Use: {', '.join(DASHBOARD_PARTS)}")
+    
+    with pinned_datasets():
+        df = get_dataset(dataset)
+        if df.empty:
+            return None
+        
+        dashboard = {"area": area, "parts": parts}
+        if 'analysis' in parts:
+            dashboard["analysis"] = get_area_analysis(area, dataset)
+        charts = {part: generate_real_chart_data(area, part, dataset) for part in CHART_PARTS if part in parts}
+        if charts:
+            dashboard["charts"] = charts
+        if 'table' in parts:
+            dashboard["table"] = get_real_table_data(area, table_limit, 0, table_sort, table_order, dataset)
+        dashboard["data_source"] = "uploaded_excel_file"
+        return dashboard
+
+def get_dataset_info(dataset=None):
+    """Get information about a dataset (default: latest upload)"""
     try:
-        df = get_dataset()
-        areas = get_unique_areas()
+        row = resolve_dataset(dataset)
+        df = get_dataset(dataset)
+        areas = get_unique_areas(dataset)
         
         info = {
+            "dataset": serialize_dataset(row) if row else None,
             "loaded": not df.empty,
             "record_count": len(df),
             "area_count": len(areas),
             "columns": list(df.columns) if not df.empty else [],
             "areas_sample": areas[:5] if areas else [],
             "years_available": sorted(df['year'].unique().tolist()) if 'year' in df.columns and not df.empty else [],
+            "memory": row.memory_report if row else {},
             "data_source": "uploaded_excel_file" if not df.empty else "no_data"
         }
         
         return info
         
+    except LookupError:
+        raise
     except Exception as e:
-        print(f"Error getting dataset info: {e}")
+        logger.exception("Error getting dataset info: %s", e)
         return {
             "loaded": False,
             "record_count": 0,
@@ -541,48 +1506,220 @@ def get_dataset_info():
             "data_source": "error"
         }
 
-def clear_dataset():
-    """Clear the current dataset"""
-    global _current_dataset, _dataset_path
-    _current_dataset = None
-    _dataset_path = None
-    print("Dataset cleared")
+def serialize_dataset(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "version": row.version,
+        "original_filename": row.original_filename,
+        "uploaded_at": row.uploaded_at.isoformat() if row.uploaded_at else None,
+        "record_count": row.record_count,
+        "area_count": row.area_count,
+        "file_size": row.file_size,
+    }
+
+def list_datasets():
+    """Registered datasets, newest first, with their in-memory state"""
+    from .models import DataSet
+    
+    loaded = {entry["id"]: entry["bytes"] for entry in _registry.usage()["loaded"]}
+    datasets = []
+    for row in DataSet.objects.order_by('-uploaded_at', '-id'):
+        info = serialize_dataset(row)
+        info["in_memory"] = row.id in loaded
+        info["memory_bytes"] = loaded.get(row.id, 0)
+        datasets.append(info)
+    return datasets
 
-def export_data(area, format='csv'):
+def clear_dataset(dataset=None):
+    """Remove one dataset, or every dataset when none is given"""
+    from .models import DataSet
+    
+    if dataset in (None, ''):
+        rows = list(DataSet.objects.all())
+        _registry.clear()
+    else:
+        rows = [resolve_dataset(dataset)]
+    
+    cleared = [row.id for row in rows]
+    for row in rows:
+        _registry.discard(row.id)
+        path = dataset_file_path(row)
+        row.delete()
+        # Snapshots are content-addressed and may be shared by several rows
+        if not DataSet.objects.filter(file=row.file.name).exists():
+            remove_snapshot(path)
+    
+    publish_current_dataset(DataSet.objects.order_by('-uploaded_at', '-id').first())
+    invalidate_response_cache()
+    logger.info("Dataset cleared", extra={"datasets": cleared})
+
+def export_data(area, format='csv', dataset=None):
     """Export filtered data for download"""
     try:
-        df = get_dataset()
+        df = get_dataset(dataset)
         filtered_df = filter_by_area(df, area)
         
         if filtered_df.empty:
             return None
         
-        if format == 'csv':
-            return filtered_df.to_csv(index=False)
-        elif format == 'excel':
-            import io
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                filtered_df.to_excel(writer, index=False, sheet_name=area[:31])
-            output.seek(0)
-            return output.getvalue()
-        elif format == 'json':
-            return filtered_df.to_json(orient='records', date_format='iso')
+        if format == 'excel':
+            return b''.join(iter_excel(filtered_df, excel_sheet_name(area)))
+        if format in ('csv', 'json', 'ndjson'):
+            return b''.join(iter_export(filtered_df, format, area)).decode('utf-8-sig')
             
+    except LookupError:
+        raise
     except Exception as e:
-        print(f"Error exporting data: {e}")
+        logger.exception("Error exporting data: %s", e)
         return None
 
-def compare_areas(area1, area2):
+COMPARE_DEFAULT_METRICS = ['flat_weighted_average_rate', 'office_weighted_average_rate', 'total_sales_igr']
+COMPARE_STATS = ('avg', 'total', 'min', 'max', 'count')
+
+def parse_compare_metrics(metrics, available):
+    """(column, stat) pairs from specs like 'total_units' or 'total_units:avg'.
+
+    Price columns default to avg and sales columns to total. Unknown
+    columns raise ValueError, except in the default set, where missing
+    ones are skipped.
+    """
+    parsed = []
+    for spec in metrics or COMPARE_DEFAULT_METRICS:
+        col, _, stat = str(spec).partition(':')
+        col = col.strip().lower().replace(' ', '_').replace('-', '_')
+        stat = stat.strip().lower() or ('avg' if col in PRICE_COLUMNS else 'total')
+        if stat not in COMPARE_STATS:
+            raise ValueError(f"Unknown statistic '{stat}'. Use one of: {', '.join(COMPARE_STATS)}")
+        if col not in available:
+            if metrics:
+                raise ValueError(f"Unknown metric '{col}'. Available: {', '.join(available)}")
+            continue
+        parsed.append((col, stat))
+    return parsed
+
+def stat_value(row, col, stat):
+    count = row.get((col, 'count'), 0)
+    if stat == 'count':
+        return int(count)
+    if not count:
+        return None
+    if stat == 'avg':
+        return float(row[(col, 'sum')] / count)
+    return float(row[(col, 'sum' if stat == 'total' else stat)])
+
+def year_mask(years, year_from=None, year_to=None):
+    in_range = np.ones(len(years), dtype=bool)
+    if year_from is not None:
+        in_range &= years >= year_from
+    if year_to is not None:
+        in_range &= years <= year_to
+    return in_range
+
+@stage('aggregate')
+def compare_many(areas, metrics=None, year_from=None, year_to=None, baseline=None, dataset=None):
+    """Compare any number of areas on any metrics over an optional year range.
+
+    Stats for every area come from one grouped combine over the selected
+    rows of the aggregate cube (or, for names the area index does not
+    hold, over the area's filtered rows). Returns a matrix of values (one row per
+    area, one column per metric) and the percentage difference of each
+    value from the baseline area (default: the first one). Areas without
+    rows in the year range are listed in not_found with unknown ones. A
+    baseline that is not among the areas found is an error.
+    """
+    loaded = get_loaded_dataset(dataset)
+    if loaded is None:
+        return {"error": "No dataset loaded. Please upload an Excel file first."}
+    
+    df = loaded.df
+    index, cube = loaded.area_index, loaded.cube
+    metrics = parse_compare_metrics(metrics, aggregate_columns(df))
+    
+    found, queries, not_found, parts = [], [], [], []
+    if cube is not None:
+        in_range = year_mask(cube.stats.index.get_level_values('year').to_numpy(), year_from, year_to)
+    for area in areas:
+        codes = index.match(area) if cube is not None else []
+        if codes:
+            name = index.names[codes[0]] if len(codes) == 1 else area
+            stats = cube.stats.iloc[np.flatnonzero(np.isin(cube.areas, codes) & in_range)]
+            if stats.empty:
+                # The area exists but has no rows in the requested years
+                not_found.append(area)
+                continue
+        else:
+            # No index, or a name outside the indexed column: aggregate the area's filtered rows
+            filtered = filter_by_area(df, area)
+            if 'year' in filtered.columns:
+                if year_from is not None:
+                    filtered = filtered[filtered['year'] >= year_from]
+                if year_to is not None:
+                    filtered = filtered[filtered['year'] <= year_to]
+            if filtered.empty:
+                not_found.append(area)
+                continue
+            name = area
+            stats = aggregate_by_year(filtered)
+        found.append(name)
+        queries.append(area)
+        parts.append(stats)
+    
+    selected = None
+    if parts:
+        selected = pd.concat(parts)
+        selected.index = pd.Index(np.repeat(np.arange(len(parts)), [len(p) for p in parts]), name='query')
+    
+    base = 0
+    baseline = str(baseline or '').strip()
+    if baseline:
+        # The baseline may be given as an area's canonical name or as the query that found it
+        key = baseline.lower()
+        matches = [i for i, (name, query) in enumerate(zip(found, queries)) if key in (name.lower(), query.strip().lower())]
+        if not matches:
+            return {"error": f"Baseline '{baseline}' is not one of the compared areas", "areas": found, "not_found": not_found}
+        base = matches[0]
+    
+    combined = combine(selected, level='query') if selected is not None and len(selected) else pd.DataFrame()
+    rows = [combined.loc[i].to_dict() if i in combined.index else {} for i in range(len(found))]
+    values = [[stat_value(row, col, stat) for col, stat in metrics] for row in rows]
+    
+    differences = []
+    for row_values in values:
+        row_diff = []
+        for value, base_value in zip(row_values, values[base] if values else []):
+            if value is None or not base_value:
+                row_diff.append(None)
+            else:
+                row_diff.append(float((value - base_value) / base_value * 100))
+        differences.append(row_diff)
+    
+    return {
+        "areas": found,
+        "metrics": [f"{col}:{stat}" for col, stat in metrics],
+        "baseline": found[base] if found else None,
+        "year_from": year_from,
+        "year_to": year_to,
+        "values": values,
+        "difference_percent": differences,
+        "not_found": not_found,
+        "data_source": "uploaded_excel_file"
+    }
+
+@stage('aggregate')
+def compare_areas(area1, area2, dataset=None):
     """Compare two areas"""
     try:
-        df = get_dataset()
-        df1 = filter_by_area(df, area1)
-        df2 = filter_by_area(df, area2)
+        df = get_dataset(dataset)
+        yearly1 = get_yearly_stats(df, area1)
+        yearly2 = get_yearly_stats(df, area2)
         
-        if df1.empty or df2.empty:
+        if yearly1 is None or yearly2 is None:
             return {"error": "One or both areas not found"}
         
+        overall1 = totals(yearly1)
+        overall2 = totals(yearly2)
+        
         comparison = {
             "area1": area1,
             "area2": area2,
@@ -592,9 +1729,9 @@ def compare_areas(area1, area2):
         # Compare price trends
         price_cols = ['flat_weighted_average_rate', 'office_weighted_average_rate']
         for col in price_cols:
-            if col in df1.columns and col in df2.columns:
-                avg1 = df1[col].mean()
-                avg2 = df2[col].mean()
+            if (col, 'sum') in overall1.index and (col, 'sum') in overall2.index:
+                avg1 = overall1[(col, 'sum')] / overall1[(col, 'count')] if overall1[(col, 'count')] else np.nan
+                avg2 = overall2[(col, 'sum')] / overall2[(col, 'count')] if overall2[(col, 'count')] else np.nan
                 diff = ((avg2 - avg1) / avg1 * 100) if avg1 > 0 else 0
                 
                 comparison["comparison"][col] = {
@@ -604,9 +1741,9 @@ def compare_areas(area1, area2):
                 }
         
         # Compare sales
-        if 'total_sales_igr' in df1.columns and 'total_sales_igr' in df2.columns:
-            sales1 = df1['total_sales_igr'].sum()
-            sales2 = df2['total_sales_igr'].sum()
+        if ('total_sales_igr', 'sum') in overall1.index and ('total_sales_igr', 'sum') in overall2.index:
+            sales1 = overall1[('total_sales_igr', 'sum')]
+            sales2 = overall2[('total_sales_igr', 'sum')]
             diff = ((sales2 - sales1) / sales1 * 100) if sales1 > 0 else 0
             
             comparison["comparison"]["total_sales"] = {
@@ -617,6 +1754,178 @@ def compare_areas(area1, area2):
         
         return comparison
         
+    except LookupError:
+        raise
     except Exception as e:
-        print(f"Error comparing areas: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        logger.exception("Error comparing areas: %s", e)
+        return {"error": str(e)}
+
+CHAT_PARSE_CACHE_SIZE = 256
+CHAT_INTENTS = ('trend', 'compare', 'top', 'table', 'analyze', 'narrative', 'unknown')
+
+def parse_chat_query(message, dataset=None):
+    """Parsed intent of a chat message, memoized per loaded dataset.
+
+    Messages are keyed by their lowercased words, so spacing, case and
+    punctuation variants share one entry. Returns None when no dataset
+    is loaded.
+    """
+    loaded = get_loaded_dataset(dataset)
+    if loaded is None:
+        return None
+    
+    key = ' '.join(tokenize(message))
+    with loaded.query_lock:
+        if key in loaded.parsed_queries:
+            loaded.parsed_queries.move_to_end(key)
+            return loaded.parsed_queries[key]
+    
+    parsed = parse_query(key, loaded.area_index, aggregate_columns(loaded.df))
+    
+    with loaded.query_lock:
+        loaded.parsed_queries[key] = parsed
+        while len(loaded.parsed_queries) > CHAT_PARSE_CACHE_SIZE:
+            loaded.parsed_queries.popitem(last=False)
+    return parsed
+
+def pick_metric(metric, df):
+    """(column, stat) for a metric spec, or the first default metric the dataset has"""
+    available = aggregate_columns(df)
+    parsed = parse_compare_metrics([metric] if metric else None, available)
+    if parsed:
+        return parsed[0]
+    if available:
+        return available[0], 'avg' if available[0] in PRICE_COLUMNS else 'total'
+    return None
+
+@stage('aggregate')
+def rank_areas(metric=None, year_from=None, year_to=None, limit=10, order='desc', dataset=None):
+    """Areas ranked on one metric over an optional year range, from the aggregate cube.
+
+    Returns None when no dataset (or no area index) is loaded.
+    """
+    loaded = get_loaded_dataset(dataset)
+    if loaded is None or loaded.cube is None:
+        return None
+    
+    index, cube = loaded.area_index, loaded.cube
+    picked = pick_metric(metric, loaded.df)
+    results = []
+    if picked is not None:
+        col, stat = picked
+        in_range = year_mask(cube.stats.index.get_level_values('year').to_numpy(), year_from, year_to)
+        if in_range.any():
+            per_area = combine(cube.stats[in_range], level='area')
+            count = per_area[(col, 'count')].to_numpy()
+            if stat == 'count':
+                values = count.astype(float)
+            elif stat == 'avg':
+                values = mean(per_area, col)
+            else:
+                values = np.where(count > 0, per_area[(col, 'sum' if stat == 'total' else stat)], np.nan)
+            ranked = pd.Series(values, index=per_area.index).dropna()
+            ranked = ranked.sort_values(ascending=order == 'asc', kind='stable').head(limit)
+            results = [{"name": index.names[code], "value": float(value)} for code, value in ranked.items()]
+    
+    return {
+        "metric": f"{picked[0]}:{picked[1]}" if picked else None,
+        "year_from": year_from,
+        "year_to": year_to,
+        "order": order,
+        "results": results,
+        "data_source": "uploaded_excel_file"
+    }
+
+@stage('aggregate')
+def metric_trend(area, metric=None, year_from=None, year_to=None, dataset=None):
+    """Yearly values of one metric for an area, with the matching chart. None when nothing matches."""
+    df = get_dataset(dataset)
+    picked = pick_metric(metric, df)
+    yearly = get_yearly_stats(df, area) if picked is not None else None
+    if yearly is None or yearly.empty:
+        return None
+    
+    col, stat = picked
+    yearly = yearly[year_mask(yearly.index.to_numpy(), year_from, year_to)]
+    years = [int(year) for year in yearly.index]
+    values = [stat_value(row, col, stat) for _, row in yearly.iterrows()]
+    present = [value for value in values if value is not None]
+    change = None
+    if len(present) > 1 and present[0]:
+        change = float((present[-1] - present[0]) / present[0] * 100)
+    return {
+        "area": area,
+        "metric": f"{col}:{stat}",
+        "years": years,
+        "values": values,
+        "change_percent": change,
+        "chart": generate_real_chart_data(area, 'price' if col in PRICE_COLUMNS else 'demand', dataset),
+    }
+
+def metric_label(metric):
+    col, _, stat = metric.partition(':')
+    return f"{stat} {col.replace('_', ' ')}" if stat else col.replace('_', ' ')
+
+def answer_chat(message, dataset=None):
+    """Answer a chat message, routing structured questions to the local computations.
+
+    Trend, compare, top, table and analyze questions are answered from the
+    area index and aggregate cube. Only narrative questions ("why", "should
+    I invest") reach generate_ai_summary and so, with a key configured,
+    the LLM. Returns None when no dataset is loaded.
+    """
+    with pinned_datasets():
+        parsed = parse_chat_query(message, dataset)
+        if parsed is None:
+            return None
+        
+        intent, areas = parsed["intent"], parsed["areas"]
+        year_from, year_to = parsed["year_from"], parsed["year_to"]
+        used_llm = False
+        data = None
+        
+        if intent == 'top':
+            data = rank_areas(parsed["metric"], year_from, year_to, parsed["limit"] or 5, parsed["order"], dataset)
+            ranked = ', '.join(f"{entry['name']} ({entry['value']:,.0f})" for entry in (data or {}).get("results", []))
+            reply = f"Areas by {metric_label(data['metric'])}: {ranked}." if ranked else "No areas have data for that metric and period."
+        elif intent == 'compare':
+            data = compare_many(areas, [parsed["metric"]] if parsed["metric"] else None, year_from, year_to, dataset=dataset)
+            if data.get("values") and data["metrics"]:
+                label = metric_label(data["metrics"][0])
+                values = ', '.join(
+                    f"{name} {row[0]:,.0f}" if row[0] is not None else f"{name} n/a"
+                    for name, row in zip(data["areas"], data["values"])
+                )
+                reply = f"Comparing {label}: {values}."
+            else:
+                reply = "I couldn't compare those areas."
+        elif intent == 'trend':
+            data = metric_trend(areas[0], parsed["metric"], year_from, year_to, dataset)
+            if data and data["years"]:
+                label = metric_label(data["metric"])
+                reply = f"{label.capitalize()} in {areas[0]} from {data['years'][0]} to {data['years'][-1]}"
+                reply += f": {data['change_percent']:+.1f}%." if data["change_percent"] is not None else "."
+            else:
+                reply = f"No yearly data found for {areas[0]}."
+        elif intent == 'table':
+            data = get_real_table_data(areas[0], parsed["limit"] or 20, dataset=dataset)
+            reply = f"Showing {len(data['rows'])} of {data['total']} records for {areas[0]}."
+        elif intent == 'analyze':
+            batch = generate_batch_summary(areas[:1], dataset)
+            data = batch["results"][0] if batch and batch["results"] else None
+            reply = f"Analysis ready for {areas[0]}." if data else f"No data found for {areas[0]}."
+        elif intent == 'narrative':
+            data = generate_real_summary(areas[0], get_dataset(dataset))
+            used_llm = bool(os.getenv('OPENAI_API_KEY'))
+            reply = data["ai_summary"]
+        else:
+            reply = "I couldn't find an area in that question. Try \"price trend in Wakad\" or \"compare Baner and Aundh\"."
+        
+        return {
+            "query": message,
+            "intent": intent,
+            "parsed": parsed,
+            "reply": reply,
+            "data": data,
+            "used_llm": used_llm,
+        }
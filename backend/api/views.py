@@ -1,106 +1,179 @@
+import logging
 import os
+import shutil
 import tempfile
-import json
-import pandas as pd
-import io
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
 from .utils import (
-    load_dataset, get_unique_areas, generate_real_summary, 
+    get_unique_areas, 
     generate_real_chart_data, get_real_table_data, get_dataset,
-    get_dataset_info, clear_dataset, export_data, compare_areas, filter_by_area
+    get_dataset_info, clear_dataset, compare_areas, filter_by_area,
+    decode_table_cursor, read_table_cursor, list_datasets, get_registry, get_loaded_dataset,
+    serialize_dataset, generate_batch_summary, compare_many, generate_dashboard,
+    suggest_areas, resolve_areas, answer_chat, resolve_dataset, get_area_analysis
 )
 from .serializers import FileUploadSerializer
+from .cache import versioned_cache
+from .summary_cache import summary_cache
+from .exports import EXPORT_FORMATS, iter_export
+from .jobs import serialize_job, submit_ingest
+from .metrics import METRICS_CONTENT_TYPE, render_metrics
+from .querylog import logged_query
+
+logger = logging.getLogger(__name__)
+
+def dataset_param(request):
+    """Optional `dataset` id or name selecting a registered dataset"""
+    return request.GET.get('dataset', '').strip() or None
+
+def dataset_not_found(error):
+    return Response({"error": str(error).strip("'\""), "data_source": "no_data"}, status=status.HTTP_404_NOT_FOUND)
 
 class UploadView(APIView):
     def post(self, request):
         serializer = FileUploadSerializer(data=request.data)
         
-        if serializer.is_valid():
-            file = serializer.validated_data['file']
-            
-            if not file.name.endswith(('.xlsx', '.xls')):
-                return Response(
-                    {"error": "Only Excel files (.xlsx, .xls) are supported"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            if file.size > 10485760:
-                return Response(
-                    {"error": "File size too large. Maximum size is 10MB."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            try:
-                file_extension = os.path.splitext(file.name)[1]
-                with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
+        if not serializer.is_valid():
+            errors = [str(error) for field_errors in serializer.errors.values() for error in field_errors]
+            return Response(
+                {"error": errors[0] if errors else "Invalid upload", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        file = serializer.validated_data['file']
+        try:
+            file_extension = os.path.splitext(file.name)[1].lower()
+            with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
+                temp_path = temp_file.name
+            if hasattr(file, 'temporary_file_path'):
+                # Large uploads are already spooled to disk; move rather than copy them
+                shutil.move(file.temporary_file_path(), temp_path)
+            else:
+                with open(temp_path, 'wb') as temp_file:
                     for chunk in file.chunks():
                         temp_file.write(chunk)
-                    temp_path = temp_file.name
-                
-                print(f"Uploading file: {file.name}")
-                
-                df = load_dataset(temp_path)
-                areas = get_unique_areas()
-                
-                try:
-                    os.unlink(temp_path)
-                    print(f"Temporary file deleted: {temp_path}")
-                except Exception as e:
-                    print(f"Could not delete temp file: {e}")
-                
-                if df.empty:
-                    return Response(
-                        {"error": "The uploaded file is empty or could not be parsed. Please check the file format."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Debug information
-                print(f"Dataset shape: {df.shape}")
-                print(f"Dataset columns: {list(df.columns)}")
-                print(f"Number of areas found: {len(areas)}")
-                
-                return Response({
-                    "status": "success",
-                    "message": f"File '{file.name}' uploaded successfully.",
-                    "areas": areas,
-                    "record_count": len(df),
-                    "columns_found": list(df.columns),
-                    "data_source": "uploaded_excel_file"
-                })
-                
-            except Exception as e:
-                
-                if 'temp_path' in locals():
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
-                
-                error_message = str(e)
-                return Response(
-                    {"error": f"Error parsing Excel file: {error_message}"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        except Exception as e:
+            return Response(
+                {"error": f"Error storing upload: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        mode = serializer.validated_data['mode']
+        target = None
+        if mode == 'append':
+            try:
+                row = resolve_dataset(serializer.validated_data.get('dataset', '').strip() or None)
+            except LookupError as e:
+                os.unlink(temp_path)
+                return dataset_not_found(e)
+            target = row.id if row else None
+        
+        logger.info("Upload received", extra={"upload": file.name, "size": file.size, "mode": mode})
+        name = serializer.validated_data.get('name', '').strip() or None
+        # The job owns temp_path from here on and deletes it when done
+        job = submit_ingest(temp_path, name=name, original_filename=file.name, file_size=file.size,
+                            mode=mode, dataset=target)
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if job.status == 'failed':
+            return Response({"error": job.error, "job": serialize_job(job)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if job.status != 'succeeded':
+            return Response({
+                "status": "accepted",
+                "message": f"File '{file.name}' accepted for processing.",
+                "job": serialize_job(job),
+                "status_url": f"/api/jobs/{job.id}/"
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        loaded = get_loaded_dataset(job.dataset_id)
+        areas = get_unique_areas(job.dataset_id)
+        
+        return Response({
+            "status": "success",
+            "message": f"File '{file.name}' {'appended' if mode == 'append' else 'uploaded'} successfully.",
+            "areas": areas,
+            "record_count": len(loaded.df),
+            "columns_found": list(loaded.df.columns),
+            "dataset": {"id": loaded.dataset_id, "name": loaded.name, "version": loaded.version},
+            "job": serialize_job(job),
+            "data_source": "uploaded_excel_file"
+        })
+
+class JobStatusView(APIView):
+    def get(self, request, job_id):
+        from .models import IngestJob
+        
+        job = IngestJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return Response({"error": f"Job {job_id} not found"}, status=status.HTTP_404_NOT_FOUND)
+        
+        data = serialize_job(job)
+        if job.status == 'succeeded' and job.dataset is not None:
+            data["dataset"] = serialize_dataset(job.dataset)
+        return Response(data)
 
+@method_decorator(versioned_cache('areas'), name='dispatch')
 class AreasView(APIView):
     def get(self, request):
         try:
-            areas = get_unique_areas()
+            areas = get_unique_areas(dataset_param(request))
             return Response({
                 "areas": areas,
                 "data_source": "uploaded_excel_file" if areas else "no_data"
             })
+        except LookupError as e:
+            return dataset_not_found(e)
         except Exception as e:
             return Response(
                 {"error": f"Error loading areas: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+@method_decorator(versioned_cache('areas-suggest'), name='dispatch')
+class AreaSuggestView(APIView):
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        try:
+            limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            suggestions = suggest_areas(query, limit, dataset_param(request)) if query else []
+            return Response({"query": query, "suggestions": suggestions})
+        except LookupError as e:
+            return dataset_not_found(e)
+        except Exception as e:
+            return Response(
+                {"error": f"Error suggesting areas: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+@method_decorator(versioned_cache('areas-resolve'), name='dispatch')
+class AreaResolveView(APIView):
+    def get(self, request):
+        text = request.GET.get('q', '').strip()
+        try:
+            limit = min(max(int(request.GET.get('limit', 5)), 1), 50)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            matches = resolve_areas(text, limit, dataset_param(request)) if text else []
+            return Response({"query": text, "matches": matches})
+        except LookupError as e:
+            return dataset_not_found(e)
+        except Exception as e:
+            return Response(
+                {"error": f"Error resolving areas: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+@method_decorator(logged_query('analyze'), name='dispatch')
+@method_decorator(versioned_cache('analyze'), name='dispatch')
 class AnalyzeView(APIView):
     def get(self, request):
         area = request.GET.get('area', '').strip()
@@ -112,21 +185,110 @@ class AnalyzeView(APIView):
             )
         
         try:
-            df = get_dataset()
-            if df.empty:
+            # Served from the materialized AreaAnalysis rows when possible
+            analysis = get_area_analysis(area, dataset_param(request))
+            if analysis is None:
                 return Response({
                     "error": "No dataset loaded. Please upload an Excel file first.",
                     "data_source": "no_data"
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            analysis = generate_real_summary(area, df)
             return Response(analysis)
+        except LookupError as e:
+            return dataset_not_found(e)
         except Exception as e:
             return Response(
                 {"error": f"Error analyzing data: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+def parse_list_param(value):
+    """Items from a JSON list or a comma-separated string; 'all' is passed through"""
+    if value is None or value == 'all':
+        return value
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(area).strip() for area in value if str(area).strip()]
+
+@method_decorator(logged_query('analyze-batch'), name='dispatch')
+@method_decorator(versioned_cache('analyze-batch'), name='dispatch')
+class AnalyzeBatchView(APIView):
+    def get(self, request):
+        areas = request.GET.getlist('areas')
+        return self.analyze(
+            parse_list_param(areas[0] if len(areas) == 1 else areas) if areas else None,
+            dataset_param(request),
+            request.GET.get('ai', '').lower() in ('1', 'true', 'yes')
+        )
+    
+    def post(self, request):
+        ai = request.data.get('ai', False)
+        return self.analyze(
+            parse_list_param(request.data.get('areas')),
+            str(request.data.get('dataset', '')).strip() or dataset_param(request),
+            ai is True or str(ai).lower() in ('1', 'true', 'yes')
+        )
+    
+    def analyze(self, areas, dataset, include_ai):
+        if not areas:
+            return Response(
+                {"error": "areas parameter is required (a list of areas or 'all')"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            batch = generate_batch_summary(areas, dataset, include_ai=include_ai)
+            if batch is None:
+                return Response({
+                    "error": "No dataset loaded. Please upload an Excel file first.",
+                    "data_source": "no_data"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return Response(batch)
+        except LookupError as e:
+            return dataset_not_found(e)
+        except Exception as e:
+            return Response(
+                {"error": f"Error analyzing data: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+@method_decorator(logged_query('chat'), name='dispatch')
+@method_decorator(versioned_cache('chat'), name='dispatch')
+class ChatView(APIView):
+    def get(self, request):
+        return self.answer(request.GET.get('q', ''), dataset_param(request))
+    
+    def post(self, request):
+        return self.answer(
+            str(request.data.get('message', '')),
+            str(request.data.get('dataset', '')).strip() or dataset_param(request)
+        )
+    
+    def answer(self, message, dataset):
+        message = message.strip()
+        if not message:
+            return Response({"error": "message is required"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            answer = answer_chat(message, dataset)
+            if answer is None:
+                return Response({
+                    "error": "No dataset loaded. Please upload an Excel file first.",
+                    "data_source": "no_data"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return Response(answer)
+        except LookupError as e:
+            return dataset_not_found(e)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {"error": f"Error answering question: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+@method_decorator(logged_query('chart'), name='dispatch')
+@method_decorator(versioned_cache('chart'), name='dispatch')
 class ChartView(APIView):
     def get(self, request):
         area = request.GET.get('area', '').strip()
@@ -139,19 +301,82 @@ class ChartView(APIView):
             )
         
         try:
-            chart_data = generate_real_chart_data(area, chart_type)
+            chart_data = generate_real_chart_data(area, chart_type, dataset_param(request))
             return Response(chart_data)
+        except LookupError as e:
+            return dataset_not_found(e)
         except Exception as e:
             return Response(
                 {"error": f"Error generating chart data: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+@method_decorator(logged_query('dashboard'), name='dispatch')
+@method_decorator(versioned_cache('dashboard'), name='dispatch')
+class DashboardView(APIView):
+    def get(self, request):
+        area = request.GET.get('area', '').strip()
+        if not area:
+            return Response(
+                {"error": "Area parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            dashboard = generate_dashboard(
+                area,
+                parts=parse_list_param(request.GET.get('parts')) or None,
+                dataset=dataset_param(request),
+                table_limit=int(request.GET.get('limit', 50)),
+                table_sort=request.GET.get('sort', '').strip() or None,
+                table_order=request.GET.get('order', 'asc').strip().lower()
+            )
+            if dashboard is None:
+                return Response({
+                    "error": "No dataset loaded. Please upload an Excel file first.",
+                    "data_source": "no_data"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return Response(dashboard)
+        except LookupError as e:
+            return dataset_not_found(e)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {"error": f"Error building dashboard: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+def table_dataset(request):
+    """Dataset a table request reads: the cursor's, when one is given"""
+    cursor = request.GET.get('cursor', '').strip()
+    if cursor:
+        try:
+            return read_table_cursor(cursor)['dataset']
+        except ValueError:
+            pass
+    return dataset_param(request)
+
+@method_decorator(versioned_cache('table', dataset=table_dataset), name='dispatch')
 class TableView(APIView):
     def get(self, request):
         area = request.GET.get('area', '').strip()
         limit = int(request.GET.get('limit', 50))
         offset = int(request.GET.get('offset', 0))
+        sort = request.GET.get('sort', '').strip() or None
+        order = request.GET.get('order', 'asc').strip().lower()
+        cursor = request.GET.get('cursor', '').strip()
+        dataset = dataset_param(request)
+        
+        try:
+            if cursor:
+                state = decode_table_cursor(cursor)
+                if area and area != state['area']:
+                    raise ValueError("Cursor was issued for a different area")
+                area, offset, limit = state['area'], state['offset'], state['limit']
+                sort, order, dataset = state['sort'], state['order'], state['dataset']
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         if not area:
             return Response(
@@ -160,8 +385,12 @@ class TableView(APIView):
             )
         
         try:
-            table_data = get_real_table_data(area, limit, offset)
+            table_data = get_real_table_data(area, limit, offset, sort, order, dataset)
             return Response(table_data)
+        except LookupError as e:
+            return dataset_not_found(e)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
                 {"error": f"Error getting table data: {str(e)}"}, 
@@ -180,7 +409,7 @@ class ExportView(APIView):
             )
         
         try:
-            df = get_dataset()
+            df = get_dataset(dataset_param(request))
             filtered_df = filter_by_area(df, area)
             
             if filtered_df.empty:
@@ -189,75 +418,104 @@ class ExportView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            filtered_df = filtered_df.reset_index(drop=True)
-            
-            if format == 'csv':
-                csv_data = filtered_df.to_csv(index=False, encoding='utf-8-sig')
-                response = HttpResponse(csv_data, content_type='text/csv; charset=utf-8')
-                response['Content-Disposition'] = f'attachment; filename="{area}_data.csv"'
-                response['Access-Control-Expose-Headers'] = 'Content-Disposition'
-                return response
-                
-            elif format == 'excel':
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    sheet_name = ''.join(c for c in area[:25] if c.isalnum() or c in (' ', '_')).strip() or 'data'
-                    filtered_df.to_excel(writer, index=False, sheet_name=sheet_name)
-                
-                output.seek(0)
-                response = HttpResponse(
-                    output.read(),
-                    content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                )
-                response['Content-Disposition'] = f'attachment; filename="{area}_data.xlsx"'
-                response['Access-Control-Expose-Headers'] = 'Content-Disposition'
-                return response
-                
-            elif format == 'json':
-                json_data = filtered_df.to_json(orient='records', date_format='iso', default_handler=str)
-                data = json.loads(json_data)
-                return JsonResponse(data, safe=False, json_dumps_params={'indent': 2})
-                
-            else:
+            if format not in EXPORT_FORMATS:
                 return Response(
-                    {"error": "Invalid format. Supported formats: csv, excel, json"}, 
+                    {"error": "Invalid format. Supported formats: csv, ndjson, excel, json"}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            
+            content_type, extension = EXPORT_FORMATS[format]
+            response = StreamingHttpResponse(iter_export(filtered_df, format, area), content_type=content_type)
+            if format != 'json':
+                response['Content-Disposition'] = f'attachment; filename="{area}_data.{extension}"'
+                response['Access-Control-Expose-Headers'] = 'Content-Disposition'
+            return response
                 
+        except LookupError as e:
+            return dataset_not_found(e)
         except Exception as e:
-            print(f"Error exporting data: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error exporting data: %s", e)
             return Response(
                 {"error": f"Error exporting data: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+def optional_int_param(request, name):
+    value = request.GET.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+
+@method_decorator(logged_query('compare'), name='dispatch')
+@method_decorator(versioned_cache('compare'), name='dispatch')
 class CompareView(APIView):
     def get(self, request):
+        if request.GET.get('areas'):
+            return self.compare_many(request)
+        
         area1 = request.GET.get('area1', '').strip()
         area2 = request.GET.get('area2', '').strip()
         
         if not area1 or not area2:
             return Response(
-                {"error": "Both area1 and area2 parameters are required"}, 
+                {"error": "Pass areas=A,B,... or both area1 and area2"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         try:
-            comparison = compare_areas(area1, area2)
+            comparison = compare_areas(area1, area2, dataset_param(request))
             return Response(comparison)
+        except LookupError as e:
+            return dataset_not_found(e)
         except Exception as e:
             return Response(
                 {"error": f"Error comparing areas: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    def compare_many(self, request):
+        """N-way comparison: areas, metrics, year_from, year_to and baseline params"""
+        areas = request.GET.getlist('areas')
+        areas = parse_list_param(areas[0] if len(areas) == 1 else areas)
+        metrics = parse_list_param(request.GET.get('metrics')) or None
+        if not areas or areas == 'all':
+            return Response(
+                {"error": "areas must name at least one area, e.g. areas=Wakad,Baner"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            comparison = compare_many(
+                areas,
+                metrics=metrics,
+                year_from=optional_int_param(request, 'year_from'),
+                year_to=optional_int_param(request, 'year_to'),
+                baseline=request.GET.get('baseline'),
+                dataset=dataset_param(request)
+            )
+            if "error" in comparison:
+                return Response(comparison, status=status.HTTP_400_BAD_REQUEST)
+            return Response(comparison)
+        except LookupError as e:
+            return dataset_not_found(e)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {"error": f"Error comparing areas: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
 
 class DatasetInfoView(APIView):
     def get(self, request):
         try:
-            info = get_dataset_info()
+            info = get_dataset_info(dataset_param(request))
             return Response(info)
+        except LookupError as e:
+            return dataset_not_found(e)
         except Exception as e:
             return Response(
                 {"error": f"Error getting dataset info: {str(e)}"},
@@ -267,14 +525,22 @@ class DatasetInfoView(APIView):
 class ClearDatasetView(APIView):
     def post(self, request):
         try:
-            clear_dataset()
+            clear_dataset(request.data.get('dataset') or dataset_param(request))
             return Response({"status": "success", "message": "Dataset cleared successfully"})
+        except LookupError as e:
+            return dataset_not_found(e)
         except Exception as e:
             return Response(
                 {"error": f"Error clearing dataset: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class MetricsView(APIView):
+    """Request and stage duration histograms in the Prometheus text format"""
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
 class HealthCheckView(APIView):
     def get(self, request):
         try:
@@ -288,10 +554,26 @@ class HealthCheckView(APIView):
                 "areas_count": areas_count,
                 "records_count": len(df) if not df.empty else 0,
                 "data_source": "uploaded_excel_file" if not df.empty else "no_data",
-                "openai_available": os.getenv('OPENAI_API_KEY') is not None
+                "openai_available": os.getenv('OPENAI_API_KEY') is not None,
+                "ai_summary_cache": summary_cache.stats(),
+                "dataset_memory": get_registry().usage()
             })
         except Exception as e:
             return Response(
                 {"status": "error", "message": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class DatasetsView(APIView):
+    def get(self, request):
+        try:
+            datasets = list_datasets()
+            return Response({
+                "datasets": datasets,
+                "memory": get_registry().usage()
+            })
+        except Exception as e:
+            return Response(
+                {"error": f"Error listing datasets: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
\ No newline at end of file
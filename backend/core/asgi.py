@@ -4,4 +4,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+# See core/wsgi.py
+from django.core.signals import request_started  # noqa: E402
+from api.utils import warm_start_on_request  # noqa: E402
+
+request_started.connect(warm_start_on_request, dispatch_uid='dataset-warm-start')
@@ -25,6 +25,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -33,6 +34,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.DatasetPinMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -89,12 +91,14 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.JSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
         'rest_framework.parsers.MultiPartParser',
     ],
+    # `format` is the export file format, not a renderer override
+    'URL_FORMAT_OVERRIDE': None,
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
@@ -110,6 +114,7 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
 ]
 
 CORS_ALLOW_METHODS = [
@@ -130,4 +135,89 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760
\ No newline at end of file
+FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760
+
+# Uploaded files above FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to disk, so
+# this only bounds disk usage and ingest time
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE_MB', 1024)) * 1024 * 1024
+
+# Uploads are parsed in batches of this many rows. DATASET_READERS maps a
+# file extension to a dotted path of a reader function to swap engines,
+# e.g. {'.xlsx': 'myproject.readers.read_xlsx_calamine'}.
+INGEST_BATCH_ROWS = int(os.getenv('INGEST_BATCH_ROWS', 50000))
+DATASET_READERS = {}
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
+# Normalized uploads are stored here as memory-mappable Arrow snapshots
+DATASET_SNAPSHOT_DIR = os.getenv('DATASET_SNAPSHOT_DIR', os.path.join(MEDIA_ROOT, 'datasets'))
+
+# Loaded datasets beyond this many bytes are evicted (least recently used first)
+# and reloaded from their snapshot on next use
+DATASET_MEMORY_BUDGET = int(os.getenv('DATASET_MEMORY_BUDGET_MB', 1024)) * 1024 * 1024
+
+# Server processes load the latest dataset, with its stored area index and
+# aggregates, in the background from their first request (see core/wsgi.py)
+DATASET_WARM_START = os.getenv('DATASET_WARM_START', 'True').lower() in ('true', '1', 'yes')
+
+# Map numeric snapshot columns zero-copy so worker processes share one copy
+# of each dataset through the page cache
+DATASET_SHARED_MODE = os.getenv('DATASET_SHARED_MODE', 'True').lower() in ('true', '1', 'yes')
+
+# Read endpoints cache rendered responses per dataset version. Set BACKEND to
+# an alias from CACHES to share entries between worker processes.
+RESPONSE_CACHE = {
+    'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 512)),
+    'BACKEND': os.getenv('RESPONSE_CACHE_BACKEND') or None,
+    'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', 3600)),
+}
+
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+
+# LLM summaries are cached on disk by a hash of their input payload
+AI_SUMMARY_CACHE = {
+    'DIR': os.getenv('AI_SUMMARY_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'ai_summaries')),
+    'TTL': int(os.getenv('AI_SUMMARY_CACHE_TTL', 7 * 24 * 3600)),
+    'MAX_ENTRIES': int(os.getenv('AI_SUMMARY_CACHE_MAX_ENTRIES', 5000)),
+}
+
+# Uploads are parsed by a background thread pool and reported through
+# /api/jobs/<id>/. Set INGEST_ASYNC=False to ingest inside the request.
+INGEST_ASYNC = os.getenv('INGEST_ASYNC', 'True').lower() in ('true', '1', 'yes')
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 2))
+
+# Exports are streamed in batches of this many rows
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', 5000))
+
+# Analyze, chart, compare and chat queries are logged to QueryLog. Records are
+# queued and written with bulk_create by a background thread once BATCH_SIZE
+# are waiting or every FLUSH_INTERVAL seconds. Beyond MAX_QUEUE waiting records
+# new ones are dropped instead of slowing requests down. Set
+# QUERY_LOG_ASYNC=False to write each record inside its request.
+QUERY_LOG = {
+    'ENABLED': os.getenv('QUERY_LOG_ENABLED', 'True').lower() in ('true', '1', 'yes'),
+    'ASYNC': os.getenv('QUERY_LOG_ASYNC', 'True').lower() in ('true', '1', 'yes'),
+    'BATCH_SIZE': int(os.getenv('QUERY_LOG_BATCH_SIZE', 200)),
+    'FLUSH_INTERVAL': float(os.getenv('QUERY_LOG_FLUSH_INTERVAL', 2.0)),
+    'MAX_QUEUE': int(os.getenv('QUERY_LOG_MAX_QUEUE', 10000)),
+}
+
+# Application logs go to the console at LOG_LEVEL. LOG_FORMAT=json writes one
+# JSON object per line for log collectors; text is easier to read locally.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {
+            '()': 'api.logs.StructuredFormatter',
+            'output': os.getenv('LOG_FORMAT', 'text').lower(),
+        },
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'structured'},
+    },
+    'loggers': {
+        'api': {'handlers': ['console'], 'level': os.getenv('LOG_LEVEL', 'INFO').upper(), 'propagate': False},
+    },
+}
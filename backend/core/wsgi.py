@@ -4,4 +4,14 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Warm start the dataset in each process that serves requests, on its first
+# request (see api.utils.start_warm_start). Not at import: with gunicorn
+# --preload this module is imported in the master, and the workers forked
+# from it would inherit the loading thread's locks and connection. Not in
+# AppConfig.ready() either, which also runs for management commands and tests.
+from django.core.signals import request_started  # noqa: E402
+from api.utils import warm_start_on_request  # noqa: E402
+
+request_started.connect(warm_start_on_request, dispatch_uid='dataset-warm-start')
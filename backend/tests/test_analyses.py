@@ -0,0 +1,67 @@
+import io
+from unittest import mock
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from api import utils
+from api.models import AreaAnalysis
+from tests.test_append import make_delta_frame
+from tests.test_utils import DatasetTestCase, make_sample_frame
+
+
+class MaterializedAnalysisTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.df = utils.load_dataset(self.excel_path)
+        self.row = utils.resolve_dataset()
+
+    def test_ingest_materializes_every_area(self):
+        stored = {analysis.area_name: analysis.analysis_data for analysis in AreaAnalysis.objects.filter(dataset_id=self.row.id)}
+        self.assertEqual(sorted(stored), ['Aundh', 'Baner', 'Wakad'])
+        self.assertEqual(stored['Wakad']['version'], self.row.version)
+        self.assertEqual(stored['Wakad']['years'], [2020, 2021, 2022])
+
+        for area in ('Wakad', 'baner'):
+            self.assertEqual(utils.get_area_analysis(area), utils.generate_real_summary(area, self.df))
+
+    def test_stored_analysis_is_served_without_loading_the_dataset(self):
+        utils.get_registry().clear()
+        with mock.patch('api.utils.generate_real_summary') as summary:
+            response = APIClient().get('/api/analyze/', {'area': 'Wakad'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['key_metrics']['record_count'], 3)
+        summary.assert_not_called()
+        self.assertEqual(utils.get_registry().usage()['loaded'], [])
+
+    def test_other_queries_and_stale_rows_are_computed(self):
+        self.assertEqual(utils.get_area_analysis('Wak'), utils.generate_real_summary('Wak', self.df))
+
+        AreaAnalysis.objects.filter(area_name='Wakad').update(analysis_data={'version': 'old'})
+        self.assertEqual(utils.get_area_analysis('Wakad'), utils.generate_real_summary('Wakad', self.df))
+
+    def test_names_too_long_to_store_are_computed_on_request(self):
+        frame = make_sample_frame()
+        long_names = ['X' * 255 + ' East', 'X' * 255 + ' West']
+        frame.loc[frame['Final Location'] == 'Wakad', 'Final Location'] = long_names + long_names[:1]
+        frame.to_excel(self.excel_path, index=False)
+        df = utils.load_dataset(self.excel_path)
+        row = utils.resolve_dataset()
+
+        stored = AreaAnalysis.objects.filter(dataset_id=row.id).values_list('area_name', flat=True)
+        self.assertEqual(sorted(stored), ['Aundh', 'Baner'])
+        self.assertEqual(utils.get_area_analysis(long_names[1]), utils.generate_real_summary(long_names[1], df))
+        self.assertEqual(utils.get_area_analysis(long_names[1])['key_metrics']['record_count'], 1)
+
+    def test_append_and_refresh_rewrite_analyses(self):
+        delta_path = f"{self.tmpdir}/delta.xlsx"
+        make_delta_frame().to_excel(delta_path, index=False)
+        loaded = utils.append_dataset(delta_path)
+        wakad = AreaAnalysis.objects.get(dataset_id=self.row.id, area_name='Wakad').analysis_data
+        self.assertEqual(wakad['version'], loaded.version)
+        self.assertEqual(wakad['years'], [2020, 2021, 2022, 2023])
+        self.assertTrue(AreaAnalysis.objects.filter(area_name='Kharadi').exists())
+
+        AreaAnalysis.objects.all().delete()
+        out = io.StringIO()
+        call_command('refresh_analyses', stdout=out)
+        self.assertIn('4 area analyses written', out.getvalue())
+        self.assertEqual(utils.get_area_analysis('Kharadi'), utils.generate_real_summary('Kharadi', utils.get_dataset()))
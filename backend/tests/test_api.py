@@ -1,9 +1,10 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 from rest_framework import status
 import tempfile
 import os
 
+@override_settings(QUERY_LOG={'ASYNC': False})
 class APITestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
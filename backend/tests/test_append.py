@@ -0,0 +1,70 @@
+import os
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from rest_framework.test import APIClient
+from api import utils
+from api.aggregates import AggregateCube
+from api.indexes import AreaIndex
+from tests.test_utils import DatasetTestCase
+
+
+def make_delta_frame():
+    return pd.DataFrame([
+        # Replaces Wakad 2022 and adds Wakad 2023
+        {'Year': 2022, 'Final Location': 'Wakad', 'City': 'Pune', 'Total Sales IGR': 1, 'Total Units': 70,
+         'Flat Weighted Average Rate': 12000.0, 'Flat Sold IGR': 20},
+        {'Year': 2023, 'Final Location': 'Wakad', 'City': 'Pune', 'Total Sales IGR': 2, 'Total Units': 80,
+         'Flat Weighted Average Rate': 12500.0, 'Flat Sold IGR': 30},
+        # A new area sorting between existing ones
+        {'Year': 2023, 'Final Location': 'Kharadi', 'City': 'Pune', 'Total Sales IGR': 3, 'Total Units': 90,
+         'Flat Weighted Average Rate': 9500.0, 'Flat Sold IGR': 40},
+    ])
+
+
+class AppendDatasetTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        utils.load_dataset(self.excel_path)
+        self.delta_path = os.path.join(self.tmpdir, 'delta.xlsx')
+        make_delta_frame().to_excel(self.delta_path, index=False)
+
+    def test_upsert_replaces_matching_keys_and_keeps_dataset_id(self):
+        before = utils.resolve_dataset()
+        loaded = utils.append_dataset(self.delta_path)
+        after = utils.resolve_dataset()
+
+        self.assertEqual(after.id, before.id)
+        self.assertNotEqual(after.version, before.version)
+        self.assertEqual((after.record_count, after.area_count), (11, 4))
+        self.assertEqual(utils.get_unique_areas(), ['Aundh', 'Baner', 'Kharadi', 'Wakad'])
+
+        wakad = utils.filter_by_area(utils.get_dataset(), 'Wakad')
+        self.assertEqual(list(wakad['year']), [2020, 2021, 2022, 2023])
+        self.assertEqual(list(wakad['flat_weighted_average_rate']), [9000.0, 9500.0, 12000.0, 12500.0])
+        self.assertIsInstance(loaded.df['final_location'].dtype, pd.CategoricalDtype)
+
+    def test_incremental_structures_match_a_full_rebuild(self):
+        loaded = utils.append_dataset(self.delta_path)
+        clustered, index = AreaIndex.build(loaded.df)
+        assert_frame_equal(clustered, loaded.df)
+        self.assertEqual(loaded.area_index.keys, index.keys)
+        self.assertEqual(loaded.area_index.names, index.names)
+        self.assertEqual(list(loaded.area_index.stops), list(index.stops))
+        assert_frame_equal(loaded.cube.stats, AggregateCube.build(clustered, index).stats, check_dtype=False)
+
+        # Reloading the stored snapshot serves the same rows
+        utils.get_registry().clear()
+        assert_frame_equal(utils.get_dataset(), loaded.df, check_dtype=False, check_categorical=False)
+
+    def test_append_upload(self):
+        client = APIClient()
+        with open(self.delta_path, 'rb') as upload:
+            response = client.post('/api/upload/', {'file': upload, 'mode': 'append'}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['job']['mode'], 'append')
+        self.assertEqual(response.json()['record_count'], 11)
+        self.assertEqual(len(utils.list_datasets()), 1)
+
+        with open(self.delta_path, 'rb') as upload:
+            response = client.post('/api/upload/', {'file': upload, 'mode': 'append', 'dataset': 'missing'}, format='multipart')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,49 @@
+import io
+import json
+import os
+from django.core.management import call_command
+from api.management.commands.benchmark import comparison_limits, compare_to_baseline, parse_sizes
+from api.models import DataSet
+from tests.test_utils import DatasetTestCase
+
+
+class BenchmarkCommandTestCase(DatasetTestCase):
+    def test_parse_sizes(self):
+        self.assertEqual(parse_sizes('10000:200, 500'), [(10000, 200), (500, 10)])
+
+    def test_compare_to_baseline_ignores_noise(self):
+        baseline = {'results': [
+            {'rows': 10, 'name': 'fast', 'min_ms': 0.5},
+            {'rows': 10, 'name': 'slow', 'min_ms': 100.0},
+            {'rows': 10, 'name': 'steady', 'min_ms': 100.0},
+        ]}
+        results = [
+            {'rows': 10, 'name': 'fast', 'min_ms': 1.2},
+            {'rows': 10, 'name': 'slow', 'min_ms': 180.0},
+            {'rows': 10, 'name': 'steady', 'min_ms': 110.0},
+            {'rows': 10, 'name': 'new', 'min_ms': 5.0},
+        ]
+        regressions = compare_to_baseline(results, baseline, tolerance=0.5, floor_ms=2.0)
+        self.assertEqual([entry['name'] for entry in regressions], ['slow'])
+        self.assertEqual(regressions[0]['ratio'], 1.8)
+
+    def test_comparison_limits_default_to_the_baselines(self):
+        baseline = {'options': {'tolerance': 0.25, 'floor_ms': 5.0}}
+        self.assertEqual(comparison_limits({'tolerance': None, 'floor_ms': None}, baseline), (0.25, 5.0))
+        self.assertEqual(comparison_limits({'tolerance': 1.0, 'floor_ms': None}, baseline), (1.0, 5.0))
+        self.assertEqual(comparison_limits({'tolerance': None, 'floor_ms': None}, {}), (0.5, 2.0))
+
+    def test_benchmark_writes_results_and_leaves_no_datasets(self):
+        output = os.path.join(self.tmpdir, 'results.json')
+        call_command('benchmark', sizes='400:12', repeat=1, format='csv', output=output,
+                     no_compare=True, stdout=io.StringIO())
+
+        with open(output, encoding='utf-8') as f:
+            report = json.load(f)
+        names = [entry['name'] for entry in report['results']]
+        self.assertIn('utils.load_dataset', names)
+        self.assertIn('GET /api/dashboard/', names)
+        self.assertTrue(all(entry['rows'] == 400 and entry['min_ms'] >= 0 for entry in report['results']))
+        self.assertEqual((report['options']['tolerance'], report['options']['floor_ms']), (0.5, 2.0))
+        self.assertIn('host', report['environment'])
+        self.assertEqual(DataSet.objects.count(), 0)
@@ -0,0 +1,146 @@
+from unittest import mock
+from django.test import override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.http import QueryDict
+from api import utils
+from api.cache import ResponseCache, response_cache, make_cache_key
+from api.summary_cache import SummaryCache, summary_cache, summary_cache_key
+import os
+import time
+from tests.test_utils import DatasetTestCase, make_sample_frame
+
+
+class ResponseCacheTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        utils.load_dataset(self.excel_path)
+
+    def test_etag_revalidation_returns_304_without_recomputing(self):
+        response = self.client.get('/api/analyze/', {'area': 'Wakad'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        with mock.patch('api.views.get_area_analysis') as summary:
+            response = self.client.get('/api/analyze/', {'area': 'Wakad'}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+
+            response = self.client.get('/api/analyze/', {'area': 'Wakad'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            summary.assert_not_called()
+
+    def test_params_are_normalized(self):
+        first = self.client.get('/api/chart/', {'area': 'Wakad', 'type': 'price'})
+        second = self.client.get('/api/chart/?type=price&area=Wakad%20')
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertNotEqual(first['ETag'], self.client.get('/api/chart/', {'area': 'Baner', 'type': 'price'})['ETag'])
+
+    def test_clear_and_upload_invalidate(self):
+        etag = self.client.get('/api/areas/')['ETag']
+        self.assertGreater(len(response_cache), 0)
+
+        self.client.post('/api/clear-dataset/')
+        self.assertEqual(len(response_cache), 0)
+        response = self.client.get('/api/areas/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['areas'], [])
+
+    def test_cursor_pages_are_keyed_by_the_cursors_dataset(self):
+        first = utils.resolve_dataset()
+        other = make_sample_frame()
+        other['Total Units'] += 1
+        other_path = os.path.join(self.tmpdir, 'other.xlsx')
+        other.to_excel(other_path, index=False)
+        utils.load_dataset(other_path)
+
+        cursor = self.client.get('/api/table/', {'area': 'a', 'limit': 2, 'dataset': first.id}).json()['next_cursor']
+        response = self.client.get('/api/table/', {'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Only the cursor's dataset changes; the default dataset keeps its version
+        utils.append_dataset(other_path, dataset=first.id)
+        response = self.client.get('/api/table/', {'cursor': cursor}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expired', response.json()['error'])
+
+    def test_errors_are_not_cached(self):
+        self.client.get('/api/analyze/')
+        self.assertEqual(len(response_cache), 0)
+
+    def test_lru_is_bounded(self):
+        cache = ResponseCache(max_entries=2)
+        for i in range(3):
+            cache.set(make_cache_key('v1', 'areas', QueryDict(f'q={i}')), (b'{}', 'application/json'))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(make_cache_key('v1', 'areas', QueryDict('q=0'))))
+
+
+class SummaryCacheTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_settings = override_settings(AI_SUMMARY_CACHE={
+            'DIR': os.path.join(self.tmpdir, 'ai'), 'TTL': 60, 'MAX_ENTRIES': 2
+        })
+        self.cache_settings.enable()
+        self.df = utils.load_dataset(self.excel_path)
+
+    def tearDown(self):
+        self.cache_settings.disable()
+        super().tearDown()
+
+    def fake_client(self, text='Prices are rising.'):
+        client = mock.Mock()
+        client.chat.completions.create.return_value.choices = [mock.Mock(message=mock.Mock(content=text))]
+        return client
+
+    def test_repeat_summary_skips_llm(self):
+        client = self.fake_client()
+        filtered = utils.filter_by_area(self.df, 'Wakad')
+        with mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test'}), \
+                mock.patch('api.utils.get_openai_client', return_value=client):
+            hits = summary_cache.stats()['hits']
+            self.assertEqual(utils.generate_ai_summary('Wakad', filtered), 'Prices are rising.')
+            self.assertEqual(utils.generate_ai_summary('Wakad', filtered), 'Prices are rising.')
+        self.assertEqual(client.chat.completions.create.call_count, 1)
+        self.assertEqual(summary_cache.stats()['hits'], hits + 1)
+
+    def test_key_depends_on_payload_model_and_prompt(self):
+        key = summary_cache_key({'area': 'Wakad'}, 'gpt-3.5-turbo', 1)
+        self.assertEqual(key, summary_cache_key({'area': 'Wakad'}, 'gpt-3.5-turbo', 1))
+        self.assertNotEqual(key, summary_cache_key({'area': 'Baner'}, 'gpt-3.5-turbo', 1))
+        self.assertNotEqual(key, summary_cache_key({'area': 'Wakad'}, 'gpt-4o', 1))
+        self.assertNotEqual(key, summary_cache_key({'area': 'Wakad'}, 'gpt-3.5-turbo', 2))
+
+    def test_ttl_and_size_eviction(self):
+        cache = SummaryCache()
+        cache.set('a', 'first')
+        with mock.patch('api.summary_cache.time.time', return_value=time.time() + 120):
+            self.assertIsNone(cache.get('a'))
+
+        for key in ['b', 'c', 'd']:
+            cache.set(key, key)
+            time.sleep(0.01)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('d'), 'd')
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_writes_rescan_the_directory_only_periodically(self):
+        with override_settings(AI_SUMMARY_CACHE={'DIR': os.path.join(self.tmpdir, 'ai'), 'MAX_ENTRIES': 20}):
+            cache = SummaryCache()
+            # Written by another process: only seen once the directory is rescanned
+            os.makedirs(os.path.join(self.tmpdir, 'ai'), exist_ok=True)
+            with open(os.path.join(self.tmpdir, 'ai', 'other.json'), 'w') as f:
+                f.write('{"summary": "other", "created": 0}')
+            os.utime(os.path.join(self.tmpdir, 'ai', 'other.json'), (0, 0))
+
+            with mock.patch('api.summary_cache.os.scandir', wraps=os.scandir) as scandir:
+                for i in range(25):
+                    cache.set(f'key{i}', 'summary')
+            # One scan on first use, then one every MAX_ENTRIES // 10 writes
+            self.assertEqual(scandir.call_count, 13)
+            files = sorted(name for name in os.listdir(os.path.join(self.tmpdir, 'ai')) if name.endswith('.json'))
+            self.assertEqual(len(files), 20)
+            self.assertNotIn('other.json', files)
+            self.assertIn('key24.json', files)
@@ -0,0 +1,54 @@
+from unittest import mock
+from rest_framework.test import APIClient
+from api import utils
+from tests.test_utils import DatasetTestCase
+
+
+class ChatRouterTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        utils.load_dataset(self.excel_path)
+
+    def test_parses_intents_areas_years_and_metrics(self):
+        parsed = utils.parse_chat_query("Price trend in wakkad since 2021")
+        self.assertEqual(parsed['intent'], 'trend')
+        self.assertEqual(parsed['areas'], ['Wakad'])
+        self.assertEqual((parsed['year_from'], parsed['year_to']), (2021, None))
+        self.assertEqual(parsed['metric'], 'flat_weighted_average_rate:avg')
+
+        parsed = utils.parse_chat_query("compare Baner and Aundh 2020-2021")
+        self.assertEqual((parsed['intent'], parsed['areas']), ('compare', ['Baner', 'Aundh']))
+        self.assertEqual((parsed['year_from'], parsed['year_to']), (2020, 2021))
+
+        parsed = utils.parse_chat_query("top 2 areas by sales in 2022")
+        self.assertEqual((parsed['intent'], parsed['areas'], parsed['limit']), ('top', [], 2))
+        self.assertEqual(utils.parse_chat_query("what is the weather")['intent'], 'unknown')
+
+    def test_parses_are_memoized(self):
+        first = utils.parse_chat_query("Analyze Baner")
+        self.assertIs(utils.parse_chat_query("  analyze   BANER! "), first)
+
+    def test_structured_questions_skip_the_llm(self):
+        with mock.patch.object(utils, 'generate_ai_summary') as ai:
+            top = utils.answer_chat("top 2 areas by sales in 2022")
+            trend = utils.answer_chat("price trend in Wakad")
+            compare = utils.answer_chat("Baner vs Aundh prices")
+        ai.assert_not_called()
+
+        self.assertEqual([entry['name'] for entry in top['data']['results']], ['Baner', 'Aundh'])
+        self.assertEqual(trend['data']['values'], [9000.0, 9500.0, 10000.0])
+        self.assertAlmostEqual(trend['data']['change_percent'], 100 / 9)
+        self.assertEqual(compare['data']['values'], [[11500.0], [10500.0]])
+
+    def test_narrative_questions_use_the_summary(self):
+        with mock.patch.object(utils, 'generate_ai_summary', return_value='Prices rose.') as ai:
+            answer = utils.answer_chat("Why are prices rising in Wakad?")
+        ai.assert_called_once()
+        self.assertEqual((answer['intent'], answer['reply']), ('narrative', 'Prices rose.'))
+
+    def test_chat_endpoint(self):
+        response = APIClient().post('/api/chat/', {'message': 'show table for aundh'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['intent'], 'table')
+        self.assertEqual(response.json()['data']['total'], 3)
+        self.assertEqual(APIClient().get('/api/chat/').status_code, 400)
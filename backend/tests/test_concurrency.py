@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+import pandas as pd
+from django.db import OperationalError, connections
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+from api import utils
+from tests.test_utils import DatasetMixin
+
+
+def retry_locked(func, attempts=50):
+    """The shared in-memory test database reports contention instead of waiting on it"""
+    for _ in range(attempts - 1):
+        try:
+            return func()
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            time.sleep(0.01)
+    return func()
+
+
+class ConcurrentSwapTestCase(DatasetMixin, TransactionTestCase):
+    """Readers hammer the API while the main thread swaps datasets"""
+
+    READERS = 4
+    SWAPS = 6
+
+    def setUp(self):
+        super().setUp()
+        self.other_path = os.path.join(self.tmpdir, 'other.xlsx')
+        pd.DataFrame({
+            'Year': [2023, 2024],
+            'Final Location': ['Kharadi', 'Kharadi'],
+            'Flat Weighted Average Rate': [8000.5, 8500.5],
+        }).to_excel(self.other_path, index=False)
+        utils.load_dataset(self.excel_path)
+
+    def read_until_done(self, done, errors, etags):
+        client = APIClient()
+        try:
+            while not done.is_set():
+                response = retry_locked(lambda: client.get('/api/areas/'))
+                if response.status_code == 404:
+                    # The dataset this request pinned was cleared before it was loaded
+                    continue
+                areas = tuple(response.json()['areas'])
+                if areas not in {(), ('Aundh', 'Baner', 'Wakad'), ('Kharadi',)}:
+                    errors.append(f"mixed areas {areas}")
+                # One ETag must always describe the same content
+                if etags.setdefault(response['ETag'], areas) != areas:
+                    errors.append(f"ETag {response['ETag']} served {areas} and {etags[response['ETag']]}")
+
+                error = retry_locked(self.check_pinned_request)
+                if error:
+                    errors.append(error)
+        except Exception as e:
+            errors.append(repr(e))
+        finally:
+            connections.close_all()
+
+    def check_pinned_request(self):
+        with utils.pinned_datasets():
+            version = utils.get_dataset_version()
+            try:
+                df = utils.get_dataset()
+            except LookupError:
+                return None
+            loaded = utils.get_loaded_dataset()
+            if loaded is None:
+                if version != 'empty' or not df.empty:
+                    return f"empty dataset served as {version}"
+            elif version != f"{loaded.dataset_id}-{loaded.version}" or df is not loaded.df:
+                return f"version {version} served with dataset #{loaded.dataset_id}"
+            elif len(utils.filter_by_area(df, 'a')) != len(df):
+                return "frame changed during the request"
+        return None
+
+    def test_reads_see_whole_datasets_during_swaps(self):
+        done = threading.Event()
+        errors = []
+        etags = {}
+        readers = [
+            threading.Thread(target=self.read_until_done, args=(done, errors, etags))
+            for _ in range(self.READERS)
+        ]
+        for reader in readers:
+            reader.start()
+        try:
+            for i in range(self.SWAPS):
+                utils.load_dataset(self.other_path if i % 2 == 0 else self.excel_path)
+                if i % 3 == 2:
+                    utils.clear_dataset()
+        finally:
+            done.set()
+            for reader in readers:
+                reader.join()
+
+        self.assertEqual(errors, [])
+        self.assertGreater(len(etags), 1)
+
+    def test_concurrent_misses_load_once(self):
+        row = utils.resolve_dataset()
+        registry = utils.get_registry()
+        registry.clear()
+        loads = registry.loads
+        results = []
+
+        def read():
+            results.append(retry_locked(lambda: utils.get_loaded_dataset(row.id)))
+            connections.close_all()
+
+        threads = [threading.Thread(target=read) for _ in range(self.READERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(registry.loads - loads, 1)
+        self.assertEqual(len({id(loaded) for loaded in results}), 1)
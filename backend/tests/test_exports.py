@@ -0,0 +1,50 @@
+from rest_framework.test import APIClient
+from rest_framework import status
+from openpyxl import load_workbook
+import pandas as pd
+import json
+import io
+from api import utils
+from api.exports import iter_csv, iter_json, iter_ndjson
+from tests.test_utils import DatasetTestCase
+
+
+class ExportTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.df = utils.load_dataset(self.excel_path)
+        self.wakad = utils.filter_by_area(self.df, 'Wakad')
+
+    def read_stream(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_batches_match_single_write(self):
+        content = b''.join(iter_csv(self.wakad, batch_rows=2)).decode('utf-8-sig')
+        self.assertEqual(content, self.wakad.to_csv(index=False))
+
+    def test_json_and_ndjson_batches(self):
+        records = json.loads(b''.join(iter_json(self.wakad, batch_rows=2)))
+        self.assertEqual(records, json.loads(self.wakad.to_json(orient='records')))
+        lines = b''.join(iter_ndjson(self.wakad, batch_rows=2)).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], records)
+
+    def test_csv_export_endpoint(self):
+        response = self.client.get('/api/export/', {'area': 'Wakad', 'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('attachment', response['Content-Disposition'])
+        exported = pd.read_csv(io.BytesIO(self.read_stream(response)), encoding='utf-8-sig')
+        self.assertEqual(len(exported), 3)
+
+    def test_excel_export_endpoint(self):
+        response = self.client.get('/api/export/', {'area': 'Wakad', 'format': 'excel'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sheet = load_workbook(io.BytesIO(self.read_stream(response))).active
+        rows = list(sheet.values)
+        self.assertEqual(list(rows[0]), list(self.df.columns))
+        self.assertEqual(len(rows), 4)
+
+    def test_invalid_format(self):
+        response = self.client.get('/api/export/', {'area': 'Wakad', 'format': 'pdf'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,44 @@
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from api.jobs import wait_for_job
+from api.models import DataSet, IngestJob
+from tests.test_utils import DatasetMixin
+
+
+class IngestJobTestCase(DatasetMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def upload(self, path):
+        with self.settings(INGEST_ASYNC=True), open(path, 'rb') as f:
+            return self.client.post('/api/upload/', {'file': f, 'name': 'pune'}, format='multipart')
+
+    def test_upload_is_accepted_and_reports_progress(self):
+        response = self.upload(self.excel_path)
+        self.assertIn(response.status_code, (status.HTTP_202_ACCEPTED, status.HTTP_200_OK))
+        job_id = response.json()['job']['id']
+        wait_for_job(job_id, timeout=30)
+
+        job = self.client.get(f'/api/jobs/{job_id}/').json()
+        self.assertEqual((job['status'], job['stage'], job['rows_parsed']), ('succeeded', 'done', 9))
+        self.assertEqual(job['dataset']['name'], 'pune')
+        self.assertEqual(job['dataset']['id'], DataSet.objects.get().id)
+        self.assertEqual(self.client.get('/api/areas/').json()['areas'], ['Aundh', 'Baner', 'Wakad'])
+
+    def test_failed_ingest_records_error(self):
+        broken = self.excel_path.replace('sample', 'broken')
+        with open(broken, 'wb') as f:
+            f.write(b'not a workbook')
+        job_id = self.upload(broken).json()['job']['id']
+        wait_for_job(job_id, timeout=30)
+
+        job = IngestJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('Error parsing file', job.error)
+        self.assertFalse(DataSet.objects.exists())
+
+    def test_unknown_job(self):
+        response = self.client.get('/api/jobs/999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,64 @@
+import json
+import logging
+import time
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+from api import utils
+from api.logs import StructuredFormatter
+from api.metrics import STAGE_DURATION, Histogram, finish_request, reset_metrics, stage, start_request
+from tests.test_utils import DatasetTestCase
+
+
+class StageTimingTestCase(SimpleTestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = Histogram('test_seconds', "Test.", ['route'], buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, route='/a/')
+        lines = histogram.render().splitlines()
+        self.assertIn('test_seconds_bucket{route="/a/",le="0.1"} 2', lines)
+        self.assertIn('test_seconds_bucket{route="/a/",le="1.0"} 3', lines)
+        self.assertIn('test_seconds_bucket{route="/a/",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_count{route="/a/"} 4', lines)
+
+    def test_nested_stages_are_exclusive(self):
+        timings, token = start_request()
+        try:
+            with stage('aggregate'):
+                with stage('filter'):
+                    time.sleep(0.02)
+                    with stage('filter'):
+                        pass
+        finally:
+            finish_request(token)
+        self.assertEqual(set(timings), {'aggregate', 'filter'})
+        self.assertGreaterEqual(timings['filter'], 0.02)
+        self.assertLess(timings['aggregate'], 0.02)
+
+    def test_stages_outside_requests_are_background(self):
+        reset_metrics()
+        with stage('load'):
+            pass
+        self.assertEqual(STAGE_DURATION.samples(route='background', stage='load')[0], 1)
+
+    def test_json_log_lines_keep_extra_fields(self):
+        record = logging.makeLogRecord({'name': 'api.utils', 'levelname': 'INFO', 'msg': "Loaded %s",
+                                        'args': ('x',), 'dataset': 3, 'records': 10})
+        entry = json.loads(StructuredFormatter('json').format(record))
+        self.assertEqual((entry['message'], entry['dataset'], entry['records']), ("Loaded x", 3, 10))
+        self.assertIn('records=10', StructuredFormatter().format(record))
+
+
+class MetricsEndpointTestCase(DatasetTestCase):
+    def test_requests_report_stage_timings(self):
+        reset_metrics()
+        utils.load_dataset(self.excel_path)
+        client = APIClient()
+        response = client.get('/api/chart/', {'area': 'Wakad', 'type': 'price'})
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'aggregate;dur=[\d.]+, serialize;dur=[\d.]+, total;dur=')
+
+        response = client.get('/api/metrics/')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/api/chart/",status="200"} 1', body)
+        self.assertIn('request_stage_duration_seconds_count{route="/api/chart/",stage="aggregate"} 1', body)
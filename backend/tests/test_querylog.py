@@ -0,0 +1,66 @@
+import threading
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+from api import utils
+from api.models import QueryLog
+from api.querylog import QueryLogWriter
+from tests.test_utils import DatasetTestCase
+
+
+class QueryLogViewTestCase(DatasetTestCase):
+    def test_queries_are_logged_including_cache_hits(self):
+        utils.load_dataset(self.excel_path)
+        client = APIClient()
+        for _ in range(2):
+            client.get('/api/chart/', {'area': 'Wakad', 'type': 'price'}, REMOTE_ADDR='10.0.0.7')
+        client.post('/api/chat/', {'message': 'compare Wakad and Baner'}, format='json')
+        client.get('/api/areas/')
+
+        logs = list(QueryLog.objects.order_by('id'))
+        self.assertEqual([log.response_data['endpoint'] for log in logs], ['chart', 'chart', 'chat'])
+        self.assertEqual((logs[0].area, logs[0].query_text, logs[0].user_ip), ('Wakad', 'area=Wakad&type=price', '10.0.0.7'))
+        self.assertEqual(logs[0].response_data['status'], 200)
+        self.assertEqual(logs[2].query_text, 'compare Wakad and Baner')
+
+
+@override_settings(QUERY_LOG={'ASYNC': True, 'BATCH_SIZE': 3, 'FLUSH_INTERVAL': 0.05, 'MAX_QUEUE': 2})
+class QueryLogWriterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.writer = QueryLogWriter()
+        self.batches = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+        def bulk_create(objects):
+            self.entered.set()
+            self.release.wait(5)
+            self.batches.append([log.query_text for log in objects])
+        patcher = mock.patch.object(QueryLog.objects, 'bulk_create', side_effect=bulk_create)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.writer.close)
+
+    def test_records_are_written_in_batches_off_the_request_thread(self):
+        with override_settings(QUERY_LOG={'ASYNC': True, 'BATCH_SIZE': 3, 'FLUSH_INTERVAL': 5, 'MAX_QUEUE': 100}):
+            for i in range(5):
+                self.writer.record(query_text=f"q{i}")
+            self.assertTrue(self.entered.wait(2))
+            self.writer.close()
+        self.assertEqual(self.batches, [['q0', 'q1', 'q2'], ['q3', 'q4']])
+
+    def test_full_queue_drops_records(self):
+        self.release.clear()
+        self.writer.record(query_text='first')
+        self.assertTrue(self.entered.wait(2))
+        # The writer is stuck on the first record, so only MAX_QUEUE more fit
+        for i in range(5):
+            self.writer.record(query_text=f"q{i}")
+        self.assertEqual(self.writer.dropped, 3)
+
+        with self.assertLogs('api.querylog', 'WARNING') as logs:
+            self.release.set()
+            self.writer.close()
+        self.assertIn('dropped 3 records', logs.output[0])
+        self.assertEqual(sum(len(batch) for batch in self.batches), 3)
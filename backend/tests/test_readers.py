@@ -0,0 +1,101 @@
+import os
+import pandas as pd
+from django.test import override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from api import utils
+from api.readers import iter_file_batches
+from tests.test_utils import DatasetTestCase, make_sample_frame
+
+
+@override_settings(INGEST_BATCH_ROWS=4)
+class StreamingReaderTestCase(DatasetTestCase):
+    def write(self, frame, extension):
+        path = os.path.join(self.tmpdir, f'upload{extension}')
+        if extension == '.csv':
+            frame.to_csv(path, index=False)
+        elif extension == '.parquet':
+            frame.to_parquet(path, index=False)
+        else:
+            frame.to_excel(path, index=False)
+        return path
+
+    def test_xlsx_is_read_in_batches(self):
+        batches = list(iter_file_batches(self.excel_path))
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 1])
+        pd.testing.assert_frame_equal(
+            pd.concat(batches, ignore_index=True), pd.read_excel(self.excel_path), check_dtype=False
+        )
+
+    def test_csv_and_parquet_match_excel(self):
+        expected = utils.read_dataset_file(self.excel_path)
+        for extension in ('.csv', '.parquet'):
+            df = utils.read_dataset_file(self.write(make_sample_frame(), extension))
+            pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+    def test_numeric_text_coerced_across_batches(self):
+        frame = make_sample_frame()
+        frame['Total Units'] = frame['Total Units'].astype(object)
+        frame.loc[6, 'Total Units'] = '1,250'
+        df = utils.read_dataset_file(self.write(frame, '.xlsx'))
+        self.assertTrue(pd.api.types.is_numeric_dtype(df['total_units']))
+        self.assertEqual(df['total_units'].iloc[6], 1250)
+        self.assertEqual(df['city'].iloc[0], 'Pune')
+
+    def test_column_typed_differently_per_batch_is_text(self):
+        frame = make_sample_frame()
+        frame['Code'] = [1, 2, 3, 4, 'x', 'y', 'z', 'w', None]
+        path = self.write(frame, '.csv')
+        expected = ['1', '2', '3', '4', 'x', 'y', 'z', 'w', None]
+        df = utils.read_dataset_file(path)
+        self.assertEqual(list(df['code'].replace({float('nan'): None})), expected)
+
+        # The frame still fits the snapshot, so a reload never re-parses the source file
+        utils.load_dataset(path)
+        os.unlink(path)
+        utils.get_registry().clear()
+        reloaded = utils.get_dataset()
+        self.assertEqual(len(reloaded), 9)
+        self.assertEqual(sorted(reloaded['code'].dropna()), sorted(expected[:-1]))
+
+    def test_upload_csv(self):
+        path = self.write(make_sample_frame(), '.csv')
+        with open(path, 'rb') as f:
+            response = APIClient().post('/api/upload/', {'file': f}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['record_count'], 9)
+        self.assertEqual(response.json()['areas'], ['Aundh', 'Baner', 'Wakad'])
+
+    @override_settings(MAX_UPLOAD_SIZE=10)
+    def test_upload_size_limit_is_configurable(self):
+        with open(self.excel_path, 'rb') as f:
+            response = APIClient().post('/api/upload/', {'file': f}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('too large', response.json()['error'])
+
+
+class CompactDatasetTestCase(DatasetTestCase):
+    def test_dtypes_are_compacted_and_reported(self):
+        report = {}
+        df = utils.read_dataset_file(self.excel_path, memory_report=report)
+        self.assertEqual(df['year'].dtype, 'int16')
+        self.assertEqual(df['flat_sold_igr'].dtype, 'int8')
+        self.assertIsInstance(df['final_location'].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(df['city'].dtype, pd.CategoricalDtype)
+        self.assertLess(report['bytes'], report['bytes_before'])
+        self.assertEqual(report['columns']['year']['dtype_before'], 'int64')
+
+    def test_small_integer_totals_do_not_overflow(self):
+        frame = make_sample_frame()
+        frame['Flat Sold IGR'] = 100
+        path = os.path.join(self.tmpdir, 'units.xlsx')
+        frame.to_excel(path, index=False)
+        utils.load_dataset(path)
+        self.assertEqual(utils.get_dataset()['flat_sold_igr'].dtype, 'int8')
+        stats = utils.get_yearly_stats(utils.get_dataset(), 'a')
+        self.assertEqual(utils.totals(stats)[('flat_sold_igr', 'sum')], 900)
+
+    def test_dataset_info_includes_memory_report(self):
+        utils.load_dataset(self.excel_path)
+        memory = utils.get_dataset_info()['memory']
+        self.assertEqual(memory['columns']['city']['dtype'], 'category')
@@ -0,0 +1,66 @@
+from rest_framework.test import APIClient
+from rest_framework import status
+import pandas as pd
+import os
+from api import utils
+from api.models import DataSet
+from tests.test_utils import DatasetTestCase
+
+
+class DatasetRegistryTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.other_path = os.path.join(self.tmpdir, 'other.xlsx')
+        pd.DataFrame({
+            'Year': [2023, 2024],
+            'Final Location': ['Kharadi', 'Kharadi'],
+            'Flat Weighted Average Rate': [8000.5, 8500.5],
+        }).to_excel(self.other_path, index=False)
+
+    def upload(self, path, name):
+        with open(path, 'rb') as f:
+            return self.client.post('/api/upload/', {'file': f, 'name': name}, format='multipart')
+
+    def test_uploads_are_registered_side_by_side(self):
+        first = self.upload(self.excel_path, 'pune').json()['dataset']
+        second = self.upload(self.other_path, 'east').json()['dataset']
+        self.assertEqual(DataSet.objects.count(), 2)
+
+        # Default is the latest upload; older datasets stay addressable by id or name
+        self.assertEqual(self.client.get('/api/areas/').json()['areas'], ['Kharadi'])
+        self.assertEqual(self.client.get('/api/areas/', {'dataset': first['id']}).json()['areas'], ['Aundh', 'Baner', 'Wakad'])
+        self.assertEqual(self.client.get('/api/areas/', {'dataset': 'pune'}).json()['areas'], ['Aundh', 'Baner', 'Wakad'])
+
+        response = self.client.get('/api/analyze/', {'area': 'Wakad', 'dataset': second['id']})
+        self.assertEqual(response.json()['key_metrics'], {})
+
+        listed = self.client.get('/api/datasets/').json()['datasets']
+        self.assertEqual([entry['name'] for entry in listed], ['east', 'pune'])
+
+    def test_unknown_dataset_is_404(self):
+        self.upload(self.excel_path, 'pune')
+        response = self.client.get('/api/chart/', {'area': 'Wakad', 'dataset': 'missing'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_budget_evicts_and_reloads_from_snapshot(self):
+        first = self.upload(self.excel_path, 'pune').json()['dataset']
+        registry = utils.get_registry()
+        self.addCleanup(setattr, registry, 'budget_bytes', registry.budget_bytes)
+        registry.budget_bytes = 1
+        self.upload(self.other_path, 'east')
+        self.assertEqual([entry['name'] for entry in registry.usage()['loaded']], ['east'])
+
+        os.unlink(self.excel_path)
+        df = utils.get_dataset(first['id'])
+        self.assertEqual(len(df), 9)
+        self.assertEqual([entry['name'] for entry in registry.usage()['loaded']], ['pune'])
+        self.assertEqual(registry.evictions, 2)
+
+    def test_clear_single_dataset(self):
+        first = self.upload(self.excel_path, 'pune').json()['dataset']
+        self.upload(self.other_path, 'east')
+        response = self.client.post('/api/clear-dataset/', {'dataset': 'east'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(DataSet.objects.values_list('id', flat=True)), [first['id']])
+        self.assertEqual(self.client.get('/api/areas/').json()['areas'], ['Aundh', 'Baner', 'Wakad'])
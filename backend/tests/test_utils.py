@@ -0,0 +1,402 @@
+from django.test import TestCase, override_settings
+import pandas as pd
+import tempfile
+import shutil
+import os
+from api import utils
+
+
+def make_sample_frame():
+    rows = []
+    for area, base in [('Wakad', 9000), ('Baner', 11000), ('Aundh', 10000)]:
+        for year in [2020, 2021, 2022]:
+            rows.append({
+                'Year': year,
+                'Final Location': area,
+                'City': 'Pune',
+                'Total Sales IGR': base * 1000 + year,
+                'Total Units': 50 + year - 2020,
+                'Flat Weighted Average Rate': float(base + (year - 2020) * 500),
+                'Flat Sold IGR': 10 + year - 2020,
+            })
+    return pd.DataFrame(rows)
+
+
+class DatasetMixin:
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmpdir, DATASET_SNAPSHOT_DIR=os.path.join(self.tmpdir, 'snapshots'),
+            INGEST_ASYNC=False, QUERY_LOG={'ASYNC': False}
+        )
+        self.settings_override.enable()
+        self.excel_path = os.path.join(self.tmpdir, 'sample.xlsx')
+        make_sample_frame().to_excel(self.excel_path, index=False)
+        utils.clear_dataset()
+
+    def tearDown(self):
+        utils.clear_dataset()
+        self.settings_override.disable()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+class DatasetTestCase(DatasetMixin, TestCase):
+    pass
+
+
+class SnapshotTestCase(DatasetTestCase):
+    def test_upload_writes_snapshot(self):
+        df = utils.load_dataset(self.excel_path)
+        self.assertEqual(len(df), 9)
+        snapshot = utils.snapshot_path_for(self.excel_path)
+        self.assertTrue(os.path.exists(snapshot))
+
+    def test_reload_uses_snapshot_instead_of_excel(self):
+        original = utils.load_dataset(self.excel_path)
+        os.unlink(self.excel_path)
+        utils.get_registry().clear()
+
+        reloaded = utils.get_dataset()
+        self.assertEqual(list(reloaded.columns), list(original.columns))
+        pd.testing.assert_frame_equal(reloaded.reset_index(drop=True), original.reset_index(drop=True))
+
+    def test_clear_forgets_snapshot(self):
+        utils.load_dataset(self.excel_path)
+        utils.clear_dataset()
+        self.assertTrue(utils.get_dataset().empty)
+
+    def test_reload_maps_numeric_columns_zero_copy(self):
+        utils.load_dataset(self.excel_path)
+        utils.get_registry().clear()
+
+        reloaded = utils.get_dataset()
+        for col in ['year', 'total_sales_igr', 'flat_weighted_average_rate']:
+            # Read-only views of the mapped snapshot rather than private copies
+            self.assertFalse(reloaded[col].to_numpy().flags.owndata)
+            self.assertFalse(reloaded[col].to_numpy().flags.writeable)
+        self.assertEqual(list(utils.filter_by_area(reloaded, 'Baner')['year']), [2020, 2021, 2022])
+
+    def test_manifest_tracks_default_dataset(self):
+        from api.shared import read_manifest
+        utils.load_dataset(self.excel_path)
+        row = utils.resolve_dataset()
+        self.assertEqual(read_manifest()['dataset_id'], row.id)
+        self.assertEqual(read_manifest()['version'], row.version)
+
+        utils.clear_dataset()
+        self.assertIsNone(read_manifest()['dataset_id'])
+        self.assertIsNone(utils.resolve_dataset())
+
+
+class AreaIndexTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.df = utils.load_dataset(self.excel_path)
+
+    def test_rows_clustered_by_area(self):
+        index = utils.dataset_for_frame(self.df).area_index
+        self.assertEqual(index.column, 'final_location')
+        self.assertEqual(index.names, ['Aundh', 'Baner', 'Wakad'])
+        self.assertEqual(list(self.df['final_location']), ['Aundh'] * 3 + ['Baner'] * 3 + ['Wakad'] * 3)
+
+    def test_exact_lookup_matches_scan(self):
+        filtered = utils.filter_by_area(self.df, ' wakad ')
+        self.assertEqual(list(filtered['year']), [2020, 2021, 2022])
+        self.assertTrue((filtered['final_location'] == 'Wakad').all())
+
+    def test_substring_lookup(self):
+        filtered = utils.filter_by_area(self.df, 'ne')
+        self.assertEqual(set(filtered['final_location']), {'Baner'})
+        filtered = utils.filter_by_area(self.df, 'a')
+        self.assertEqual(len(filtered), 9)
+        # Multi-area matches keep the upload's row order
+        self.assertEqual(list(filtered['final_location'][:3]), ['Wakad', 'Wakad', 'Wakad'])
+
+    def test_substring_lookup_order_survives_reload(self):
+        expected = list(utils.filter_by_area(self.df, 'a')['final_location'])
+        row = utils.resolve_dataset()
+        snapshot = utils.dataset_file_path(row)
+        # Evicted, and rebuilt from the snapshot alone as on a worker without the stored index
+        utils.get_registry().clear()
+        os.unlink(utils.derived_path_for(snapshot))
+        reloaded = utils.get_dataset()
+        self.assertEqual(list(utils.filter_by_area(reloaded, 'a')['final_location']), expected)
+        self.assertEqual(expected[:4], ['Wakad', 'Wakad', 'Wakad', 'Baner'])
+        # With the stored index as well
+        utils.get_registry().clear()
+        reloaded = utils.get_dataset()
+        self.assertEqual(list(utils.filter_by_area(reloaded, 'a')['final_location']), expected)
+
+    def test_unknown_area(self):
+        self.assertTrue(utils.filter_by_area(self.df, 'Kharadi').empty)
+
+    def test_lookup_falls_back_to_other_area_columns(self):
+        frame = make_sample_frame()
+        frame['Locality'] = ''
+        frame.loc[frame['Final Location'] == 'Baner', 'Locality'] = ['Baner Hills', 'Baner Road', 'Baner Road']
+        frame.to_excel(self.excel_path, index=False)
+        df = utils.load_dataset(self.excel_path)
+        self.assertEqual(utils.dataset_for_frame(df).area_index.column, 'final_location')
+
+        filtered = utils.filter_by_area(df, 'Hills')
+        self.assertEqual(list(filtered['locality']), ['Baner Hills'])
+        self.assertEqual(utils.generate_batch_summary(['Hills'])['not_found'], [])
+        compared = utils.compare_many(['Wakad', 'Hills'], metrics=['total_units:total'])
+        self.assertEqual(compared['areas'], ['Wakad', 'Hills'])
+        self.assertEqual(compared['values'][1], [int(filtered['total_units'].sum())])
+
+    def test_suggest_ranks_prefix_matches_by_records(self):
+        from api.indexes import AreaIndex
+        frame = pd.DataFrame({'final_location': ['Baner Road'] * 3 + ['Baner'] * 2 + ['Old Baner'] * 5 + ['Aundh']})
+        _, index = AreaIndex.build(frame)
+        names = lambda ids: [index.names[i] for i in ids]
+        self.assertEqual(names(index.suggest('ban')), ['Baner Road', 'Baner', 'Old Baner'])
+        self.assertEqual(names(index.suggest('BAN', limit=1)), ['Baner Road'])
+        self.assertEqual(names(index.suggest('au')), ['Aundh'])
+        self.assertEqual(index.suggest('x'), [])
+
+    def test_suggest_endpoint(self):
+        from rest_framework.test import APIClient
+        response = APIClient().get('/api/areas/suggest/', {'q': 'w'})
+        self.assertEqual(response.json()['suggestions'], [{'name': 'Wakad', 'records': 3}])
+
+    def test_misspelt_area_resolves_by_trigrams(self):
+        from api.indexes import AreaIndex
+        frame = pd.DataFrame({'final_location': ['Hinjawadi', 'Pimple Saudagar', 'Wakad', 'Baner']})
+        _, index = AreaIndex.build(frame)
+        names = lambda matches: [index.names[i] for i, _ in matches]
+        self.assertEqual(names(index.resolve('hinjewadi', limit=1)), ['Hinjawadi'])
+        self.assertEqual(names(index.resolve('show prices in pimpri saudagar please', limit=1)), ['Pimple Saudagar'])
+        self.assertEqual(index.resolve('kharadi'), [])
+        score = index.resolve('Wakad')[0][1]
+        self.assertEqual(score, 1.0)
+
+    def test_misspelt_area_is_only_resolved_on_request(self):
+        from rest_framework.test import APIClient
+        client = APIClient()
+        matches = client.get('/api/areas/resolve/', {'q': 'compare baaner'}).json()['matches']
+        self.assertEqual([match['name'] for match in matches], ['Baner'])
+        self.assertEqual([match['name'] for match in client.get('/api/areas/resolve/', {'q': 'Bandra'}).json()['matches']], ['Baner'])
+
+        # Lookups by name never serve a similar-looking area's rows under the requested name,
+        # whether they are answered by the area index or by the scan of the other area columns
+        frame = make_sample_frame()
+        frame['Locality'] = frame['Final Location'] + ' Hills'
+        frame.to_excel(self.excel_path, index=False)
+        self.df = utils.load_dataset(self.excel_path)
+        self.assertEqual(len(utils.filter_by_area(self.df, 'Baner Hills')), 3)
+        self.assertTrue(utils.filter_by_area(self.df, 'Baner Hils').empty)
+        self.assertTrue(utils.filter_by_area(self.df, 'wakkad').empty)
+        self.assertTrue(utils.filter_by_area(self.df, 'Bandra').empty)
+        analysis = client.get('/api/analyze/', {'area': 'Bandra'}).json()
+        self.assertEqual(analysis['summary'], "No data found for area 'Bandra' in the uploaded file.")
+        self.assertEqual(analysis['key_metrics'], {})
+        self.assertEqual(client.get('/api/export/', {'area': 'Bandra'}).status_code, 404)
+        self.assertEqual(client.get('/api/table/', {'area': 'Bandra'}).json()['total'], 0)
+        dashboard = client.get('/api/dashboard/', {'area': 'Bandra'}).json()
+        self.assertEqual(dashboard['analysis']['key_metrics'], {})
+        comparison = client.get('/api/compare/', {'areas': 'Wakad,Bandra'}).json()
+        self.assertEqual(comparison['areas'], ['Wakad'])
+        self.assertEqual(comparison['not_found'], ['Bandra'])
+
+
+class AggregateCubeTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.df = utils.load_dataset(self.excel_path)
+
+    def test_summary_metrics_from_cube(self):
+        analysis = utils.generate_real_summary('Baner', self.df)
+        metrics = analysis['key_metrics']
+        self.assertEqual(analysis['years'], [2020, 2021, 2022])
+        self.assertEqual(metrics['record_count'], 3)
+        flat = metrics['price_data']['flat_weighted_average_rate']
+        self.assertEqual((flat['min'], flat['max'], flat['avg'], flat['count']), (11000.0, 12000.0, 11500.0, 3))
+        self.assertEqual(metrics['sales_data']['total_units']['total'], 153.0)
+
+    def test_frame_totals_match_grouped_totals(self):
+        from api.aggregates import aggregate_by_year, frame_totals, totals
+        frame = utils.filter_by_area(self.df, 'a').copy()
+        frame['year'] = frame['year'].astype(float)
+        frame.loc[frame.index[0], 'year'] = None
+        frame.loc[frame.index[1], 'flat_weighted_average_rate'] = None
+        expected = totals(aggregate_by_year(frame)).to_dict()
+        stats = frame_totals(frame)
+        self.assertEqual(set(stats), set(expected))
+        for key, value in expected.items():
+            self.assertAlmostEqual(float(stats[key]), float(value), msg=key)
+        self.assertEqual(utils.generate_basic_summary('Wakad', frame), utils.format_basic_summary(expected, [2020, 2021, 2022]))
+
+    def test_chart_data_matches_groupby(self):
+        filtered = utils.filter_by_area(self.df, 'Wakad')
+        expected = filtered.groupby('year')['flat_weighted_average_rate'].mean().tolist()
+        chart = utils.generate_real_chart_data('Wakad', 'price')
+        self.assertEqual(chart['labels'], ['2020', '2021', '2022'])
+        self.assertEqual(chart['datasets'][0]['data'], expected)
+
+        demand = utils.generate_real_chart_data('Wakad', 'demand')
+        self.assertEqual(demand['datasets'][0]['data'], filtered.groupby('year')['total_sales_igr'].sum().astype(float).tolist())
+
+        composition = utils.generate_real_chart_data('Wakad', 'composition')
+        self.assertEqual(composition['datasets'][0]['data'], [12.0])
+
+    def test_substring_match_combines_areas(self):
+        chart = utils.generate_real_chart_data('a', 'demand')
+        expected = self.df.groupby('year')['total_sales_igr'].sum().astype(float).tolist()
+        self.assertEqual(chart['datasets'][0]['data'], expected)
+
+    def test_compare_areas(self):
+        comparison = utils.compare_areas('Wakad', 'Baner')
+        flat = comparison['comparison']['flat_weighted_average_rate']
+        self.assertEqual(flat['Wakad'], 9500.0)
+        self.assertEqual(flat['Baner'], 11500.0)
+        self.assertIn('total_sales', comparison['comparison'])
+        self.assertEqual(utils.compare_areas('Wakad', 'Nowhere'), {"error": "One or both areas not found"})
+
+
+class TableDataTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        utils.load_dataset(self.excel_path)
+
+    def test_cells_are_formatted_per_column(self):
+        table = utils.get_real_table_data('Wakad', limit=1)
+        self.assertEqual(table['columns'][:3], ['Year', 'Final Location', 'City'])
+        self.assertEqual(table['rows'], [[2020, 'Wakad', 'Pune', 9002020, 50, 9000, 10]])
+        self.assertEqual(table['total'], 3)
+
+        frame = pd.DataFrame({'total_sales_igr': [1234.5, None], 'total_units': [1500.0, 2.0], 'city': ['Pune', None]})
+        rows = utils.format_table_rows(frame, list(frame.columns))
+        self.assertEqual(rows, [['₹1,234', '1,500', 'Pune'], ['N/A', '2', 'N/A']])
+
+    def test_server_side_sort(self):
+        table = utils.get_real_table_data('a', limit=3, sort='Flat Weighted Average Rate', order='desc')
+        self.assertEqual([row[5] for row in table['rows']], [12000, 11500, 11000])
+        with self.assertRaises(ValueError):
+            utils.get_real_table_data('a', sort='not_a_column')
+
+    def test_cursor_walks_every_page(self):
+        table = utils.get_real_table_data('a', limit=4, sort='year')
+        years = [row[0] for row in table['rows']]
+        while table['next_cursor']:
+            state = utils.decode_table_cursor(table['next_cursor'])
+            table = utils.get_real_table_data(state['area'], state['limit'], state['offset'], state['sort'], state['order'])
+            years += [row[0] for row in table['rows']]
+        self.assertEqual(years, [2020] * 3 + [2021] * 3 + [2022] * 3)
+
+    def test_cursor_expires_with_dataset(self):
+        cursor = utils.get_real_table_data('a', limit=2)['next_cursor']
+        utils.clear_dataset()
+        with self.assertRaises(ValueError):
+            utils.decode_table_cursor(cursor)
+        with self.assertRaises(ValueError):
+            utils.decode_table_cursor('not-a-cursor')
+
+
+class BatchSummaryTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.df = utils.load_dataset(self.excel_path)
+
+    def test_batch_matches_single_analysis(self):
+        batch = utils.generate_batch_summary('all')
+        self.assertEqual([entry['name'] for entry in batch['results']], ['Aundh', 'Baner', 'Wakad'])
+        for entry in batch['results']:
+            single = utils.generate_real_summary(entry['name'], self.df)
+            self.assertEqual(entry['key_metrics'], single['key_metrics'])
+            self.assertEqual(entry['years'], single['years'])
+            self.assertNotIn('ai_summary', entry)
+
+    def test_batch_of_queries(self):
+        batch = utils.generate_batch_summary(['wakad', 'a', 'Kharadi'])
+        self.assertEqual([entry['name'] for entry in batch['results']], ['Wakad', 'a'])
+        self.assertEqual(batch['results'][1]['key_metrics']['record_count'], 9)
+        self.assertEqual(batch['not_found'], ['Kharadi'])
+
+    def test_batch_endpoint(self):
+        from rest_framework.test import APIClient
+        client = APIClient()
+        response = client.get('/api/analyze/batch/', {'areas': 'Wakad,Baner'})
+        self.assertEqual([entry['name'] for entry in response.json()['results']], ['Wakad', 'Baner'])
+        response = client.post('/api/analyze/batch/', {'areas': ['Aundh']}, format='json')
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(client.get('/api/analyze/batch/').status_code, 400)
+
+
+class CompareManyTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.df = utils.load_dataset(self.excel_path)
+
+    def test_matrix_relative_to_baseline(self):
+        result = utils.compare_many(['Wakad', 'baner', 'Aundh'], baseline='Baner')
+        self.assertEqual(result['areas'], ['Wakad', 'Baner', 'Aundh'])
+        self.assertEqual(result['baseline'], 'Baner')
+        self.assertEqual(result['metrics'], ['flat_weighted_average_rate:avg', 'total_sales_igr:total'])
+        self.assertEqual([row[0] for row in result['values']], [9500.0, 11500.0, 10500.0])
+        self.assertEqual(result['difference_percent'][1], [0.0, 0.0])
+        self.assertAlmostEqual(result['difference_percent'][0][0], (9500 - 11500) / 11500 * 100)
+
+        legacy = utils.compare_areas('Baner', 'Wakad')
+        self.assertAlmostEqual(
+            legacy['comparison']['flat_weighted_average_rate']['difference_percent'],
+            result['difference_percent'][0][0]
+        )
+
+    def test_metrics_and_year_range(self):
+        result = utils.compare_many(['Wakad', 'Nowhere', 'Baner'], metrics=['total_units:max', 'flat_sold_igr'], year_from=2021, year_to=2021)
+        self.assertEqual(result['not_found'], ['Nowhere'])
+        self.assertEqual(result['values'], [[51.0, 11.0], [51.0, 11.0]])
+        with self.assertRaises(ValueError):
+            utils.compare_many(['Wakad'], metrics=['nonsense'])
+
+    def test_compare_endpoint(self):
+        from rest_framework.test import APIClient
+        client = APIClient()
+        response = client.get('/api/compare/', {'areas': 'Wakad,Baner', 'metrics': 'total_units', 'year_from': '2022'})
+        self.assertEqual(response.json()['values'], [[52.0], [52.0]])
+        self.assertEqual(client.get('/api/compare/', {'areas': 'Wakad', 'year_from': 'x'}).status_code, 400)
+        self.assertEqual(client.get('/api/compare/', {'area1': 'Wakad', 'area2': 'Baner'}).status_code, 200)
+
+    def test_compare_rejects_empty_areas_and_unknown_baseline(self):
+        from rest_framework.test import APIClient
+        client = APIClient()
+        self.assertEqual(client.get('/api/compare/', {'areas': ',,'}).status_code, 400)
+        response = client.get('/api/compare/', {'areas': 'Wakad,Bandra', 'baseline': 'Bandra'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['not_found'], ['Bandra'])
+        response = client.get('/api/compare/', {'areas': 'Wakad,ner', 'baseline': 'ner'})
+        self.assertEqual(response.json()['baseline'], 'Baner')
+
+    def test_compare_reports_areas_without_rows_in_year_range(self):
+        comparison = utils.compare_many(['Wakad', 'Baner'], year_from=2030)
+        self.assertEqual(comparison['areas'], [])
+        self.assertEqual(comparison['values'], [])
+        self.assertEqual(comparison['not_found'], ['Wakad', 'Baner'])
+        comparison = utils.compare_many(['Wakad', 'Baner'], year_to=2021, baseline='Baner')
+        self.assertEqual(comparison['areas'], ['Wakad', 'Baner'])
+        self.assertEqual(comparison['not_found'], [])
+
+
+class DashboardTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        utils.load_dataset(self.excel_path)
+
+    def test_dashboard_matches_separate_endpoints(self):
+        from rest_framework.test import APIClient
+        client = APIClient()
+        dashboard = client.get('/api/dashboard/', {'area': 'Wakad'}).json()
+        self.assertEqual(dashboard['analysis']['key_metrics'], client.get('/api/analyze/', {'area': 'Wakad'}).json()['key_metrics'])
+        for chart_type in ('price', 'demand', 'composition'):
+            self.assertEqual(dashboard['charts'][chart_type], client.get('/api/chart/', {'area': 'Wakad', 'type': chart_type}).json())
+        self.assertEqual(dashboard['table']['rows'], client.get('/api/table/', {'area': 'Wakad'}).json()['rows'])
+
+    def test_parts_selector_filters_once(self):
+        from unittest import mock
+        with mock.patch.object(utils, 'find_area_rows', wraps=utils.find_area_rows) as find:
+            dashboard = utils.generate_dashboard('Wakad', parts=['analysis', 'table'])
+        self.assertEqual(set(dashboard), {'area', 'parts', 'analysis', 'table', 'data_source'})
+        self.assertEqual(find.call_count, 1)
+        with self.assertRaises(ValueError):
+            utils.generate_dashboard('Wakad', parts=['map'])
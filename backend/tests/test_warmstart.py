@@ -0,0 +1,107 @@
+import os
+from unittest import mock
+import numpy as np
+import pandas as pd
+from django.test import override_settings
+from api import utils
+from api.aggregates import AggregateCube
+from api.indexes import AreaIndex
+from tests.test_utils import DatasetTestCase
+
+
+class DerivedStateTestCase(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        utils.load_dataset(self.excel_path)
+        self.row = utils.resolve_dataset()
+        self.snapshot = utils.dataset_file_path(self.row)
+        self.sidecar = utils.derived_path_for(self.snapshot)
+
+    def reload(self):
+        utils.get_registry().clear()
+        return utils.get_loaded_dataset()
+
+    def test_ingest_stores_index_and_cube_next_to_snapshot(self):
+        self.assertTrue(self.snapshot.endswith('.arrow'))
+        self.assertTrue(os.path.exists(self.sidecar))
+
+    def test_reload_uses_stored_state(self):
+        positions = utils.get_loaded_dataset().area_index.original_positions.copy()
+        with mock.patch.object(AreaIndex, 'build', side_effect=AssertionError("index rebuilt")), \
+                mock.patch.object(AggregateCube, 'build', side_effect=AssertionError("cube rebuilt")):
+            loaded = self.reload()
+
+        _, index = AreaIndex.build(loaded.df)
+        self.assertEqual(list(loaded.area_index.keys), list(index.keys))
+        self.assertEqual(list(loaded.area_index.names), list(index.names))
+        np.testing.assert_array_equal(loaded.area_index.starts, index.starts)
+        np.testing.assert_array_equal(loaded.area_index.stops, index.stops)
+        pd.testing.assert_frame_equal(loaded.cube.stats, AggregateCube.build(loaded.df, index).stats)
+        # The upload order survives the reload, so multi-area results keep their order
+        np.testing.assert_array_equal(loaded.area_index.original_positions, positions)
+        self.assertEqual(list(utils.filter_by_area(loaded.df, 'a')['final_location'][:3]), ['Wakad'] * 3)
+        self.assertEqual(
+            utils.generate_real_summary('Wakad', loaded.df)['key_metrics'],
+            dict(utils.area_analyses(loaded))['Wakad']['key_metrics'],
+        )
+
+    def test_missing_or_stale_state_is_rebuilt(self):
+        os.unlink(self.sidecar)
+        self.reload()
+        self.assertTrue(os.path.exists(self.sidecar))
+
+        # A sidecar written for another version of the dataset is ignored and replaced
+        stale = self.row.version
+        self.row.version = f"{stale}-edited"
+        self.row.save(update_fields=['version'])
+        with mock.patch.object(AreaIndex, 'build', wraps=AreaIndex.build) as build:
+            loaded = self.reload()
+        build.assert_called_once()
+        self.assertEqual(loaded.version, self.row.version)
+        self.assertIsNotNone(utils.load_derived_state(self.snapshot, loaded.df, self.row.version))
+        self.assertIsNone(utils.load_derived_state(self.snapshot, loaded.df, stale))
+
+    def test_clear_removes_stored_state(self):
+        older = self.sidecar.replace(f"index-v{utils.DERIVED_FORMAT_VERSION}", 'index-v1')
+        open(older, 'wb').close()
+        utils.clear_dataset()
+        self.assertFalse(os.path.exists(older))
+        self.assertFalse(os.path.exists(self.snapshot))
+        self.assertFalse(os.path.exists(self.sidecar))
+
+
+class WarmStartTestCase(DatasetTestCase):
+    def test_warm_start_loads_latest_dataset(self):
+        self.assertIsNone(utils.warm_start())
+        utils.load_dataset(self.excel_path)
+        utils.get_registry().clear()
+
+        loaded = utils.warm_start()
+        self.assertEqual(len(loaded.df), 9)
+        self.assertIs(utils.get_loaded_dataset(), loaded)
+
+    @override_settings(DATASET_WARM_START=False)
+    def test_warm_start_can_be_disabled(self):
+        self.assertIsNone(utils.start_warm_start())
+
+    @override_settings(DATASET_WARM_START=True)
+    def test_warm_start_runs_once_per_process(self):
+        with mock.patch.object(utils, '_warm_start_pid', None), mock.patch('api.utils.warm_start') as warm:
+            utils.start_warm_start().join()
+            self.assertIsNone(utils.start_warm_start())
+            # A worker forked after this process started has its own pid and warms itself
+            with mock.patch('os.getpid', return_value=os.getpid() + 1):
+                utils.start_warm_start().join()
+        self.assertEqual(warm.call_count, 2)
+
+    def test_server_module_waits_for_first_request(self):
+        import importlib
+        from django.core.signals import request_started
+        from rest_framework.test import APIClient
+        with mock.patch('api.utils.start_warm_start') as start:
+            importlib.import_module('core.wsgi')
+            self.addCleanup(request_started.disconnect, dispatch_uid='dataset-warm-start')
+            # Importing the app (as a preloading master does) starts nothing
+            start.assert_not_called()
+            APIClient().get('/api/datasets/')
+        start.assert_called_once_with()
@@ -2,12 +2,13 @@ import React, { useState, useEffect } from 'react'
 import ChatWindow from './components/ChatWindow'
 import UploadPanel from './components/UploadPanel'
 import AnalysisPanel from './components/AnalysisPanel'
-import { getAreas, getAnalysis } from './api/api'
+import { getAreas, getDashboard, sendChat } from './api/api'
 
 const App = () => {
   const [messages, setMessages] = useState([])
   const [currentArea, setCurrentArea] = useState('')
   const [analysisData, setAnalysisData] = useState(null)
+  const [dashboardData, setDashboardData] = useState(null)
   const [areas, setAreas] = useState([])
   const [isLoading, setIsLoading] = useState(false)
   const [activeView, setActiveView] = useState('chat')
@@ -86,8 +87,9 @@ const App = () => {
     }
 
     try {
-      const analysisResponse = await getAnalysis(area)
-      setAnalysisData(analysisResponse)
+      const dashboard = await getDashboard(area)
+      setDashboardData(dashboard)
+      setAnalysisData(dashboard.analysis)
       
       const botMessage = {
         id: (Date.now() + 1).toString(),
@@ -113,6 +115,36 @@ const App = () => {
     }
   }
 
+  // Structured questions are answered straight from the chat reply; analysis
+  // and open-ended questions about one area also open its dashboard
+  const handleChat = async (query) => {
+    addMessage('user', query)
+    setIsLoading(true)
+    let answer
+    try {
+      answer = await sendChat(query)
+      addMessage('bot', answer.reply, answer.parsed.areas[0])
+    } catch (error) {
+      console.error('Error answering question:', error)
+      addMessage('bot', `❌ ${error.message}`)
+      return
+    } finally {
+      setIsLoading(false)
+    }
+
+    if (['analyze', 'narrative'].includes(answer.intent)) {
+      const area = answer.parsed.areas[0]
+      setCurrentArea(area)
+      try {
+        const dashboard = await getDashboard(area)
+        setDashboardData(dashboard)
+        setAnalysisData(dashboard.analysis)
+      } catch (error) {
+        console.error('Error loading dashboard:', error)
+      }
+    }
+  }
+
   const addMessage = (type, content, area) => {
     const message = {
       id: Date.now().toString(),
@@ -315,6 +347,7 @@ const App = () => {
               <ChatWindow
                 messages={messages}
                 onAnalyze={handleAnalyze}
+                onChat={handleChat}
                 isLoading={isLoading}
                 areas={areas}
                 isMobile={isMobile}
@@ -324,6 +357,7 @@ const App = () => {
               <AnalysisPanel
                 area={currentArea}
                 analysisData={analysisData}
+                dashboard={dashboardData}
                 isLoading={isLoading}
                 isMobile={isMobile}
                 onBackToChat={() => setActiveView('chat')}
@@ -27,32 +27,70 @@ const downloadFile = (data, filename, contentType) => {
   window.URL.revokeObjectURL(url)
 }
 
-export const uploadFile = async (file) => {
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
+export const getJob = async (jobId) => {
+  const response = await api.get(`/jobs/${jobId}/`)
+  return response.data
+}
+
+// Poll an ingest job until it succeeds or fails
+export const waitForJob = async (jobId, { interval = 1000, onProgress } = {}) => {
+  for (;;) {
+    const job = await getJob(jobId)
+    if (onProgress) onProgress(job)
+    if (job.status === 'succeeded') return job
+    if (job.status === 'failed') throw new Error(job.error || 'Upload failed')
+    await sleep(interval)
+  }
+}
+
+// mode 'append' merges the file into the latest dataset by (area, year)
+export const uploadFile = async (file, { onProgress, mode = 'replace' } = {}) => {
   try {
     const formData = new FormData()
     formData.append('file', file)
+    formData.append('mode', mode)
 
     const response = await api.post('/upload/', formData, {
       headers: { 'Content-Type': 'multipart/form-data' },
-      timeout: 60000,
     })
 
-    return response.data
+    if (response.status !== 202) {
+      return response.data
+    }
+
+    // Parsing continues in the background; wait for the job, then load its areas
+    const job = await waitForJob(response.data.job.id, { onProgress })
+    const { areas } = await getAreas(job.dataset_id)
+    return {
+      status: 'success',
+      message: `File '${file.name}' ${mode === 'append' ? 'appended' : 'uploaded'} successfully.`,
+      areas,
+      record_count: job.rows_parsed,
+      dataset: job.dataset,
+      job,
+    }
   } catch (error) {
     let msg = error.response?.data?.error || error.message || 'Upload failed'
     throw new Error(msg)
   }
 }
 
-export const getAreas = async () => {
+export const getAreas = async (dataset) => {
   try {
-    const response = await api.get('/areas/')
+    const response = await api.get('/areas/', { params: dataset ? { dataset } : {} })
     return response.data
   } catch {
     return { areas: [], data_source: 'error' }
   }
 }
 
+export const suggestAreas = async (q, limit = 5) => {
+  const response = await api.get('/areas/suggest/', { params: { q, limit } })
+  return response.data.suggestions.map((suggestion) => suggestion.name)
+}
+
 export const getAnalysis = async (area) => {
   try {
     const response = await api.get('/analyze/', { params: { area } })
@@ -63,6 +101,20 @@ export const getAnalysis = async (area) => {
   }
 }
 
+// Analysis, charts and the first table page for an area in one request.
+// parts narrows the payload, e.g. ['analysis', 'price'].
+export const getDashboard = async (area, parts) => {
+  try {
+    const params = { area }
+    if (parts) params.parts = parts.join(',')
+    const response = await api.get('/dashboard/', { params })
+    return response.data
+  } catch (error) {
+    let msg = error.response?.data?.error || 'Analysis failed'
+    throw new Error(msg)
+  }
+}
+
 export const getChartData = async (area, type = 'price') => {
   try {
     const response = await api.get('/chart/', { params: { area, type } })
@@ -72,9 +124,10 @@ export const getChartData = async (area, type = 'price') => {
   }
 }
 
-export const getTableData = async (area, limit = 50, offset = 0) => {
+export const getTableData = async (area, limit = 50, offset = 0, { sort, order, cursor } = {}) => {
   try {
-    const response = await api.get('/table/', { params: { area, limit, offset } })
+    const params = cursor ? { cursor } : { area, limit, offset, sort, order }
+    const response = await api.get('/table/', { params })
     return response.data
   } catch (error) {
     throw new Error(error.response?.data?.error || 'Table fetch failed')
@@ -85,7 +138,7 @@ export const exportData = async (area, format = 'csv') => {
   try {
     const config = {
       params: { area: area.trim(), format: format.toLowerCase() },
-      responseType: ['csv', 'excel'].includes(format) ? 'blob' : 'json',
+      responseType: ['csv', 'excel', 'ndjson'].includes(format) ? 'blob' : 'json',
     }
 
     const response = await api.get('/export/', config)
@@ -97,6 +150,8 @@ export const exportData = async (area, format = 'csv') => {
       downloadFile(response.data, filename, 'text/csv; charset=utf-8')
     } else if (format === 'excel') {
       downloadFile(response.data, filename, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    } else if (format === 'ndjson') {
+      downloadFile(response.data, filename, 'application/x-ndjson')
     } else if (format === 'json') {
       downloadFile(JSON.stringify(response.data, null, 2), filename, 'application/json')
     }
@@ -118,6 +173,32 @@ export const compareAreas = async (area1, area2) => {
   }
 }
 
+// N-way comparison: values[i][j] is metric j for area i, with differences against the baseline area
+export const compareMany = async (areas, { metrics, yearFrom, yearTo, baseline } = {}) => {
+  try {
+    const params = { areas: areas.join(',') }
+    if (metrics) params.metrics = metrics.join(',')
+    if (yearFrom) params.year_from = yearFrom
+    if (yearTo) params.year_to = yearTo
+    if (baseline) params.baseline = baseline
+    const response = await api.get('/compare/', { params })
+    return response.data
+  } catch (error) {
+    let msg = error.response?.data?.error || 'Comparison failed'
+    throw new Error(msg)
+  }
+}
+
+// Free-text question, answered by the backend's intent router
+export const sendChat = async (message) => {
+  try {
+    const response = await api.post('/chat/', { message })
+    return response.data
+  } catch (error) {
+    throw new Error(error.response?.data?.error || 'Chat request failed')
+  }
+}
+
 export const testConnection = async () => {
   try {
     const response = await api.get('/health/')
@@ -7,6 +7,7 @@ import { getChartData, getTableData, exportData, compareAreas } from '../api/api
 const AnalysisPanel = ({
   area,
   analysisData,
+  dashboard,
   isLoading,
   isMobile,
   onBackToChat
@@ -35,8 +36,15 @@ const AnalysisPanel = ({
     }
   }, [area, activeTab])
 
+  // Charts and the first table page arrive with the dashboard for the selected area
+  const preloaded = dashboard && dashboard.area === area ? dashboard : null
+
   const loadChartData = async () => {
     if (!area) return
+    if (preloaded?.charts?.[chartType]) {
+      setChartData(preloaded.charts[chartType])
+      return
+    }
     
     setIsChartLoading(true)
     try {
@@ -52,6 +60,10 @@ const AnalysisPanel = ({
 
   const loadTableData = async () => {
     if (!area) return
+    if (preloaded?.table) {
+      setTableData(preloaded.table)
+      return
+    }
     
     setIsTableLoading(true)
     try {
@@ -1,4 +1,5 @@
 import React, { useState, useRef, useEffect } from 'react'
+import { suggestAreas } from '../api/api'
 
 const AreaAutocomplete = ({
   areas,
@@ -13,13 +14,29 @@ const AreaAutocomplete = ({
   const inputRef = useRef(null)
 
   useEffect(() => {
-    if (value.trim()) {
-      const filtered = areas.filter(area =>
-        area.toLowerCase().includes(value.toLowerCase())
-      ).slice(0, 5)
-      setFilteredAreas(filtered)
-    } else {
+    const query = value.trim()
+    if (!query) {
       setFilteredAreas([])
+      return
+    }
+
+    // Ask the server's prefix index; fall back to filtering the local list
+    let cancelled = false
+    const timer = setTimeout(async () => {
+      let suggestions
+      try {
+        suggestions = await suggestAreas(query)
+      } catch {
+        suggestions = areas.filter(area =>
+          area.toLowerCase().includes(query.toLowerCase())
+        ).slice(0, 5)
+      }
+      if (!cancelled) setFilteredAreas(suggestions)
+    }, 150)
+
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
     }
   }, [value, areas])
 
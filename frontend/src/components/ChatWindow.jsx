@@ -6,6 +6,7 @@ import Spinner from './Spinner'
 const ChatWindow = ({
   messages,
   onAnalyze,
+  onChat,
   isLoading,
   areas,
   isMobile,
@@ -23,93 +24,14 @@ const ChatWindow = ({
     scrollToBottom()
   }, [messages])
 
-  const parseQuery = (query) => {
-    const lowerQuery = query.toLowerCase().trim()
-    let area = query.trim()
-    
-    const phrases = [
-      'analyze', 'analysis of', 'show me', 'give me', 'data for', 
-      'information about', 'tell me about', 'compare', 'vs', 'versus',
-      'price growth for', 'demand trends for', 'show', 'trends',
-      'what is', 'how is', 'can you', 'please', 'tell me'
-    ]
-    
-    phrases.forEach(phrase => {
-      const regex = new RegExp(phrase, 'gi')
-      area = area.replace(regex, '').trim()
-    })
-    
-    const words = area.split(' ')
-    if (words.length > 1) {
-      area = words[words.length - 1]
-    }
-    
-    const comparisonMatch = lowerQuery.match(/compare\s+(.+?)\s+(?:and|vs|versus)\s+(.+)/i)
-    if (comparisonMatch) {
-      return {
-        type: 'compare',
-        area1: comparisonMatch[1].trim(),
-        area2: comparisonMatch[2].trim()
-      }
-    }
-    
-    const priceGrowthMatch = lowerQuery.match(/price\s+growth\s+(?:for|of)\s+(.+?)\s+(?:over|last|in)/i)
-    if (priceGrowthMatch) {
-      return {
-        type: 'price_growth',
-        area: priceGrowthMatch[1].trim(),
-        chartType: 'price'
-      }
-    }
-    
-    const demandMatch = lowerQuery.match(/demand\s+trends?\s+(?:for|of)\s+(.+)/i)
-    if (demandMatch) {
-      return {
-        type: 'demand_trends',
-        area: demandMatch[1].trim(),
-        chartType: 'demand'
-      }
-    }
-    
-    const showDataMatch = lowerQuery.match(/(?:show|give)\s+(?:me\s+)?(?:data|information)\s+(?:for|about)\s+(.+)/i)
-    if (showDataMatch) {
-      return {
-        type: 'analyze',
-        area: showDataMatch[1].trim()
-      }
-    }
-    
-    const analyzeMatch = lowerQuery.match(/analyze\s+(.+)/i)
-    if (analyzeMatch) {
-      return {
-        type: 'analyze',
-        area: analyzeMatch[1].trim()
-      }
-    }
-    
-    return {
-      type: 'analyze',
-      area: area
-    }
-  }
-
   const handleSubmit = async (e) => {
     e.preventDefault()
     if (!inputValue.trim() || isLoading) return
 
+    // The backend parses the question and picks the area, years and metric
     const query = inputValue.trim()
-    const parsedQuery = parseQuery(query)
-    
-    if (parsedQuery.type === 'analyze') {
-      const area = parsedQuery.area
-      if (area && area.trim()) {
-        setInputValue('')
-        onAnalyze(area.trim())
-      } else {
-        setInputValue('')
-        // Error handling should be done by parent component
-      }
-    }
+    setInputValue('')
+    onChat(query)
   }
 
   const handleAreaSelect = (area) => {
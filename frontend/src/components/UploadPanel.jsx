@@ -7,6 +7,7 @@ const UploadPanel = ({ onFileUpload }) => {
   const [isDragging, setIsDragging] = useState(false)
   const [isUploading, setIsUploading] = useState(false)
   const [uploadMessage, setUploadMessage] = useState('')
+  const [appendMode, setAppendMode] = useState(false)
 
   const handleDragOver = (e) => {
     e.preventDefault()
@@ -36,12 +37,12 @@ const UploadPanel = ({ onFileUpload }) => {
   }
 
   const validateFile = (file) => {
-    if (!file.name.match(/\.(xlsx|xls)$/i)) {
-      return 'Please upload an Excel file (.xlsx or .xls)'
+    if (!file.name.match(/\.(xlsx|xls|csv|parquet)$/i)) {
+      return 'Please upload an Excel, CSV or Parquet file (.xlsx, .xls, .csv, .parquet)'
     }
 
-    if (file.size > 10 * 1024 * 1024) {
-      return 'File size too large. Maximum size is 10MB.'
+    if (file.size > 1024 * 1024 * 1024) {
+      return 'File size too large. Maximum size is 1GB.'
     }
 
     if (file.size === 0) {
@@ -62,7 +63,13 @@ const UploadPanel = ({ onFileUpload }) => {
     setUploadMessage('')
 
     try {
-      const response = await uploadFile(file)
+      const response = await uploadFile(file, {
+        onProgress: (job) => {
+          const rows = job.rows_parsed ? ` (${job.rows_parsed.toLocaleString()} rows)` : ''
+          setUploadMessage(`⏳ Processing: ${job.stage}${rows}`)
+        },
+        mode: appendMode ? 'append' : 'replace',
+      })
       console.log('Upload response:', response)
       
       if (response.areas && Array.isArray(response.areas)) {
@@ -144,13 +151,23 @@ const UploadPanel = ({ onFileUpload }) => {
                 <span className="text-blue-600">Click to upload</span> or drag and drop
               </p>
               <p className="text-xs md:text-sm text-gray-500">
-                Excel files only (.xlsx, .xls) up to 10MB
+                Excel, CSV or Parquet files up to 1GB
               </p>
               
+              <label className="flex items-center justify-center space-x-2 text-xs md:text-sm text-gray-600">
+                <input
+                  type="checkbox"
+                  checked={appendMode}
+                  onChange={(e) => setAppendMode(e.target.checked)}
+                  disabled={isUploading}
+                />
+                <span>Add to current dataset (replaces matching area and year rows)</span>
+              </label>
+              
               <div className="pt-2">
                 <input
                   type="file"
-                  accept=".xlsx,.xls"
+                  accept=".xlsx,.xls,.csv,.parquet"
                   onChange={handleFileInput}
                   className="hidden"
                   id="file-upload"
@@ -1,49 +1,128 @@
-import pandas as pd
+"""Generate synthetic real estate data in the uploaded-file format.
+
+With no arguments this writes the small 8-area sample workbook. Pass
+--rows/--areas to produce large files for benchmarking, e.g.
+
+    python generate_sample_data.py --rows 2000000 --areas 5000 --output big.parquet
+"""
+import argparse
+import os
 import numpy as np
-from datetime import datetime
-
-# Generate sample real estate data
-np.random.seed(42)
-
-areas = ['Wakad', 'Akurdi', 'Hinjawadi', 'Pimple Saudagar', 'Baner', 'Aundh', 'Kharadi', 'Viman Nagar']
-years = [2020, 2021, 2022, 2023, 2024]
-
-data = []
-for area in areas:
-    base_price = np.random.randint(8000, 12000)
-    base_sales = np.random.randint(10000000, 20000000)
-    
-    for year in years:
-        # Simulate price growth
-        price_growth = 1 + (year - 2020) * 0.08 + np.random.normal(0, 0.02)
-        current_price = base_price * price_growth
-        
-        # Simulate sales volume with some randomness
-        sales_growth = 1 + (year - 2020) * 0.05 + np.random.normal(0, 0.1)
-        current_sales = base_sales * sales_growth
-        
-        # Simulate units sold
-        units = np.random.randint(30, 100)
-        
-        data.append({
-            'year': year,
-            'area': area,
-            'city': 'Pune',
-            'total_sales': int(current_sales),
-            'total_units': units,
-            'flat_weighted_average_rate': round(current_price, 2),
-            'office_weighted_average_rate': round(current_price * 1.3, 2),
-            'demand_index': np.random.randint(70, 95),
-            'supply_units': np.random.randint(50, 150)
-        })
-
-df = pd.DataFrame(data)
-
-# Save to Excel
-with pd.ExcelWriter('realestate_sample.xlsx', engine='openpyxl') as writer:
-    df.to_excel(writer, sheet_name='RealEstateData', index=False)
-
-print("Sample data generated: realestate_sample.xlsx")
-print(f"Records: {len(df)}")
-print(f"Areas: {areas}")
-print(f"Years: {years}")
\ No newline at end of file
+import pandas as pd
+
+AREAS = ['Wakad', 'Akurdi', 'Hinjawadi', 'Pimple Saudagar', 'Baner', 'Aundh', 'Kharadi', 'Viman Nagar']
+CITIES = ['Pune', 'Mumbai', 'Nagpur', 'Nashik']
+
+SYLLABLES = ['ka', 'ra', 'wa', 'ban', 'gao', 'nag', 'pim', 'hin', 'ja', 'ud', 'ko', 'the', 'lo', 'ha', 'var', 'sha', 'mo', 'dhi']
+SUFFIXES = ['', '', ' Nagar', ' Road', ' Gaon', ' Phata', ' Peth', ' Colony']
+
+SOLD_COLUMNS = ['flat_sold_igr', 'office_sold_igr', 'shop_sold_igr', 'others_sold_igr']
+RATE_COLUMNS = ['flat_weighted_average_rate', 'office_weighted_average_rate',
+                'shop_weighted_average_rate', 'others_weighted_average_rate']
+# Price of each property type relative to flats
+RATE_FACTORS = [1.0, 1.3, 1.6, 0.8]
+
+
+def area_names(count, rng):
+    """count distinct area names: the real sample areas first, then made-up ones"""
+    names = AREAS[:count]
+    seen = set(names)
+    while len(names) < count:
+        parts = rng.integers(0, len(SYLLABLES), rng.integers(2, 4))
+        name = ''.join(SYLLABLES[i] for i in parts).capitalize() + SUFFIXES[rng.integers(0, len(SUFFIXES))]
+        if name in seen:
+            name = f"{name} {len(names)}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def generate(rows=None, areas=8, years=(2020, 2024), missing=0.0, seed=42):
+    """DataFrame of synthetic transactions-by-area rows.
+
+    rows defaults to one row per area and year. Larger row counts spread
+    rows over areas with a Zipf-like skew, so a few areas are busy and
+    most are small. missing is the fraction of metric values left blank;
+    a tenth of that fraction also loses its area name.
+    """
+    rng = np.random.default_rng(seed)
+    year_values = np.arange(years[0], years[1] + 1)
+    names = np.array(area_names(areas, rng), dtype=object)
+
+    if rows is None:
+        area_codes = np.repeat(np.arange(areas), len(year_values))
+        year_column = np.tile(year_values, areas)
+    else:
+        weights = 1.0 / np.arange(1, areas + 1) ** 0.8
+        area_codes = rng.choice(areas, size=rows, p=weights / weights.sum())
+        year_column = rng.choice(year_values, size=rows)
+    count = len(area_codes)
+
+    # Most areas are in Pune; every seventh is in another city
+    area_city = np.where(np.arange(areas) % 7 == 6, rng.integers(1, len(CITIES), areas), 0)
+
+    # Per-area base levels, grown by ~8% a year for prices and ~5% for sales
+    base_rate = rng.uniform(6000, 14000, areas)[area_codes]
+    base_sales = rng.uniform(1e7, 2e7, areas)[area_codes]
+    elapsed = year_column - year_values[0]
+    rate = base_rate * (1 + elapsed * 0.08 + rng.normal(0, 0.02, count))
+    sold = {col: rng.poisson(lam, count) for col, lam in zip(SOLD_COLUMNS, [40, 8, 5, 2])}
+    total_sold = sum(sold.values())
+
+    data = {
+        'year': year_column,
+        'final_location': names[area_codes],
+        'city': np.array(CITIES, dtype=object)[area_city[area_codes]],
+        'total_sales_igr': (base_sales * (1 + elapsed * 0.05 + rng.normal(0, 0.1, count))).round(0),
+        'total_sold_igr': total_sold,
+        **sold,
+        'total_units': total_sold + rng.integers(0, 50, count),
+    }
+    for col, factor in zip(RATE_COLUMNS, RATE_FACTORS):
+        data[col] = (rate * factor).round(2)
+    df = pd.DataFrame(data)
+
+    if missing:
+        for col in df.columns[3:]:
+            blank = rng.random(count) < missing
+            if blank.any():
+                df[col] = df[col].astype(float).mask(blank)
+        df.loc[rng.random(count) < missing / 10, 'final_location'] = None
+    return df
+
+
+def write(df, path):
+    """Write df in the format given by path's extension (.xlsx, .csv or .parquet)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        df.to_parquet(path, index=False)
+    elif extension == '.csv':
+        df.to_csv(path, index=False)
+    else:
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            df.to_excel(writer, sheet_name='RealEstateData', index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=None, help='number of rows (default: one per area and year)')
+    parser.add_argument('--areas', type=int, default=len(AREAS), help='number of distinct areas')
+    parser.add_argument('--years', default='2020-2024', help='year range, e.g. 2010-2024')
+    parser.add_argument('--missing', type=float, default=0.0, help='fraction of metric values left blank')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='realestate_sample.xlsx', help='.xlsx, .csv or .parquet file')
+    args = parser.parse_args()
+
+    first, _, last = args.years.partition('-')
+    df = generate(args.rows, args.areas, (int(first), int(last or first)), args.missing, args.seed)
+    write(df, args.output)
+
+    print(f"Sample data generated: {args.output}")
+    print(f"Records: {len(df)}")
+    print(f"Areas: {df['final_location'].nunique()}")
+    print(f"Years: {sorted(df['year'].unique().tolist())}")
+
+
+if __name__ == '__main__':
+    main()